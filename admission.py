@@ -0,0 +1,113 @@
+import math
+import threading
+import time
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; retry_after is a hint in seconds for the user."""
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"{reason}, retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens per second up to capacity."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        # now may have been read just before the bucket was created, or by a thread that then waited on a lock
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def try_take(self, now: float) -> float:
+        """Take one token. Returns 0 on success, else the seconds until one is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def give_back(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class AdmissionController:
+    """
+    Admission control in front of the Cortex/SQL pipeline: check() applies per-user and per-channel
+    token buckets and is cheap enough to call on the Slack listener thread. How many admitted
+    questions run at once, and which goes first, is up to the KeyedWorkerPool they are queued on.
+    With a shared StateBackend the buckets are shared too, so the limits hold across all replicas.
+    """
+    def __init__(self, user_rate: float, user_burst: float, channel_rate: float, channel_burst: float,
+                 max_buckets: int = 10000, backend=None):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.max_buckets = max_buckets
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._admitted = 0
+        self._rejected = {"user": 0, "channel": 0}
+
+    # ===== Rate limits =====
+    def check(self, user: str, channel: str):
+        """Take a token from the user's and the channel's bucket, or raise AdmissionRejected. A rate of 0 disables that limit."""
+        if self.user_rate > 0:
+            wait = self._take(("user", user), self.user_rate, self.user_burst)
+            if wait:
+                self._reject("user")
+                raise AdmissionRejected("You are asking questions faster than the bot can answer them", wait)
+        if self.channel_rate > 0:
+            wait = self._take(("channel", channel), self.channel_rate, self.channel_burst)
+            if wait:
+                if self.user_rate > 0:
+                    self._give_back(("user", user), self.user_rate, self.user_burst)
+                self._reject("channel")
+                raise AdmissionRejected("This channel is asking questions faster than the bot can answer them", wait)
+        with self._lock:
+            self._admitted += 1
+
+    def _take(self, key, rate: float, burst: float) -> float:
+        if self.backend is not None:
+            return self.backend.take(f"bucket:{key[0]}:{key[1]}", rate, burst)
+        now = time.monotonic()
+        with self._lock:
+            wait = self._bucket(key, rate, burst).try_take(now)
+            if len(self._buckets) > self.max_buckets:
+                # Full buckets hold no state worth keeping
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.is_full(now)}
+            return wait
+
+    def _give_back(self, key, rate: float, burst: float):
+        if self.backend is not None:
+            self.backend.give_back(f"bucket:{key[0]}:{key[1]}", rate, burst)
+            return
+        with self._lock:
+            self._bucket(key, rate, burst).give_back()
+
+    def _reject(self, reason: str):
+        with self._lock:
+            self._rejected[reason] += 1
+
+    def _bucket(self, key, rate: float, burst: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def stats(self) -> dict[str, any]:
+        with self._lock:
+            return {
+                "admitted": self._admitted,
+                "rejected": dict(self._rejected),
+                "buckets": len(self._buckets),
+            }
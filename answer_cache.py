@@ -0,0 +1,202 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Filler words that don't change what is being asked
+STOPWORDS = frozenset("""
+a an the of in on for to by and or with from at as is are was were be me my i we us our you your
+show give tell list find get display what which who whats please can could would will do does did
+how about all any some this that these those there their it its per
+""".split())
+
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+def text_words(text: str) -> list[str]:
+    """Words of text in order: lowercased, punctuation and filler words dropped, plurals folded."""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        word = word.replace("'", "")
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss') and not word.isdigit():
+            word = word[:-1]
+        words.append(word)
+    return words
+
+def prompt_tokens(prompt: str) -> frozenset:
+    """Order-insensitive token set of a question, see text_words."""
+    return frozenset(text_words(prompt))
+
+def normalize_prompt(prompt: str) -> str:
+    return ' '.join(sorted(prompt_tokens(prompt)))
+
+def prompt_key(prompt: str) -> str:
+    """Words of a question in order: its identity for exact cache hits and coalescing ("from Texas to California" is not its reverse)."""
+    return ' '.join(text_words(prompt))
+
+# Generic-looking words that change what a question asks for; a near-duplicate has to keep them
+KEY_WORDS = prompt_tokens("""
+top bottom most least highest lowest best worst max maximum min minimum first last increase decrease
+ascending descending above below over under more less fewer before after between not no without except
+excluding only total sum average avg mean median count distinct quantity amount revenue sales profit
+margin price cost percent percentage share rate growth
+""")
+
+def content_words(prompt: str, vocabulary: frozenset = frozenset()) -> tuple:
+    """
+    The words of a question, in order, that a reworded question must keep to mean the same thing:
+    numbers and codes (any digit), KEY_WORDS, and vocabulary words such as a semantic model's table,
+    column and sample value names. Decided on the normalized words, so "Books" and "books" are the same word.
+    """
+    return tuple(word for word in text_words(prompt) if word in KEY_WORDS or word in vocabulary or any(c.isdigit() for c in word))
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+class MinHasher:
+    """MinHash signatures over token sets, using num_perm universal hash functions."""
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, tokens: frozenset) -> tuple:
+        if not tokens:
+            return (0,) * self.num_perm
+        hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), 'little') for t in tokens]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+class _Entry:
+    __slots__ = ("prompt", "tokens", "content", "bands", "value", "nbytes", "expires_at")
+
+class AnswerCache:
+    """
+    Cache of agent answers, keyed on the question's words in order. With threshold below 1 it also
+    matches reworded questions: each prompt is reduced to a token set and indexed with MinHash/LSH
+    banding, and candidate matches are confirmed with exact Jaccard similarity against the threshold.
+    A near-duplicate must also have the same content_words in the same order, so "2003" never
+    answers "2004" and "top" never answers "bottom". It may only add or drop words, not swap them
+    ("TX" never answers "CA" even when neither is in the vocabulary), and the words both share must
+    come in the same order.
+    Entries expire after ttl seconds and the least recently used are evicted beyond max_entries
+    or max_bytes (approximated by the JSON size of the cached answer).
+    """
+    def __init__(self, threshold: float = 0.8, ttl: float = 600, max_entries: int = 1000,
+                 max_bytes: int = 16 * 1024 * 1024, num_perm: int = 64, bands: int = 16, vocabulary: frozenset = frozenset()):
+        """:param vocabulary: Tokens (see prompt_tokens) that a near-duplicate must not drop or swap, besides content_words' own rules."""
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.threshold = threshold
+        self.vocabulary = frozenset(vocabulary)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._hasher = MinHasher(num_perm)
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._entries = OrderedDict()  # normalized prompt -> _Entry
+        self._buckets = {}  # (band index, band hash) -> set of normalized prompts
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._near_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _band_keys(self, tokens: frozenset) -> list:
+        sig = self._hasher.signature(tokens)
+        return [(i, hash(sig[i * self._rows:(i + 1) * self._rows])) for i in range(self._bands)]
+
+    def get(self, prompt: str):
+        """Return the cached answer for prompt or a near-duplicate of it, else None."""
+        key = prompt_key(prompt)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry.value
+        words = key.split()
+        tokens = frozenset(words)
+        bands = self._band_keys(tokens)
+        content = content_words(prompt, self.vocabulary)
+        with self._lock:
+            candidates = set()
+            for band in bands:
+                candidates |= self._buckets.get(band, set())
+            best, best_score = None, self.threshold
+            for candidate in candidates:
+                entry = self._entries[candidate]
+                if entry.expires_at <= now or entry.content != content:
+                    continue
+                if tokens - entry.tokens and entry.tokens - tokens:
+                    continue  # each has a word the other lacks: a swap, not a rewording
+                common = tokens & entry.tokens
+                if [w for w in words if w in common] != [w for w in entry.prompt.split() if w in common]:
+                    continue  # the same words in another order: "from Texas to California" is not its reverse
+                score = jaccard(tokens, entry.tokens)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(best)
+            self._near_hits += 1
+            return self._entries[best].value
+
+    def put(self, prompt: str, value: dict):
+        tokens = prompt_tokens(prompt)
+        entry = _Entry()
+        entry.prompt = prompt_key(prompt)
+        entry.tokens = tokens
+        entry.content = content_words(prompt, self.vocabulary)
+        entry.bands = self._band_keys(tokens)
+        entry.value = value
+        entry.nbytes = len(json.dumps(value, default=str)) + len(entry.prompt)
+        entry.expires_at = time.monotonic() + self.ttl
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if entry.prompt in self._entries:
+                self._remove(entry.prompt)
+            self._entries[entry.prompt] = entry
+            self._bytes += entry.nbytes
+            for band in entry.bands:
+                self._buckets.setdefault(band, set()).add(entry.prompt)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "near_hits": self._near_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
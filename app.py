@@ -1,22 +1,40 @@
+import time
+STARTUP_BEGAN = time.perf_counter()
+
 from typing import Any
 import os
+import json
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 
-import snowflake.connector
-from snowflake.core import Root
+# snowflake.connector, pandas/pyarrow (query_results) and pandas/matplotlib (charts) are imported on first
+# use, or in the background by init(), so they don't hold up startup.
 import cortex_chat
+from snowflake_pool import SnowflakeConnectionPool, is_disconnect
+from result_cache import ResultCache, dataframe_bytes
+from answer_cache import AnswerCache, prompt_key
+from result_cache import normalize_sql, referenced_tables
+from single_flight import SingleFlight, SharedFlight
+from event_dedup import EventDeduplicator, InMemoryDedupStore, SharedDedupStore
+from state_backend import open_backend, key_digest, replica_id
+from admission import AdmissionController, AdmissionRejected
+from sql_guard import SQLGuard, SQLRejected
+from local_search import LocalSearch, load_snapshot
+from running_queries import QueryRegistry, QueryCancelled
+import metrics
+from profiling import RequestProfiler
+from worker_pool import KeyedWorkerPool
+from slack_stream import SlackMessageStreamer, QueryProgress
 
 from dotenv import load_dotenv
-import matplotlib
-import matplotlib.pyplot as plt
-import pandas as pd
-import time
-import requests
 
-matplotlib.use('Agg')
 load_dotenv()
+IMPORTS_DONE = time.perf_counter()
 
 # ===== ENV VARS =====
 ACCOUNT = os.getenv("ACCOUNT")
@@ -37,12 +55,164 @@ SEARCH_SERVICE = os.getenv("SEARCH_SERVICE")
 RSA_PRIVATE_KEY_PATH = os.getenv("RSA_PRIVATE_KEY_PATH")
 RSA_PRIVATE_KEY_PASSPHRASE = os.getenv("RSA_PRIVATE_KEY_PASSPHRASE")
 MODEL = os.getenv("MODEL")
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", 4))
+WORKER_QUEUE_LIMIT = int(os.getenv("WORKER_QUEUE_LIMIT", 32))
+BOT_ENGINE = os.getenv("BOT_ENGINE", "sync").lower()  # "sync" (threads) or "async" (asyncio, without request profiling)
+ASYNC_MAX_INFLIGHT = int(os.getenv("ASYNC_MAX_INFLIGHT", 200))
+SQL_EXECUTOR_THREADS = int(os.getenv("SQL_EXECUTOR_THREADS", 8))
+SNOWFLAKE_POOL_MIN = int(os.getenv("SNOWFLAKE_POOL_MIN", 1))
+SNOWFLAKE_POOL_MAX = int(os.getenv("SNOWFLAKE_POOL_MAX", 4))
+SNOWFLAKE_CHECKOUT_TIMEOUT = float(os.getenv("SNOWFLAKE_CHECKOUT_TIMEOUT", 30))
+SNOWFLAKE_CONN_MAX_AGE = float(os.getenv("SNOWFLAKE_CONN_MAX_AGE", 3 * 60 * 60))  # re-auth before the session expires
+RESULT_PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", 20))  # rows shown per page of a SQL answer
+RESULT_PAGE_MAX_BYTES = int(os.getenv("RESULT_PAGE_MAX_BYTES", 4 * 1024 * 1024))  # Arrow bytes fetched per page at most
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 1000))  # LIMIT added to generated SQL; 0 leaves it alone
+SQL_MAX_SCAN_GB = float(os.getenv("SQL_MAX_SCAN_GB", 50))  # EXPLAIN budget; 0 disables the scan estimate check
+SQL_MAX_PARTITIONS = int(os.getenv("SQL_MAX_PARTITIONS", 0))  # 0 disables the partition check
+SQL_TIMEOUT_SECONDS = int(os.getenv("SQL_TIMEOUT_SECONDS", 120))  # per-statement limit; 0 for none
+SQL_POLL_INTERVAL = float(os.getenv("SQL_POLL_INTERVAL", 1.0))  # longest wait between status checks of a running query
+QUERY_PROGRESS_DELAY = float(os.getenv("QUERY_PROGRESS_DELAY", 2.0))  # show progress and a Cancel button for queries running longer
+QUERY_PROGRESS_INTERVAL = float(os.getenv("QUERY_PROGRESS_INTERVAL", 5.0))  # seconds between progress updates
+CANCEL_REACTIONS = {r.strip() for r in os.getenv("CANCEL_REACTIONS", "x,octagonal_sign").split(",") if r.strip()}  # reactions on the progress message that cancel the query
+RESULT_CACHE_MB = int(os.getenv("RESULT_CACHE_MB", 256))  # 0 disables the SQL result cache
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 15 * 60))
+RESULT_CACHE_WATCH_INTERVAL = float(os.getenv("RESULT_CACHE_WATCH_INTERVAL", 5 * 60))  # seconds between checks of the semantic models' tables for changes; 0 disables
+ANSWER_CACHE_ENTRIES = int(os.getenv("ANSWER_CACHE_ENTRIES", 1000))  # 0 disables the answer cache
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 10 * 60))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.8))  # Jaccard similarity for a near-duplicate hit; 1 matches the same words only
+ANSWER_CACHE_MB = int(os.getenv("ANSWER_CACHE_MB", 16))
+ENABLE_CHARTS = os.getenv("ENABLE_CHARTS", "false").lower() == "true"
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", 2))
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() == "true"
+CORTEX_POOL_SIZE = int(os.getenv("CORTEX_POOL_SIZE", 10))
+CORTEX_CONNECT_TIMEOUT = float(os.getenv("CORTEX_CONNECT_TIMEOUT", 10))
+CORTEX_READ_TIMEOUT = float(os.getenv("CORTEX_READ_TIMEOUT", 300))
+CORTEX_HTTP2 = os.getenv("CORTEX_HTTP2", "false").lower() == "true"
+STREAM_UPDATE_INTERVAL = float(os.getenv("STREAM_UPDATE_INTERVAL", 1.0))  # seconds between chat.update calls
+EVENT_DEDUP_ENTRIES = int(os.getenv("EVENT_DEDUP_ENTRIES", 10000))
+EVENT_DEDUP_TTL = float(os.getenv("EVENT_DEDUP_TTL", 60 * 60))  # Slack retries within minutes; keep IDs well beyond that
+USER_QUESTIONS_PER_MIN = float(os.getenv("USER_QUESTIONS_PER_MIN", 6))  # 0 disables the per-user limit
+USER_QUESTION_BURST = float(os.getenv("USER_QUESTION_BURST", 3))
+CHANNEL_QUESTIONS_PER_MIN = float(os.getenv("CHANNEL_QUESTIONS_PER_MIN", 30))  # 0 disables the per-channel limit
+CHANNEL_QUESTION_BURST = float(os.getenv("CHANNEL_QUESTION_BURST", 10))
+MAX_CONCURRENT_PIPELINES = int(os.getenv("MAX_CONCURRENT_PIPELINES", WORKER_POOL_SIZE))  # caps the workers below WORKER_POOL_SIZE
+ENABLE_LOCAL_SEARCH = os.getenv("ENABLE_LOCAL_SEARCH", "false").lower() == "true"  # answer confident document lookups in-process
+LOCAL_SEARCH_TABLE = os.getenv("LOCAL_SEARCH_TABLE", "SEMANTIC_DATABASE.DASH_SCHEMA.PARSED_PDFS")  # the table the search service indexes
+LOCAL_SEARCH_SNAPSHOT = os.getenv("LOCAL_SEARCH_SNAPSHOT", "local_search.json.gz")  # loaded at startup, rewritten on refresh
+LOCAL_SEARCH_REFRESH = float(os.getenv("LOCAL_SEARCH_REFRESH", 60 * 60))  # seconds; the service's TARGET_LAG is 1 hour
+LOCAL_SEARCH_MIN_SCORE = float(os.getenv("LOCAL_SEARCH_MIN_SCORE", 5.0))  # BM25 score of the best chunk
+LOCAL_SEARCH_MIN_COVERAGE = float(os.getenv("LOCAL_SEARCH_MIN_COVERAGE", 0.75))  # share of the question's idf weight in that chunk
+LOCAL_SEARCH_MIN_MARGIN = float(os.getenv("LOCAL_SEARCH_MIN_MARGIN", 1.25))  # its score over the best chunk of another document
+ROUTE_QUESTIONS = os.getenv("ROUTE_QUESTIONS", "false").lower() == "true"  # opt-in: send Cortex only the tool(s) a question needs
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))  # 0 disables the /metrics endpoint
+METRICS_ADDR = os.getenv("METRICS_ADDR", "127.0.0.1")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))  # fraction of requests run under cProfile
+PROFILE_SLOW_SECONDS = float(os.getenv("PROFILE_SLOW_SECONDS", 0))  # stack samples of requests slower than this; 0 disables
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.05))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 200))
+PRIORITY_CHANNELS = {c.strip() for c in os.getenv("PRIORITY_CHANNELS", "").split(",") if c.strip()}  # served before other channels, like DMs
+STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", "")  # e.g. redis://localhost:6379/0 to run several replicas; empty keeps state in-process
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "cortex-slack-bot:")  # namespaces this deployment's keys on a shared server
+REPLICA_ID = os.getenv("REPLICA_ID", replica_id())  # recorded on the events this replica claims
 
 DEBUG = True
 
 # Initializes App
 app = App(token=SLACK_BOT_TOKEN)
-messages = []
+
+# Caches, claimed events, rate limits and in-flight locks every replica sees; None unless STATE_BACKEND_URL is set, and each keeps its state in this process.
+# Connections (SF_POOL, CORTEX_APP) and the JWT stay per process: sockets and signed tokens belong to the process that opened them.
+STATE = open_backend(STATE_BACKEND_URL, prefix=STATE_KEY_PREFIX)
+
+# Results of recently executed SQL, keyed on normalized SQL + role + warehouse
+RESULT_CACHE = ResultCache(max_bytes=RESULT_CACHE_MB * 1024 * 1024, ttl=RESULT_CACHE_TTL, sizeof=lambda result: dataframe_bytes(result.df))
+
+# Checks generated SQL (SELECT only, row cap, EXPLAIN budget) before it reaches the warehouse
+SQL_GUARD = SQLGuard(
+    max_rows=SQL_MAX_ROWS,
+    max_scan_bytes=int(SQL_MAX_SCAN_GB * 1024 ** 3),
+    max_partitions=SQL_MAX_PARTITIONS,
+    timeout=SQL_TIMEOUT_SECONDS
+)
+
+# Queries executing in Snowflake, so the Cancel button or a reaction can stop them
+QUERIES = QueryRegistry(backend=STATE)
+
+# Agent answers, matched on reworded near-duplicate questions too
+ANSWER_CACHE = AnswerCache(
+    threshold=ANSWER_CACHE_THRESHOLD,
+    ttl=ANSWER_CACHE_TTL,
+    max_entries=ANSWER_CACHE_ENTRIES,
+    max_bytes=ANSWER_CACHE_MB * 1024 * 1024
+)
+
+# Drops Slack redeliveries of an event already being answered, and events that aren't questions.
+# With shared state this is also the work claim: each event is answered by the one replica that claims it first.
+if STATE is not None:
+    EVENT_DEDUP = EventDeduplicator(SharedDedupStore(STATE, ttl=EVENT_DEDUP_TTL, owner=REPLICA_ID))
+else:
+    EVENT_DEDUP = EventDeduplicator(InMemoryDedupStore(max_entries=EVENT_DEDUP_ENTRIES, ttl=EVENT_DEDUP_TTL))
+
+# Rate limits per user and channel
+ADMISSION = AdmissionController(
+    user_rate=USER_QUESTIONS_PER_MIN / 60,
+    user_burst=USER_QUESTION_BURST,
+    channel_rate=CHANNEL_QUESTIONS_PER_MIN / 60,
+    channel_burst=CHANNEL_QUESTION_BURST,
+    backend=STATE
+)
+
+# Opt-in: cProfile for a sample of requests, stack samples and a stage timeline for slow ones
+PROFILER = None
+if PROFILE_SAMPLE_RATE > 0 or PROFILE_SLOW_SECONDS > 0:
+    PROFILER = RequestProfiler(
+        PROFILE_DIR,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        slow_threshold=PROFILE_SLOW_SECONDS,
+        sample_interval=PROFILE_SAMPLE_INTERVAL,
+        max_files=PROFILE_MAX_FILES
+    )
+
+# Opt-in: BM25 over a snapshot of the search service's chunks, for document questions it can answer with confidence
+LOCAL_SEARCH = None
+if ENABLE_LOCAL_SEARCH:
+    LOCAL_SEARCH = LocalSearch(
+        min_score=LOCAL_SEARCH_MIN_SCORE,
+        min_coverage=LOCAL_SEARCH_MIN_COVERAGE,
+        min_margin=LOCAL_SEARCH_MIN_MARGIN
+    )
+
+# Identical questions / SQL already in flight are answered once and shared with every asker
+AGENT_FLIGHTS = SingleFlight("cortex")
+SQL_FLIGHTS = SingleFlight("sql")
+
+# With shared state, across replicas too: one replica calls Cortex / runs the SQL and the others use its
+# result, which stays in the store for as long as the local caches would keep it (briefly if they're off)
+SHARED_ANSWERS = SHARED_RESULTS = None
+if STATE is not None:
+    SHARED_ANSWERS = SharedFlight(
+        STATE, "answer",
+        encode=lambda resp: json.dumps(resp).encode(),
+        decode=json.loads,
+        result_ttl=ANSWER_CACHE_TTL if ANSWER_CACHE_ENTRIES else 10,
+        lock_ttl=CORTEX_CONNECT_TIMEOUT + CORTEX_READ_TIMEOUT + 30
+    )
+    SHARED_RESULTS = SharedFlight(
+        STATE, "result",
+        encode=lambda result: pack_result(result),
+        decode=lambda data: unpack_result(data),
+        result_ttl=RESULT_CACHE_TTL if RESULT_CACHE_MB else 10,
+        lock_ttl=SNOWFLAKE_CHECKOUT_TIMEOUT + SQL_TIMEOUT_SECONDS + 60 if SQL_TIMEOUT_SECONDS else 60 * 60
+    )
+
+# Renders charts in worker processes and reuses uploads of identical charts; see chart_service()
+CHARTS = None
+
+# Runs the Cortex/SQL pipeline off the Slack listener thread, in order per channel/thread,
+# at most MAX_CONCURRENT_PIPELINES at once, DMs / priority channels first. Created by init(), after
+# the chart processes are forked, so they don't inherit its threads.
+WORKERS = None
 
 service_type = os.getenv("SERVICE_TYPE")
 SEMANTIC_MODEL = {
@@ -50,9 +220,17 @@ SEMANTIC_MODEL = {
     "SEARCH_SERVICE": SEMANTIC_MODEL_SEARCH_SERVICE,
 }.get(service_type, SEMANTIC_MODEL_SEARCH_SERVICE)
 
+# Semantic model YAMLs the question router compiles, and the model each one is sent as when chosen
+ROUTER_MODELS = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "tpcds_semantic_view_sm.yaml"): SEMANTIC_MODEL_SEMANTIC_VIEW,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "support_tickets_semantic_model.yaml"): SEMANTIC_MODEL_SEARCH_SERVICE,
+}
+ROUTER = None  # see question_router()
+
 # ===== Snowflake Connection Helpers =====
 def get_snowflake_conn():
     """Create a fresh Snowflake connection using JWT."""
+    import snowflake.connector
     return snowflake.connector.connect(
         host=HOST,
         account=ACCOUNT,
@@ -64,7 +242,7 @@ def get_snowflake_conn():
         private_key_file_pwd=RSA_PRIVATE_KEY_PASSPHRASE,
         client_fetch_use_mp=True, # Enables multiprocessing for fetching query results in parallel.
         client_prefetch_threads=8, # Number of threads to download the result set.
-        session_parameters={"CLIENT_TELEMETRY_ENABLED": True},
+        session_parameters={"CLIENT_TELEMETRY_ENABLED": True, **SQL_GUARD.session_parameters()},
         reuse_results=True,
         disable_query_context_cache=False,
         enable_retry_reason_in_query_response=True,
@@ -73,240 +251,781 @@ def get_snowflake_conn():
         socket_timeout=600
     )
 
-def execute_sql(sql: str):
-    """Execute SQL with automatic reconnect on token expiration."""
-    global CONN
+def run_on_pool(fn):
+    """Call fn(conn) on a pooled connection, retrying once on a fresh one if the session expired."""
     try:
-        df = pd.read_sql(sql, CONN)
-        return df
-    except snowflake.connector.errors.ProgrammingError as e:
-        if "08001" in str(e):  # Token expired
-            print("Snowflake token expired, reconnecting...")
-            CONN.close()
-            CONN = get_snowflake_conn()
-            df = pd.read_sql(sql, CONN)
-            return df
+        with SF_POOL.connection() as conn:
+            return fn(conn)
+    except Exception as e:
+        if is_disconnect(e):  # Token expired; the pool has already dropped that connection
+            print("Snowflake token expired, retrying on a fresh connection...")
+            with SF_POOL.connection() as conn:
+                return fn(conn)
         else:
             raise
 
+def execute_sql(sql: str, progress=None):
+    """
+    Execute SQL (or serve it from the result cache) and return the first page as a QueryResult.
+    Further pages are read from the persisted result by query ID, see fetch_result_page.
+    Raises SQLRejected if the guard refuses the statement, QueryCancelled if a user cancels it.
+    :param progress: QueryProgress showing the running query on a Slack message. Askers coalesced
+                     onto the same query get no progress of their own and share its cancellation.
+    """
+    sql = SQL_GUARD.prepare(sql)
+    version = results_version(sql)
+    if RESULT_CACHE_MB:
+        result = RESULT_CACHE.get(sql, ROLE, WAREHOUSE, version)
+        if result is not None:
+            return result
+    result = SQL_FLIGHTS.do((normalize_sql(sql), ROLE, WAREHOUSE, version), lambda: run_sql(sql, progress, version))
+    if DEBUG:
+        print(f"SQL coalescing: {SQL_FLIGHTS.stats()}")
+    return result
+
+def run_sql(sql: str, progress=None, version: str = ""):
+    if SHARED_RESULTS is not None:
+        # Progress and the Cancel button only show on the replica that runs the query
+        result = SHARED_RESULTS.do(key_digest(normalize_sql(sql), ROLE, WAREHOUSE, version), lambda: query_sql(sql, progress))
+    else:
+        result = query_sql(sql, progress)
+    if RESULT_CACHE_MB:
+        RESULT_CACHE.put(sql, ROLE, WAREHOUSE, result, version)
+        if DEBUG:
+            print(f"Result cache: {RESULT_CACHE.stats()}")
+    return result
+
+def query_sql(sql: str, progress=None):
+    from query_results import run_first_page_async
+    def run_guarded(conn):
+        SQL_GUARD.check_cost(conn, sql)
+        # Submitted asynchronously and polled, so a cancel frees this worker and the warehouse at once
+        running = QUERIES.start(sql, progress.message if progress is not None else None)
+        try:
+            result = run_first_page_async(
+                conn, sql, RESULT_PAGE_SIZE, running, RESULT_PAGE_MAX_BYTES,
+                timeout=SQL_GUARD.timeout or None, poll_interval=SQL_POLL_INTERVAL, on_progress=progress
+            )
+        except Exception as e:
+            QUERIES.finish(running, e)
+            raise
+        QUERIES.finish(running)
+        return result
+
+    started = time.perf_counter()
+    try:
+        result = run_on_pool(run_guarded)
+    except SQLRejected:
+        raise
+    except Exception as e:
+        if isinstance(e, QueryCancelled) and not e.timed_out:
+            print(f"{e}: {QUERIES.stats()}")
+            raise
+        metrics.count_error("sql_execute", e)
+        rejected = SQL_GUARD.timed_out(e)
+        if rejected is not None:
+            raise rejected from e
+        raise
+    metrics.observe("sql_execute", time.perf_counter() - started, {"query_id": result.query_id or ""})
+    return result
+
+def pack_result(result) -> bytes:
+    from query_results import encode_result
+    return encode_result(result)
+
+def unpack_result(data: bytes):
+    from query_results import decode_result
+    return decode_result(data)
+
+def fetch_result_page(query_id: str, offset: int, total_rows: int):
+    """Fetch another page of an earlier answer with RESULT_SCAN instead of re-running its query."""
+    from query_results import run_result_page
+    with metrics.timed("sql_page"):
+        return run_on_pool(lambda conn: run_result_page(conn, query_id, offset, RESULT_PAGE_SIZE, total_rows, RESULT_PAGE_MAX_BYTES))
+
+def results_version(sql: str) -> str:
+    """
+    The generations of the tables sql reads, part of its result cache keys. Only with shared state, where
+    a new generation set by invalidate_results on any replica retires the results every replica holds.
+    """
+    if STATE is None:
+        return ""
+    return ",".join((STATE.get(f"results:table:{table}") or b"").decode() for table in sorted(referenced_tables(sql)))
+
+def invalidate_results(table: str, generation: str = None) -> int:
+    """
+    Forget cached results that read the given table, e.g. after it is reloaded, on every replica.
+    :param generation: Identifies the table's new contents, so replicas that notice the same change agree on it.
+    :return: The number of results this replica dropped.
+    """
+    if STATE is not None:
+        name = table.split('.')[-1].strip('"').upper()
+        # Outlives every result stored under the previous generation, which then can't be reached again
+        STATE.set(f"results:table:{name}", (generation or uuid.uuid4().hex).encode(), RESULT_CACHE_TTL * 2 + 60)
+    return RESULT_CACHE.invalidate_table(table)
+
+def semantic_model_tables() -> list[str]:
+    """DATABASE.SCHEMA.TABLE of each base table in the semantic models: the tables generated SQL reads."""
+    import yaml
+    tables = set()
+    for path in ROUTER_MODELS:
+        with open(path) as f:
+            model = yaml.safe_load(f)
+        for table in model.get("tables") or ():
+            base = table.get("base_table") or {}
+            if base.get("database") and base.get("schema") and base.get("table"):
+                tables.add(f"{base['database']}.{base['schema']}.{base['table']}")
+    return sorted(tables)
+
+def watch_result_tables(pool, tables: list[str], interval: float) -> threading.Thread:
+    """Invalidate the cached results of any of tables whose LAST_ALTERED or row count moves, checking every interval seconds."""
+    from local_search import table_version
+
+    def run():
+        versions = {}
+        while True:
+            try:
+                with pool.connection() as conn:
+                    for table in tables:
+                        version = table_version(conn, table)
+                        if versions.get(table, version) != version:
+                            dropped = invalidate_results(table, version)
+                            print(f"{table} changed, dropped {dropped} cached results")
+                        versions[table] = version
+            except Exception as e:
+                # Results still expire after RESULT_CACHE_TTL
+                print(f"Result cache table check failed: {type(e).__name__}: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="result-cache-watch", daemon=True)
+    thread.start()
+    return thread
+
 # ===== Cortex Chat Helpers =====
-def ask_agent(prompt):
-    resp = CORTEX_APP.chat(prompt)
+def ask_agent(prompt, on_event=None):
+    if ANSWER_CACHE_ENTRIES:
+        resp = ANSWER_CACHE.get(prompt)
+        if resp is not None:
+            if DEBUG:
+                print(f"Answer cache: {ANSWER_CACHE.stats()}")
+            return resp
+    resp = local_answer(prompt)
+    if resp is not None:
+        return resp
+    # Duplicates that arrive while the first asker is waiting on Cortex share its answer.
+    # Only the first asker's on_event sees the stream; the others get the finished answer.
+    resp = AGENT_FLIGHTS.do(prompt_key(prompt) or prompt.strip(), lambda: call_agent(prompt, on_event))
+    if DEBUG:
+        print(f"Cortex coalescing: {AGENT_FLIGHTS.stats()}")
+    return resp
+
+def call_agent(prompt, on_event=None):
+    if SHARED_ANSWERS is not None:
+        resp = SHARED_ANSWERS.do(key_digest(prompt_key(prompt) or prompt.strip()), lambda: chat_agent(prompt, on_event))
+    else:
+        resp = chat_agent(prompt, on_event)
+    if ANSWER_CACHE_ENTRIES and resp is not None:
+        ANSWER_CACHE.put(prompt, resp)
     return resp
 
-def display_agent_response(content,say):
+def chat_agent(prompt, on_event=None):
+    resp = CORTEX_APP.chat(prompt, on_event=on_event, route=question_route(prompt))
+    if DEBUG:
+        print(f"Cortex connection pool: {CORTEX_APP.pool_stats()}")
+    return resp
+
+def local_answer(prompt):
+    """LOCAL_SEARCH's answer to a document question it is confident about, else None (ask Cortex)."""
+    if LOCAL_SEARCH is None:
+        return None
+    route = question_route(prompt)
+    if route is not None and (route.analyst or not route.search):
+        return None
+    with metrics.timed("local_search"):
+        resp = LOCAL_SEARCH.answer(prompt)
+    if DEBUG:
+        print(f"Local search: {'answered' if resp is not None else 'fell back to Cortex'} {LOCAL_SEARCH.stats()}")
+    return resp
+
+def load_local_search():
+    """Load the snapshot written by the last refresh, so document questions are served before Snowflake is reached."""
+    if not os.path.exists(LOCAL_SEARCH_SNAPSHOT):
+        return
+    try:
+        LOCAL_SEARCH.load(*load_snapshot(LOCAL_SEARCH_SNAPSHOT))
+    except Exception as e:
+        print(f"Could not load local search snapshot {LOCAL_SEARCH_SNAPSHOT}: {type(e).__name__}: {e}")
+
+def load_answer_vocabulary():
+    """Let near-duplicate answer cache hits keep the semantic models' table, column and sample value words."""
+    from tool_router import compile_semantic_model
+    vocabulary = set()
+    try:
+        for path in ROUTER_MODELS:
+            for tokens in compile_semantic_model(path, None).terms:
+                vocabulary |= tokens
+    except Exception as e:
+        # content_words' own rules (numbers, names, codes, key words) still apply
+        print(f"Could not compile semantic models for the answer cache: {type(e).__name__}: {e}")
+    ANSWER_CACHE.vocabulary = frozenset(vocabulary)
+
+def question_router():
+    """The QuestionRouter over ROUTER_MODELS, compiled on first use."""
+    global ROUTER
+    if ROUTER is None:
+        from tool_router import QuestionRouter
+        try:
+            ROUTER = QuestionRouter.from_files(ROUTER_MODELS, default_model=SEMANTIC_MODEL)
+        except Exception as e:
+            # Without a vocabulary every question gets both tools, as if routing were off
+            print(f"Could not compile semantic models for routing: {type(e).__name__}: {e}")
+            ROUTER = QuestionRouter([], default_model=SEMANTIC_MODEL)
+    return ROUTER
+
+def question_route(prompt):
+    """Tools and semantic model to send for prompt, or None to send both tools with SEMANTIC_MODEL."""
+    if not ROUTE_QUESTIONS:
+        return None
+    route = question_router().route(prompt)
+    if DEBUG:
+        print(f"Route: search={route.search} analyst={route.analyst} model={route.model_name} scores={route.scores}")
+    return route
+
+def display_agent_response(content,say,placeholder=None):
     if content['sql']:
         sql = content['sql']
-        df = execute_sql(sql)
-        say(
-            text = "Answer:",
-            blocks=[
+        result, notice = execute_sql_with_progress(sql, placeholder)
+        if notice is not None:
+            say(text = notice, blocks=notice_blocks(notice))
+            return
+        say(text = "Answer:", blocks=sql_answer_blocks(result))
+        display_chart(result.df, say)
+    else:
+        say(text = "Answer:", blocks=text_answer_blocks(content))
+
+def sql_rejected_message(e: SQLRejected) -> str:
+    return f":no_entry_sign: {e}"
+
+def execute_sql_with_progress(sql, placeholder=None):
+    """
+    execute_sql, showing the running query and a Cancel button on the placeholder message.
+    Returns (result, None), or (None, notice) with a notice to post if the query was refused or cancelled.
+    """
+    progress = query_progress(placeholder)
+    try:
+        result = execute_sql(sql, progress)
+    except SQLRejected as e:
+        finish_progress(progress, "Query not run")
+        return None, sql_rejected_message(e)
+    except QueryCancelled as e:
+        # Said on the progress message when it showed the Cancel button, else in a new one
+        notice = query_cancelled_message(e)
+        if finish_progress(progress, notice):
+            notice = None
+        return None, notice
+    except Exception:
+        finish_progress(progress, "Query failed")
+        raise
+    finish_progress(progress, ":white_check_mark: Query finished")
+    return result, None
+
+def query_progress(placeholder):
+    """QueryProgress that turns the placeholder message into a progress line with a Cancel button, or None without one."""
+    if not placeholder or not placeholder.get('ts'):
+        return None
+    streamer = SlackMessageStreamer(app.client, placeholder['channel'], placeholder['ts'], QUERY_PROGRESS_INTERVAL)
+    return QueryProgress(streamer, delay=QUERY_PROGRESS_DELAY)
+
+def finish_progress(progress, message) -> bool:
+    """Replace the progress line and Cancel button with message if they were ever shown; returns whether they were."""
+    if progress is None:
+        return False
+    if progress.shown:
+        progress.streamer.finish(text = message, blocks=notice_blocks(message))
+        return True
+    progress.streamer.finish()
+    return False
+
+def query_cancelled_message(e: QueryCancelled) -> str:
+    return f":octagonal_sign: {e}."
+
+def display_chart(df, say):
+    chart_img_url = chart_url(df)
+    if chart_img_url is not None:
+        say(text = "Chart", blocks=chart_blocks(chart_img_url))
+
+def chart_url(df):
+    """Permalink of df's chart image, or None when charts are off or df can't be charted."""
+    if not ENABLE_CHARTS or len(df.columns) <= 1:
+        return None
+    try:
+        return plot_chart(df)
+    except Exception as e:
+        error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+        print(f"Warning: Data likely not suitable for displaying as a chart. {error_info}")
+        return None
+
+# ===== Slack Blocks =====
+def sql_answer_blocks(result):
+    with metrics.timed("render"):
+        table = result.df.to_string()
+    blocks = [
+        {
+            "type": "rich_text",
+            "elements": [
                 {
-                    "type": "rich_text",
+                    "type": "rich_text_quote",
                     "elements": [
                         {
-                            "type": "rich_text_quote",
-                            "elements": [
-                                {
-                                    "type": "text",
-                                    "text": "Answer:",
-                                    "style": {
-                                        "bold": True
-                                    }
-                                }
-                            ]
-                        },
+                            "type": "text",
+                            "text": "Answer:",
+                            "style": {
+                                "bold": True
+                            }
+                        }
+                    ]
+                },
+                {
+                    "type": "rich_text_preformatted",
+                    "elements": [
                         {
-                            "type": "rich_text_preformatted",
-                            "elements": [
-                                {
-                                    "type": "text",
-                                    "text": f"{df.to_string()}"
-                                }
-                            ]
+                            "type": "text",
+                            "text": table
                         }
                     ]
                 }
             ]
-        )
-        if len(df.columns) > 1:
-            chart_img_url = None
-            try:
-                chart_img_url = None #plot_chart(df) Not required for now
-            except Exception as e:
-                error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
-                print(f"Warning: Data likely not suitable for displaying as a chart. {error_info}")
-            if chart_img_url is not None:
-                say(
-                    text = "Chart",
-                    blocks=[
+        }
+    ]
+    if result.has_prev or result.has_next:
+        blocks.append({
+            "type": "context",
+            "elements": [
+                {
+                    "type": "plain_text",
+                    "text": f"Rows {result.first_row:,}-{result.last_row:,} of {result.total_rows:,}"
+                }
+            ]
+        })
+        buttons = []
+        for action, label, offset in (("prev", "Prev page", max(result.offset - result.page_size, 0)), ("next", "Next page", result.last_row)):
+            if (action == "prev" and result.has_prev) or (action == "next" and result.has_next):
+                buttons.append({
+                    "type": "button",
+                    "action_id": f"result_page_{action}",
+                    "text": {
+                        "type": "plain_text",
+                        "text": label
+                    },
+                    "value": json.dumps({"qid": result.query_id, "offset": offset, "total": result.total_rows})
+                })
+        blocks.append({"type": "actions", "elements": buttons})
+    return blocks
+
+def text_answer_blocks(content):
+    return [
+        {
+            "type": "rich_text",
+            "elements": [
+                {
+                    "type": "rich_text_quote",
+                    "elements": [
                         {
-                            "type": "image",
-                            "title": {
-                                "type": "plain_text",
-                                "text": "Chart"
-                            },
-                            "block_id": "image",
-                            "slack_file": {
-                                "url": f"{chart_img_url}"
-                            },
-                            "alt_text": "Chart"
+                            "type": "text",
+                            "text": f"Answer: {content['text']}",
+                            "style": {
+                                "bold": True
+                            }
                         }
                     ]
-                )
-    else:
-        say(
-            text = "Answer:",
-            blocks = [
+                },
                 {
-                    "type": "rich_text",
+                    "type": "rich_text_quote",
                     "elements": [
                         {
-                            "type": "rich_text_quote",
-                            "elements": [
-                                {
-                                    "type": "text",
-                                    "text": f"Answer: {content['text']}",
-                                    "style": {
-                                        "bold": True
-                                    }
-                                }
-                            ]
-                        },
-                        {
-                            "type": "rich_text_quote",
-                            "elements": [
-                                {
-                                    "type": "text",
-                                    "text": f"* Citation: {content['citations']}",
-                                    "style": {
-                                        "italic": True
-                                    }
-                                }
-                            ]
+                            "type": "text",
+                            "text": f"* Citation: {content['citations']}",
+                            "style": {
+                                "italic": True
+                            }
                         }
                     ]
                 }
-            ]                
-        )
+            ]
+        }
+    ]
+
+def chart_blocks(chart_img_url):
+    return [
+        {
+            "type": "image",
+            "title": {
+                "type": "plain_text",
+                "text": "Chart"
+            },
+            "block_id": "image",
+            "slack_file": {
+                "url": f"{chart_img_url}"
+            },
+            "alt_text": "Chart"
+        }
+    ]
+
+def notice_blocks(message):
+    return [
+        {
+            "type": "divider"
+        },
+        {
+            "type": "section",
+            "text": {
+                "type": "plain_text",
+                "text": message,
+            }
+        },
+        {
+            "type": "divider"
+        },
+    ]
+
+WAIT_MESSAGE = ":snowflake: Snowflake Cortex AI is generating a response. Please wait..."
+BUSY_MESSAGE = ":hourglass: Too many questions in flight right now. Please try again in a moment."
+
+def rejected_message(e: AdmissionRejected) -> str:
+    return f":hourglass: {e.reason}. Please try again in {e.retry_after:.0f}s."
+
+def question_priority(event) -> int:
+    """0 for DMs and PRIORITY_CHANNELS, 1 for everything else; lower is served first."""
+    return 0 if event.get('channel_type') == 'im' or event.get('channel') in PRIORITY_CHANNELS else 1
 
 # ===== Slack Event Handler =====
 @app.event("message")
 def handle_message_events(ack, body, say):
+    ack()
+    observe_ack(body)
+    say = metrics.timed_calls("slack_post", say)
+    if not EVENT_DEDUP.should_process(body):
+        if DEBUG:
+            print(f"Skipped event {body.get('event_id')}: {EVENT_DEDUP.stats()}")
+        return
+    event = body['event']
+    prompt = event['text']
     try:
-        ack()
-        prompt = body['event']['text']
-        say(
-            text = "Snowflake Cortex AI is generating a response",
-            blocks=[
-                {
-                    "type": "divider"
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "plain_text",
-                        "text": ":snowflake: Snowflake Cortex AI is generating a response. Please wait...",
-                    }
-                },
-                {
-                    "type": "divider"
-                },
-            ]
-        )
+        ADMISSION.check(event.get('user'), event.get('channel'))
+    except AdmissionRejected as e:
+        print(f"Rate limited {event.get('user')} in {event.get('channel')}: {ADMISSION.stats()}")
+        say(text = "The bot is busy, please try again shortly", blocks=notice_blocks(rejected_message(e)))
+        return
+    # Keep answers in order within each channel/thread. A duplicate queued behind its original in the
+    # same channel is answered from the answer cache; duplicates across channels are coalesced in flight.
+    key = (event.get('channel'), event.get('thread_ts'))
+    task = profiled(answer_question, channel=event.get('channel'), ts=event.get('ts'))
+    if not WORKERS.submit(key, task, prompt, say, priority=question_priority(event)):
+        print(f"Worker queue full, rejecting message: {WORKERS.stats()}")
+        say(text = "The bot is busy, please try again shortly", blocks=notice_blocks(BUSY_MESSAGE))
+
+def answer_question(prompt, say):
+    try:
+        placeholder = say(text = "Snowflake Cortex AI is generating a response", blocks=notice_blocks(WAIT_MESSAGE))
+        if STREAM_RESPONSES:
+            return stream_answer(prompt, say, placeholder)
         response = ask_agent(prompt)
 
         # Optional Debug
         # print(response)
 
-        display_agent_response(response,say)
+        display_agent_response(response,say,placeholder)
     except Exception as e:
+        metrics.count_error("pipeline", e)
         error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
         print(error_info)
-        say(
-            text = "Request failed...",
-            blocks=[
-                {
-                    "type": "divider"
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "plain_text",
-                        "text": f"{error_info}",
-                    }
-                },
-                {
-                    "type": "divider"
-                },
-            ]
-        )        
+        say(text = "Request failed...", blocks=notice_blocks(f"{error_info}"))
+
+def profiled(fn, **labels):
+    """fn wrapped in the request profiler, or fn itself when profiling is off."""
+    if PROFILER is None:
+        return fn
+    def run(*args, **kwargs):
+        with PROFILER.profile(fn.__name__, **labels):
+            return fn(*args, **kwargs)
+    return run
+
+def observe_ack(body):
+    """Time from Slack creating the event to our ack, which Slack needs within 3 seconds."""
+    try:
+        metrics.observe("slack_ack", time.time() - float(body['event']['event_ts']))
+    except (KeyError, TypeError, ValueError):
+        pass
+
+@app.action(re.compile(r"^result_page_(prev|next)$"))
+def handle_result_page(ack, body, client):
+    ack()
+    channel = body['channel']['id']
+    ts = body['message']['ts']
+    # Its own lane per answer message, so a click doesn't wait behind the channel's questions; clicks
+    # on the same message still apply in order. Paging is a short cached read, so it goes first.
+    task = profiled(show_result_page, channel=channel, ts=ts)
+    if not WORKERS.submit(("result_page", channel, ts), task, client, channel, ts, body['actions'][0]['value'], priority=0):
+        print(f"Worker queue full, rejecting page click: {WORKERS.stats()}")
+        client.chat_postEphemeral(channel=channel, user=body['user']['id'], text="The bot is busy, please try again shortly", blocks=notice_blocks(BUSY_MESSAGE))
+
+@app.action("cancel_query")
+def handle_cancel_query(ack, body):
+    ack()
+    cancel_from_button(body)
+
+@app.event("reaction_added")
+def handle_reaction_added(ack, body):
+    ack()
+    cancel_from_reaction(body['event'])
+
+def cancel_from_button(body):
+    """Flag the query; the thread polling it cancels it in Snowflake within one poll."""
+    user = body.get('user', {}).get('id')
+    running = QUERIES.cancel(body['actions'][0]['value'], user)
+    if DEBUG:
+        print(f"Cancel requested by {user}: {running.query_id if running is not None else 'query already finished'}")
+
+def cancel_from_reaction(event):
+    item = event.get('item', {})
+    if event.get('reaction') not in CANCEL_REACTIONS or item.get('type') != 'message':
+        return
+    running = QUERIES.cancel_message(item.get('channel'), item.get('ts'), event.get('user'))
+    if running is not None:
+        if DEBUG:
+            print(f"Cancel requested by {event.get('user')} with :{event.get('reaction')}:: {running.query_id}")
+
+def show_result_page(client, channel, ts, value):
+    try:
+        page = json.loads(value)
+        result = fetch_result_page(page['qid'], int(page['offset']), int(page['total']))
+        client.chat_update(channel=channel, ts=ts, text="Answer:", blocks=sql_answer_blocks(result))
+    except Exception as e:
+        error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+        print(error_info)
+        client.chat_postMessage(channel=channel, thread_ts=ts, text="Could not load that page", blocks=notice_blocks(error_info))
+
+def stream_answer(prompt, say, placeholder):
+    """Edit the placeholder in place as the answer streams, instead of waiting for the last byte."""
+    streamer = SlackMessageStreamer(app.client, placeholder['channel'], placeholder['ts'], STREAM_UPDATE_INTERVAL)
+    try:
+        response = ask_agent(prompt, on_event=streamer.on_event)
+        if response['sql']:
+            result = run_streamed_sql(response['sql'], streamer)
+            if result is not None:
+                say(text = "Answer:", blocks=sql_answer_blocks(result))
+                display_chart(result.df, say)
+        else:
+            streamer.finish(text = "Answer:", blocks=text_answer_blocks(response))
+    except Exception:
+        streamer.finish()
+        raise
+
+def run_streamed_sql(sql, streamer):
+    """
+    execute_sql with its progress on the streamed message, which it finishes.
+    Returns the result, or None if the query was refused or cancelled (said on the message).
+    """
+    streamer.set_status(":hourglass_flowing_sand: Running SQL...")
+    try:
+        result = execute_sql(sql, QueryProgress(streamer, delay=QUERY_PROGRESS_DELAY))
+    except SQLRejected as e:
+        streamer.finish(text = "Query not run", blocks=notice_blocks(sql_rejected_message(e)))
+        return None
+    except QueryCancelled as e:
+        streamer.finish(text = "Query cancelled", blocks=notice_blocks(query_cancelled_message(e)))
+        return None
+    streamer.finish()
+    return result
 
 # ===== Optional Charting =====
 def plot_chart(df):
-    plt.figure(figsize=(10, 6), facecolor='#333333')
-
-    # plot pie chart with percentages, using dynamic column names
-    plt.pie(df[df.columns[1]], 
-            labels=df[df.columns[0]], 
-            autopct='%1.1f%%', 
-            startangle=90, 
-            colors=['#1f77b4', '#ff7f0e'], 
-            textprops={'color':"white",'fontsize': 16})
-
-    # ensure equal aspect ratio
-    plt.axis('equal')
-    # set the background color for the plot area to dark as well
-    plt.gca().set_facecolor('#333333')   
-    plt.tight_layout()
-
-    # save the chart as a .jpg file
-    file_path_jpg = 'pie_chart.jpg'
-    plt.savefig(file_path_jpg, format='jpg')
-    file_size = os.path.getsize(file_path_jpg)
-
-    # upload image file to slack
-    file_upload_url_response = app.client.files_getUploadURLExternal(filename=file_path_jpg,length=file_size)
-    if DEBUG:
-        print(file_upload_url_response)
-    file_upload_url = file_upload_url_response['upload_url']
-    file_id = file_upload_url_response['file_id']
-    with open(file_path_jpg, 'rb') as f:
-        response = requests.post(file_upload_url, files={'file': f})
-
-    # check the response
-    img_url = None
-    if response.status_code != 200:
-        print("File upload failed", response.text)
-    else:
-        # complete upload and get permalink to display
-        response = app.client.files_completeUploadExternal(files=[{"id":file_id, "title":"chart"}])
+    """Chart the first two columns of df and return the Slack permalink of the image."""
+    with metrics.timed("chart"):
+        return chart_service().chart_url(df)
+
+def chart_service():
+    """The ChartService, created (and matplotlib imported) on first use."""
+    global CHARTS
+    if CHARTS is None:
+        from charts import ChartService
+        CHARTS = ChartService(app.client, max_workers=CHART_WORKERS, debug=DEBUG)
+    return CHARTS
+
+# ===== Async Engine =====
+def start_async(mode):
+    """Serve Slack from an AsyncApp; Cortex waits are coroutines, Snowflake calls run on an executor."""
+    import asyncio
+    from slack_bolt.async_app import AsyncApp
+    from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+    from async_cortex_chat import AsyncCortexChat
+    from single_flight import AsyncSingleFlight
+
+    async_app = AsyncApp(token=SLACK_BOT_TOKEN)
+    async_cortex_app = AsyncCortexChat(
+        AGENT_ENDPOINT,
+        SEARCH_SERVICE,
+        SEMANTIC_MODEL,
+        MODEL,
+        ACCOUNT,
+        USER,
+        RSA_PRIVATE_KEY_PATH,
+        pool_size=CORTEX_POOL_SIZE,
+        connect_timeout=CORTEX_CONNECT_TIMEOUT,
+        read_timeout=CORTEX_READ_TIMEOUT
+    )
+    sql_executor = ThreadPoolExecutor(max_workers=SQL_EXECUTOR_THREADS, thread_name_prefix="snowflake")
+    inflight = asyncio.Semaphore(ASYNC_MAX_INFLIGHT)
+    agent_flights = AsyncSingleFlight("cortex")
+
+    async def ask_agent_async(prompt, on_event=None):
+        if ANSWER_CACHE_ENTRIES:
+            resp = ANSWER_CACHE.get(prompt)
+            if resp is not None:
+                return resp
+        resp = local_answer(prompt)
+        if resp is not None:
+            return resp
+        key = prompt_key(prompt) or prompt.strip()
+        async def call_agent_async():
+            loop = asyncio.get_running_loop()
+            resp, shared = None, False
+            if SHARED_ANSWERS is not None:
+                # Another replica's answer if it has one; waiting on its lock would hold up the loop, so that isn't shared here
+                resp = await loop.run_in_executor(None, SHARED_ANSWERS.get, key_digest(key))
+                shared = resp is not None
+            if resp is None:
+                resp = await async_cortex_app.chat(prompt, on_event=on_event, route=question_route(prompt))
+            if ANSWER_CACHE_ENTRIES and resp is not None:
+                ANSWER_CACHE.put(prompt, resp)
+            if SHARED_ANSWERS is not None and resp is not None and not shared:
+                await loop.run_in_executor(None, SHARED_ANSWERS.put, key_digest(key), resp)
+            return resp
+        # As in ask_agent, only the first asker's on_event sees the stream
+        resp = await agent_flights.do(key, call_agent_async)
         if DEBUG:
-            print(response)
-        img_url = response['files'][0]['permalink']
-        time.sleep(2)
-    
-    return img_url
+            print(f"Cortex coalescing: {agent_flights.stats()}")
+        return resp
+
+    async def answer_question_async(prompt, say):
+        try:
+            placeholder = await say(text = "Snowflake Cortex AI is generating a response", blocks=notice_blocks(WAIT_MESSAGE))
+            if STREAM_RESPONSES:
+                return await stream_answer_async(prompt, say, placeholder)
+            response = await ask_agent_async(prompt)
+            if response['sql']:
+                # Progress updates go through the sync client, from the executor / flusher threads
+                result, notice = await asyncio.get_running_loop().run_in_executor(
+                    sql_executor, execute_sql_with_progress, response['sql'], placeholder)
+                if notice is not None:
+                    await say(text = notice, blocks=notice_blocks(notice))
+                    return
+                await say(text = "Answer:", blocks=sql_answer_blocks(result))
+                await display_chart_async(result.df, say)
+            else:
+                await say(text = "Answer:", blocks=text_answer_blocks(response))
+        except Exception as e:
+            metrics.count_error("pipeline", e)
+            error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            print(error_info)
+            await say(text = "Request failed...", blocks=notice_blocks(f"{error_info}"))
+
+    async def stream_answer_async(prompt, say, placeholder):
+        """stream_answer on the event loop. The streamer's Slack calls are blocking, so finishing it runs on an executor."""
+        streamer = SlackMessageStreamer(app.client, placeholder['channel'], placeholder['ts'], STREAM_UPDATE_INTERVAL)
+        loop = asyncio.get_running_loop()
+        try:
+            response = await ask_agent_async(prompt, on_event=streamer.on_event)
+            if response['sql']:
+                result = await loop.run_in_executor(sql_executor, run_streamed_sql, response['sql'], streamer)
+                if result is not None:
+                    await say(text = "Answer:", blocks=sql_answer_blocks(result))
+                    await display_chart_async(result.df, say)
+            else:
+                await loop.run_in_executor(None, lambda: streamer.finish(text = "Answer:", blocks=text_answer_blocks(response)))
+        except Exception:
+            await loop.run_in_executor(None, streamer.finish)
+            raise
+
+    async def display_chart_async(df, say):
+        # Rendering waits on the chart processes and the upload on the sync client
+        chart_img_url = await asyncio.get_running_loop().run_in_executor(None, chart_url, df)
+        if chart_img_url is not None:
+            await say(text = "Chart", blocks=chart_blocks(chart_img_url))
+
+    @async_app.event("message")
+    async def handle_message_events_async(ack, body, say):
+        await ack()
+        observe_ack(body)
+        say = metrics.timed_async_calls("slack_post", say)
+        # Both may be a round trip to the shared state backend: run them off the event loop, on the default
+        # executor so they don't queue behind Snowflake queries on sql_executor
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, EVENT_DEDUP.should_process, body):
+            if DEBUG:
+                print(f"Skipped event {body.get('event_id')}: {EVENT_DEDUP.stats()}")
+            return
+        prompt = body['event']['text']
+        try:
+            await loop.run_in_executor(None, ADMISSION.check, body['event'].get('user'), body['event'].get('channel'))
+        except AdmissionRejected as e:
+            await say(text = "The bot is busy, please try again shortly", blocks=notice_blocks(rejected_message(e)))
+            return
+        if inflight.locked():
+            print(f"Async engine at {ASYNC_MAX_INFLIGHT} in-flight questions, rejecting message")
+            await say(text = "The bot is busy, please try again shortly", blocks=notice_blocks(BUSY_MESSAGE))
+            return
+        async with inflight:
+            await answer_question_async(prompt, say)
+
+    @async_app.action(re.compile(r"^result_page_(prev|next)$"))
+    async def handle_result_page_async(ack, body, client):
+        await ack()
+        channel = body['channel']['id']
+        ts = body['message']['ts']
+        try:
+            page = json.loads(body['actions'][0]['value'])
+            result = await asyncio.get_running_loop().run_in_executor(
+                sql_executor, fetch_result_page, page['qid'], int(page['offset']), int(page['total']))
+            await client.chat_update(channel=channel, ts=ts, text="Answer:", blocks=sql_answer_blocks(result))
+        except Exception as e:
+            error_info = f"{type(e).__name__} at line {e.__traceback__.tb_lineno} of {__file__}: {e}"
+            print(error_info)
+            await client.chat_postMessage(channel=channel, thread_ts=ts, text="Could not load that page", blocks=notice_blocks(error_info))
+
+    @async_app.action("cancel_query")
+    async def handle_cancel_query_async(ack, body):
+        await ack()
+        await asyncio.get_running_loop().run_in_executor(None, cancel_from_button, body)
+
+    @async_app.event("reaction_added")
+    async def handle_reaction_added_async(ack, body):
+        await ack()
+        await asyncio.get_running_loop().run_in_executor(None, cancel_from_reaction, body['event'])
+
+    if mode == "socket":
+        async def main():
+            try:
+                await AsyncSocketModeHandler(async_app, SLACK_APP_TOKEN).start_async()
+            finally:
+                await async_cortex_app.close()
+        asyncio.run(main())
+    else:
+        async_app.start(port=int(os.environ.get("PORT", 3000)))
 
 # ===== Init Function =====
 def init():
-    conn,jwt,cortex_app = None,None,None
+    global WORKERS
+    sf_pool,jwt,cortex_app = None,None,None
+    init_began = time.perf_counter()
+    timings = {"imports": IMPORTS_DONE - STARTUP_BEGAN}
 
-    conn = snowflake.connector.connect(
-        host=HOST,
-        account=ACCOUNT,
-        warehouse=WAREHOUSE,
-        role=ROLE,
-        user=USER,
-        authenticator="SNOWFLAKE_JWT",  
-        private_key_file=RSA_PRIVATE_KEY_PATH,
-        private_key_file_pwd=RSA_PRIVATE_KEY_PASSPHRASE,
-        login_timeout=60,
-        network_timeout=600,
-        socket_timeout=600
-    )
-    if not conn.rest.token:
-        print(">>>>>>>>>> Snowflake connection unsuccessful!")
+    if ENABLE_CHARTS:
+        # Fork the chart renderers while this is the only thread; everything below may start threads
+        started = time.perf_counter()
+        chart_service().start()
+        timings["charts"] = time.perf_counter() - started
+    WORKERS = KeyedWorkerPool(max_workers=min(WORKER_POOL_SIZE, MAX_CONCURRENT_PIPELINES), max_pending=WORKER_QUEUE_LIMIT)
 
     cortex_app = cortex_chat.CortexChat(
         AGENT_ENDPOINT, 
@@ -315,18 +1034,105 @@ def init():
         MODEL, 
         ACCOUNT,
         USER,
-        RSA_PRIVATE_KEY_PATH
+        RSA_PRIVATE_KEY_PATH,
+        pool_size=CORTEX_POOL_SIZE,
+        connect_timeout=CORTEX_CONNECT_TIMEOUT,
+        read_timeout=CORTEX_READ_TIMEOUT,
+        http2=CORTEX_HTTP2
     )
 
+    def connect_snowflake():
+        return SnowflakeConnectionPool(
+            get_snowflake_conn,
+            min_size=SNOWFLAKE_POOL_MIN,
+            max_size=SNOWFLAKE_POOL_MAX,
+            checkout_timeout=SNOWFLAKE_CHECKOUT_TIMEOUT,
+            max_age=SNOWFLAKE_CONN_MAX_AGE
+        )
+
+    def load_query_modules():
+        import query_results  # pandas, pyarrow and the connector's result types
+
+    # These mostly wait on the network, so they overlap well
+    steps = {
+        "snowflake": connect_snowflake,
+        # Shared with CortexChat; parses the key once and keeps the JWT refreshed in the background
+        "jwt": lambda: cortex_app.tokens,
+        "cortex_tls": cortex_app.warm,
+        "query_modules": load_query_modules,
+    }
+    if ROUTE_QUESTIONS:
+        steps["router"] = question_router
+    if ANSWER_CACHE_ENTRIES and ANSWER_CACHE_THRESHOLD < 1:
+        steps["answer_vocabulary"] = load_answer_vocabulary
+    if LOCAL_SEARCH is not None:
+        steps["local_search"] = load_local_search
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="init") as executor:
+        futures = {name: executor.submit(timed_step, step) for name, step in steps.items()}
+    results = {}
+    for name, future in futures.items():
+        results[name], timings[name] = future.result()
+    sf_pool, jwt = results["snowflake"], results["jwt"]
+    if sf_pool.min_size and not sf_pool.stats()["idle"]:
+        print(">>>>>>>>>> Snowflake connection unsuccessful!")
+
+    stats_sources = [
+        ("workers", WORKERS.stats),
+        ("admission", ADMISSION.stats),
+        ("event_dedup", EVENT_DEDUP.stats),
+        ("cortex_flights", AGENT_FLIGHTS.stats),
+        ("sql_flights", SQL_FLIGHTS.stats),
+        ("result_cache", RESULT_CACHE.stats),
+        ("answer_cache", ANSWER_CACHE.stats),
+        ("sql_guard", SQL_GUARD.stats),
+        ("queries", QUERIES.stats),
+        ("snowflake_pool", sf_pool.stats),
+        ("cortex_http", cortex_app.pool_stats),
+        ("jwt", jwt.stats),
+    ]
+    if CHARTS is not None:
+        stats_sources.append(("charts", CHARTS.stats))
+    if PROFILER is not None:
+        stats_sources.append(("profiler", PROFILER.stats))
+    if STATE is not None:
+        stats_sources.append(("state", STATE.stats))
+        stats_sources.append(("shared_answers", SHARED_ANSWERS.stats))
+        stats_sources.append(("shared_results", SHARED_RESULTS.stats))
+    if RESULT_CACHE_MB and RESULT_CACHE_WATCH_INTERVAL:
+        try:
+            watch_result_tables(sf_pool, semantic_model_tables(), RESULT_CACHE_WATCH_INTERVAL)
+        except Exception as e:
+            print(f"Could not watch the semantic models' tables: {type(e).__name__}: {e}")
+    if LOCAL_SEARCH is not None:
+        stats_sources.append(("local_search", LOCAL_SEARCH.stats))
+        # Checks the table's LAST_ALTERED every interval and re-reads the chunks only when it moved
+        LOCAL_SEARCH.start_refresh(sf_pool, LOCAL_SEARCH_TABLE, LOCAL_SEARCH_REFRESH, LOCAL_SEARCH_SNAPSHOT)
+    for name, stats in stats_sources:
+        metrics.register_stats(name, stats)
+
+    timings["init"] = time.perf_counter() - init_began
+    timings["total"] = time.perf_counter() - STARTUP_BEGAN
     print(">>>>>>>>>> Init complete")
-    return conn,jwt,cortex_app
+    print(">>>>>>>>>> Startup: " + " | ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    return sf_pool,jwt,cortex_app
+
+def timed_step(step):
+    """Run one init step; returns (result, seconds)."""
+    started = time.perf_counter()
+    return step(), time.perf_counter() - started
 
 # Start App Server
 if __name__ == "__main__":
-    CONN,JWT,CORTEX_APP = init()
-    Root = Root(CONN)
+    if BOT_ENGINE == "async" and PROFILER is not None:
+        # Async requests share the event loop's thread, so the profiler can't tell one from another
+        raise SystemExit("PROFILE_SAMPLE_RATE and PROFILE_SLOW_SECONDS need BOT_ENGINE=sync")
+    SF_POOL,JWT,CORTEX_APP = init()
+    if METRICS_PORT:
+        metrics.start(METRICS_PORT, METRICS_ADDR)
     mode = CONNECTION_MODE.lower()
-    if mode == "socket":
+    if BOT_ENGINE == "async":
+        start_async(mode)
+    elif mode == "socket":
         SocketModeHandler(app, SLACK_APP_TOKEN).start()
     else:
         app.start(port=int(os.environ.get("PORT", 3000)))
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import aiohttp
+import metrics
+from cortex_chat import CortexChat
+from sse_parser import SSEParser
+
+DEBUG = False
+
+class AsyncCortexChat(CortexChat):
+    """
+    asyncio counterpart of CortexChat. Builds the same request and returns the same
+    {"text", "sql", "citations"} answer, but streams the agent's SSE response over a shared
+    aiohttp session so many questions can wait on Cortex without holding a thread each.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # The session has to be created from inside the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                # Every concurrent stream holds a connection; the caller bounds concurrency.
+                connector=aiohttp.TCPConnector(limit=0),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._session
+
+    async def _post(self, data: dict[str, any], token: str) -> aiohttp.ClientResponse:
+        started = time.perf_counter()
+        response = await self._get_session().post(self.agent_url, headers=self._build_headers(token), json=data)
+        metrics.observe("cortex_ttfb", time.perf_counter() - started)
+        return response
+
+    async def _retrieve_response(self, query: str, limit=1, on_event=None, route=None) -> dict[str, any]:
+        data = self._build_request(query, limit, route)
+        with metrics.timed("jwt"):
+            # Signing a token takes the PEM key and a lock another thread may hold; keep it off the loop
+            token = await asyncio.to_thread(self.tokens.get_token)
+        response = await self._post(data, token)
+
+        if response.status == 401:  # Unauthorized - the token was rejected despite being refreshed ahead of expiry
+            print("JWT was rejected. Refreshing JWT...")
+            response.release()
+            token = await asyncio.to_thread(self.tokens.force_refresh, token)
+            print("New JWT generated. Sending new request to Cortex Agents API. Please wait...")
+            response = await self._post(data, token)
+
+        try:
+            if response.status == 200:
+                with metrics.timed("cortex_stream"):
+                    return await self._parse_response(response, on_event)
+            metrics.count_error("cortex", f"HTTP {response.status}")
+            body = await response.text()
+            print(f"Error: Received status code {response.status} with message {body}")
+            return None
+        finally:
+            response.release()
+
+    async def _parse_response(self, response: aiohttp.ClientResponse, on_event=None) -> dict[str, any]:
+        """Consume the SSE stream chunk by chunk as it arrives."""
+        accumulated = self._new_accumulator()
+        parser = SSEParser()
+        parse_seconds = 0.0
+
+        async for chunk in response.content.iter_any():
+            started = time.perf_counter()
+            self._feed(parser.feed_raw(chunk), accumulated, on_event)
+            parse_seconds += time.perf_counter() - started
+        self._feed(parser.close_raw(), accumulated, on_event)
+        metrics.observe("sse_parse", parse_seconds)
+
+        if DEBUG:
+            print(accumulated)
+        return self._summarize(accumulated)
+
+    async def chat(self, query: str, on_event=None, route=None) -> any:
+        response = await self._retrieve_response(query, on_event=on_event, route=route)
+        return response
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
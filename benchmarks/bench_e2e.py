@@ -0,0 +1,213 @@
+# End-to-end benchmark of the question pipeline with no Slack, Snowflake or Cortex account.
+# Starts the stand-ins from fakes.py, points app.py at them and drives, per question,
+#   ask_agent (CortexChat over HTTP/SSE) -> execute_sql (pool, Arrow fetch) -> display_agent_response
+# from --concurrency threads. Reports throughput and p50/p95/p99 latency, and exits non-zero on a
+# regression, either against absolute limits or against a baseline saved with --save.
+#
+#   python benchmarks/bench_e2e.py --requests 200 --concurrency 8 --save baseline.json
+#   python benchmarks/bench_e2e.py --requests 200 --concurrency 8 --baseline baseline.json --tolerance 0.15
+#   python benchmarks/bench_e2e.py --stream-file stream.sse --token-delay 0.02 --max-p95 3
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fakes import FakeCortexServer, FakeSlack, FakeSnowflake, TPCDS_QUERIES, split_events, synthetic_events
+
+def write_throwaway_key() -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    fd, path = tempfile.mkstemp(suffix=".p8")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    return path
+
+def import_app(cortex_url: str, key_path: str, caches: bool):
+    """Import app.py configured for the stand-ins. Must run before anything else imports it."""
+    os.environ.update({
+        "ACCOUNT": "BENCH",
+        "USER": "BENCH",
+        "RSA_PRIVATE_KEY_PATH": key_path,
+        "AGENT_ENDPOINT": cortex_url,
+        "MODEL": "bench",
+        "SEARCH_SERVICE": "BENCH.SEARCH",
+        "SLACK_BOT_TOKEN": "xoxb-bench",
+        "ENABLE_CHARTS": "false",
+        "STREAM_RESPONSES": "false",
+        "ANSWER_CACHE_ENTRIES": os.environ.get("ANSWER_CACHE_ENTRIES", "1000") if caches else "0",
+        "RESULT_CACHE_MB": os.environ.get("RESULT_CACHE_MB", "256") if caches else "0",
+    })
+    # App() verifies its token with auth.test at construction; answer that locally
+    from slack_sdk.web import WebClient
+    WebClient.auth_test = lambda self, **kwargs: {"ok": True, "user_id": "UBENCH", "bot_id": "BBENCH", "team_id": "TBENCH"}
+    import app
+    app.DEBUG = False
+    return app
+
+def make_workload(n: int, sql_ratio: float, seed: int) -> list[tuple[str, str]]:
+    """n (question, sql or None) pairs; sql_ratio of them are answered with a TPC-DS query."""
+    rng = random.Random(seed)
+    workload = []
+    for i in range(n):
+        if rng.random() < sql_ratio:
+            sql = rng.choice(TPCDS_QUERIES).format(year=rng.randint(1998, 2002))
+            workload.append((f"question {i}: revenue breakdown", sql))
+        else:
+            workload.append((f"question {i}: what does the supplier contract say about deliveries", None))
+    return workload
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def run(args) -> dict:
+    workload = make_workload(args.requests, args.sql_ratio, args.seed)
+    answers = dict(workload)
+    recorded = [split_events(open(path, "rb").read()) for path in args.stream_file]
+    replay = itertools.count()
+
+    def respond(question):
+        if recorded:
+            return recorded[next(replay) % len(recorded)]
+        return synthetic_events(question, answers.get(question), tokens=args.tokens)
+
+    cortex = FakeCortexServer(respond, ttfb=args.ttfb, token_delay=args.token_delay).start()
+    snowflake = FakeSnowflake(scale=args.scale, query_delay=args.query_delay)
+    slack = FakeSlack(post_delay=args.post_delay)
+    key_path = write_throwaway_key()
+    try:
+        app = import_app(cortex.url, key_path, args.caches)
+        from snowflake_pool import SnowflakeConnectionPool
+        from token_manager import get_token_manager
+        import cortex_chat
+
+        app.SF_POOL = SnowflakeConnectionPool(snowflake.connect, min_size=1, max_size=args.pool_size)
+        app.JWT = get_token_manager(app.ACCOUNT, app.USER, app.RSA_PRIVATE_KEY_PATH)
+        app.CORTEX_APP = cortex_chat.CortexChat(
+            app.AGENT_ENDPOINT, app.SEARCH_SERVICE, app.SEMANTIC_MODEL, app.MODEL,
+            app.ACCOUNT, app.USER, app.RSA_PRIVATE_KEY_PATH, pool_size=args.concurrency
+        )
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def one(question):
+            started = time.perf_counter()
+            try:
+                response = app.ask_agent(question)
+                app.display_agent_response(response, slack.say)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        # Warm the HTTP and Snowflake pools so the first requests don't carry connection setup
+        for question, _ in workload[:min(args.concurrency, len(workload))]:
+            one(question)
+        latencies.clear()
+        slack.posts.clear()
+        cortex.requests = snowflake.queries = 0
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(one, [question for question, _ in workload]))
+        wall = time.perf_counter() - started
+    finally:
+        cortex.stop()
+        os.remove(key_path)
+
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "mean": statistics.fmean(latencies) if latencies else 0.0,
+        "slack_posts": len(slack.posts),
+        "cortex_requests": cortex.requests,
+        "snowflake_queries": snowflake.queries,
+    }
+
+def regressions(result: dict, args) -> list[str]:
+    failures = []
+    if result["errors"]:
+        failures.append(f"{result['errors']} requests failed, e.g. {result['error_samples'][0]}")
+    for name in ("p50", "p95", "p99"):
+        limit = getattr(args, f"max_{name}")
+        if limit is not None and result[name] > limit:
+            failures.append(f"{name} {result[name]:.3f}s > {limit:.3f}s")
+    if args.min_throughput is not None and result["throughput"] < args.min_throughput:
+        failures.append(f"throughput {result['throughput']:.2f}/s < {args.min_throughput:.2f}/s")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for name in ("p50", "p95", "p99"):
+            if result[name] > baseline[name] * (1 + args.tolerance):
+                failures.append(f"{name} {result[name]:.3f}s is over {args.tolerance:.0%} above baseline {baseline[name]:.3f}s")
+        if result["throughput"] < baseline["throughput"] * (1 - args.tolerance):
+            failures.append(f"throughput {result['throughput']:.2f}/s is over {args.tolerance:.0%} below baseline {baseline['throughput']:.2f}/s")
+    return failures
+
+def main():
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('--requests', type=int, default=200)
+    cli_parser.add_argument('--concurrency', type=int, default=8, help='Questions in flight at once.')
+    cli_parser.add_argument('--sql-ratio', type=float, default=0.7, help='Share of questions answered with SQL rather than search.')
+    cli_parser.add_argument('--seed', type=int, default=1)
+    cli_parser.add_argument('--stream-file', action='append', default=[], help='Recorded Cortex SSE body to replay instead of synthetic streams. May be repeated.')
+    cli_parser.add_argument('--tokens', type=int, default=40, help='Text deltas per synthetic stream.')
+    cli_parser.add_argument('--ttfb', type=float, default=0.2, help='Fake Cortex delay before the response starts, seconds.')
+    cli_parser.add_argument('--token-delay', type=float, default=0.005, help='Fake Cortex delay between SSE events, seconds.')
+    cli_parser.add_argument('--scale', type=float, default=1.0, help='TPC-DS-shaped data size; 1.0 is 200k store_sales rows.')
+    cli_parser.add_argument('--query-delay', type=float, default=0.0, help='Extra fake warehouse latency per query, seconds.')
+    cli_parser.add_argument('--post-delay', type=float, default=0.0, help='Fake Slack API latency per post, seconds.')
+    cli_parser.add_argument('--pool-size', type=int, default=4, help='Snowflake connection pool size.')
+    cli_parser.add_argument('--caches', action='store_true', help='Keep the answer and result caches on (off by default so every question does the full work).')
+    cli_parser.add_argument('--max-p50', type=float)
+    cli_parser.add_argument('--max-p95', type=float)
+    cli_parser.add_argument('--max-p99', type=float)
+    cli_parser.add_argument('--min-throughput', type=float, help='Questions per second.')
+    cli_parser.add_argument('--baseline', help='JSON written by an earlier --save run to compare against.')
+    cli_parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression against --baseline.')
+    cli_parser.add_argument('--save', help='Write this run\'s results as JSON, e.g. to use as a baseline.')
+    args = cli_parser.parse_args()
+
+    result = run(args)
+    print(f"{result['requests']} questions, concurrency {result['concurrency']}: "
+          f"{result['throughput']:.2f} q/s | p50 {result['p50'] * 1000:.0f} ms | p95 {result['p95'] * 1000:.0f} ms | "
+          f"p99 {result['p99'] * 1000:.0f} ms | errors {result['errors']}")
+    print(f"Cortex requests {result['cortex_requests']}, Snowflake queries {result['snowflake_queries']}, Slack posts {result['slack_posts']}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failures = regressions(result, args)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
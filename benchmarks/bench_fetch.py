@@ -0,0 +1,88 @@
+# Fetch-path benchmark against a live Snowflake account (credentials from .env, as for app.py).
+# Compares wall time and peak RSS of:
+#   read_sql      - pd.read_sql(sql, conn), the generic DB-API row path execute_sql used to take
+#   arrow_all     - cursor.fetch_pandas_all(), the whole result through Arrow
+#   arrow_batches - fetch_engine.fetch_frame(), Arrow batches stopped after --rows rows
+# Each method runs in a fresh process so peak RSS isn't polluted by the previous one.
+#
+#   python benchmarks/bench_fetch.py --sql "SELECT * FROM STORE_SALES LIMIT 1000000" --rows 20
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+METHODS = ("read_sql", "arrow_all", "arrow_batches")
+
+def connect():
+    import snowflake.connector
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT, ".env"))
+    return snowflake.connector.connect(
+        host=os.getenv("HOST"),
+        account=os.getenv("ACCOUNT"),
+        warehouse=os.getenv("WAREHOUSE"),
+        role=os.getenv("USER_ROLE"),
+        user=os.getenv("USER"),
+        database=os.getenv("DATABASE"),
+        schema=os.getenv("SEMANTIC_VIEW_SCHEMA"),
+        authenticator="SNOWFLAKE_JWT",
+        private_key_file=os.getenv("RSA_PRIVATE_KEY_PATH"),
+        private_key_file_pwd=os.getenv("RSA_PRIVATE_KEY_PASSPHRASE"),
+        session_parameters={"USE_CACHED_RESULT": True},
+    )
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def run(method: str, sql: str, rows: int, max_bytes: int, queue):
+    import pandas as pd
+    from fetch_engine import fetch_frame
+
+    conn = connect()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if method == "read_sql":
+        df = pd.read_sql(sql, conn)
+    else:
+        cur = conn.cursor()
+        cur.execute(sql)
+        if method == "arrow_all":
+            df = cur.fetch_pandas_all()
+        else:
+            df = fetch_frame(cur, rows, max_bytes)
+    elapsed = time.perf_counter() - start
+    queue.put((method, elapsed, peak_rss_mb() - baseline, len(df), len(df.columns)))
+    conn.close()
+
+def main():
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('--sql', default="SELECT * FROM STORE_SALES LIMIT 1000000", help='Query to fetch; defaults to a wide STORE_SALES slice.')
+    cli_parser.add_argument('--rows', type=int, default=20, help='Row cap for the batch path (what the Slack renderer shows).')
+    cli_parser.add_argument('--max-bytes', type=int, default=None, help='Optional Arrow byte cap for the batch path.')
+    cli_parser.add_argument('--method', action='append', choices=METHODS, help='Methods to run. Defaults to all.')
+    cli_parser.add_argument('--repeat', type=int, default=3, help='Runs per method; the best wall time is reported.')
+    args = cli_parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    for method in args.method or METHODS:
+        best = None
+        for _ in range(args.repeat):
+            queue = ctx.Queue()
+            proc = ctx.Process(target=run, args=(method, args.sql, args.rows, args.max_bytes, queue))
+            proc.start()
+            result = queue.get()
+            proc.join()
+            if best is None or result[1] < best[1]:
+                best = result
+        name, elapsed, rss, nrows, ncols = best
+        print(f"{name:14s} {elapsed * 1000:10.1f} ms  peak RSS +{rss:8.1f} MB  {nrows:>10,} rows x {ncols} cols")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# Throughput of N bot replicas sharing state through STATE_BACKEND_URL, with the stand-ins from fakes.py.
+# One fake Cortex server is shared; each replica is its own process with its own Snowflake stand-in
+# (a warehouse serves replicas independently) and --concurrency worker threads. Every event is
+# delivered to --copies replicas, the way a Slack retry can land on a different connection, and
+# each replica answers only the events it claims through EVENT_DEDUP, as handle_message_events does.
+# For each replica count it reports throughput, scaling against the first count, and how many
+# events were answered more than once (0 means every event was claimed exactly once).
+#
+#   docker run --rm -p 6379:6379 valkey/valkey    (or redis-server)
+#   python benchmarks/bench_replicas.py --state-url redis://localhost:6379/0 --replicas 1,2,4 --requests 400
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_e2e import import_app, make_workload, percentile, write_throwaway_key
+from fakes import FakeCortexServer, FakeSlack, FakeSnowflake, synthetic_events
+
+def replica(index: int, args, cortex_url: str, key_path: str, prefix: str, events: list[dict], ready, go, results):
+    """One bot process: answers the events it claims and reports (answered event IDs, latencies, errors)."""
+    os.environ.update({"STATE_BACKEND_URL": args.state_url or "", "STATE_KEY_PREFIX": prefix, "REPLICA_ID": f"bench-{index}"})
+    app = import_app(cortex_url, key_path, args.caches)
+    from snowflake_pool import SnowflakeConnectionPool
+    from token_manager import get_token_manager
+    import cortex_chat
+
+    snowflake = FakeSnowflake(scale=args.scale, query_delay=args.query_delay)
+    slack = FakeSlack(post_delay=args.post_delay)
+    app.SF_POOL = SnowflakeConnectionPool(snowflake.connect, min_size=1, max_size=args.pool_size)
+    app.JWT = get_token_manager(app.ACCOUNT, app.USER, app.RSA_PRIVATE_KEY_PATH)
+    app.CORTEX_APP = cortex_chat.CortexChat(
+        app.AGENT_ENDPOINT, app.SEARCH_SERVICE, app.SEMANTIC_MODEL, app.MODEL,
+        app.ACCOUNT, app.USER, app.RSA_PRIVATE_KEY_PATH, pool_size=args.concurrency
+    )
+    # Warm the pools with questions outside the workload, then start with the other replicas
+    for i in range(args.concurrency):
+        app.ask_agent(f"warm-up {index} {i}")
+    ready.put(index)
+    go.wait()
+
+    answered, latencies, errors = [], [], []
+    lock = threading.Lock()
+
+    def one(body):
+        started = time.perf_counter()
+        if not app.EVENT_DEDUP.should_process(body):
+            return
+        try:
+            response = app.ask_agent(body['event']['text'])
+            app.display_agent_response(response, slack.say)
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+            return
+        with lock:
+            answered.append(body['event_id'])
+            latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(one, events))
+    results.put((answered, latencies, errors, snowflake.queries))
+
+def run_replicas(n: int, args, cortex, key_path: str, workload: list[tuple[str, str]]) -> dict:
+    prefix = f"bench-{uuid.uuid4().hex[:8]}:"  # fresh claims, buckets and caches for every run
+    events = [
+        {"event_id": f"Ev{i:06d}", "event": {"type": "message", "text": question, "user": f"U{i % 50:03d}",
+                                             "channel": "CBENCH", "ts": f"{1700000000 + i}.000100"}}
+        for i, (question, _) in enumerate(workload)
+    ]
+    # Event i goes to replicas i, i+1, ... (mod n); every replica sees its events in workload order
+    deliveries = [[] for _ in range(n)]
+    for i, event in enumerate(events):
+        for copy in range(min(args.copies, n)):
+            deliveries[(i + copy) % n].append(event)
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    processes = [
+        ctx.Process(target=replica, args=(index, args, cortex.url, key_path, prefix, deliveries[index], ready, go, results))
+        for index in range(n)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get(timeout=300)
+    cortex.requests = 0
+    started = time.perf_counter()
+    go.set()
+    reports = [results.get() for _ in processes]
+    wall = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    answered = [event_id for report in reports for event_id in report[0]]
+    latencies = sorted(seconds for report in reports for seconds in report[1])
+    errors = [error for report in reports for error in report[2]]
+    return {
+        "replicas": n,
+        "events": len(events),
+        "answered": len(set(answered)),
+        "answered_twice": len(answered) - len(set(answered)),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "throughput": len(answered) / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "cortex_requests": cortex.requests,
+        "snowflake_queries": sum(report[3] for report in reports),
+    }
+
+def main():
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('--state-url', help='STATE_BACKEND_URL shared by the replicas, e.g. redis://localhost:6379/0. Without it each replica claims every event itself.')
+    cli_parser.add_argument('--replicas', default='1,2,4', help='Comma-separated replica counts to run.')
+    cli_parser.add_argument('--copies', type=int, default=2, help='Replicas each event is delivered to.')
+    cli_parser.add_argument('--requests', type=int, default=400)
+    cli_parser.add_argument('--concurrency', type=int, default=8, help='Worker threads per replica.')
+    cli_parser.add_argument('--sql-ratio', type=float, default=0.7)
+    cli_parser.add_argument('--seed', type=int, default=1)
+    cli_parser.add_argument('--tokens', type=int, default=40)
+    cli_parser.add_argument('--ttfb', type=float, default=0.2)
+    cli_parser.add_argument('--token-delay', type=float, default=0.005)
+    cli_parser.add_argument('--scale', type=float, default=0.2, help='TPC-DS-shaped data size per replica.')
+    cli_parser.add_argument('--query-delay', type=float, default=0.0)
+    cli_parser.add_argument('--post-delay', type=float, default=0.0)
+    cli_parser.add_argument('--pool-size', type=int, default=4)
+    cli_parser.add_argument('--caches', action='store_true', help='Keep the answer and result caches on.')
+    cli_parser.add_argument('--min-efficiency', type=float, help='Fail if throughput per replica falls below this share of the first run\'s.')
+    cli_parser.add_argument('--save', help='Write the results as JSON.')
+    args = cli_parser.parse_args()
+
+    workload = make_workload(args.requests, args.sql_ratio, args.seed)
+    answers = dict(workload)
+    cortex = FakeCortexServer(lambda question: synthetic_events(question, answers.get(question), tokens=args.tokens),
+                              ttfb=args.ttfb, token_delay=args.token_delay).start()
+    key_path = write_throwaway_key()
+    runs, failures = [], []
+    try:
+        for n in [int(count) for count in args.replicas.split(',')]:
+            result = run_replicas(n, args, cortex, key_path, workload)
+            base = runs[0] if runs else result
+            result["efficiency"] = (result["throughput"] / result["replicas"]) / (base["throughput"] / base["replicas"])
+            runs.append(result)
+            print(f"{n} replicas: {result['throughput']:.2f} q/s (x{result['throughput'] / base['throughput']:.2f}, "
+                  f"efficiency {result['efficiency']:.0%}) | p50 {result['p50'] * 1000:.0f} ms | p95 {result['p95'] * 1000:.0f} ms | "
+                  f"answered {result['answered']}/{result['events']}, twice {result['answered_twice']} | errors {result['errors']}")
+            if result["errors"]:
+                failures.append(f"{n} replicas: {result['errors']} requests failed, e.g. {result['error_samples'][0]}")
+            if args.state_url and result["answered_twice"]:
+                failures.append(f"{n} replicas: {result['answered_twice']} events answered more than once")
+            if args.min_efficiency is not None and result["efficiency"] < args.min_efficiency:
+                failures.append(f"{n} replicas: efficiency {result['efficiency']:.0%} < {args.min_efficiency:.0%}")
+    finally:
+        cortex.stop()
+        os.remove(key_path)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(runs, f, indent=2)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
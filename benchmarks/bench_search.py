@@ -0,0 +1,187 @@
+# Latency and recall of the in-process search tier (local_search.py), on its own and against the
+# Cortex Search service it mirrors.
+# Chunks come from a snapshot the bot wrote (--snapshot) or straight from PARSED_PDFS (--table).
+# Questions come from --questions (one per line) or are generated from the chunks (--generate N): a
+# sentence of a random chunk with some words dropped, so the chunk it came from is the right answer.
+# With --service, every question is also sent to the Cortex Search service through SEARCH_PREVIEW:
+#   recall@k   - share of Cortex's top-k chunks that are also in the local top-k
+#   top1       - local and Cortex rank the same document first
+#   precision  - of the questions the local tier would answer, how often it cites the document Cortex ranks first
+#
+#   python benchmarks/bench_search.py --snapshot local_search.json.gz --generate 300
+#   python benchmarks/bench_search.py --table SEMANTIC_DATABASE.DASH_SCHEMA.PARSED_PDFS \
+#       --service SEMANTIC_DATABASE.DASH_SCHEMA.VEHICLES_INFO --questions questions.txt --save search.json
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from local_search import Chunk, LocalSearch, fetch_chunks, load_snapshot
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[A-Za-z0-9%$']+")
+
+def generate_questions(chunks: list[Chunk], n: int, drop: float, seed: int) -> list[tuple[str, Chunk]]:
+    """n (question, source chunk) pairs made of a sentence of the chunk with a drop fraction of its words removed."""
+    rng = random.Random(seed)
+    questions = []
+    while len(questions) < n:
+        chunk = rng.choice(chunks)
+        sentences = [s for s in _SENTENCE.split(chunk.page_content) if len(_WORD.findall(s)) >= 6]
+        if not sentences:
+            continue
+        words = [w for w in _WORD.findall(rng.choice(sentences)) if rng.random() >= drop]
+        questions.append((' '.join(words[:20]), chunk))
+    return questions
+
+def cortex_search(conn, service: str, question: str, k: int) -> list[tuple[str, str]]:
+    """(relative_path, page_content) of the service's top k results."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT SNOWFLAKE.CORTEX.SEARCH_PREVIEW(%s, %s)",
+            (service, json.dumps({"query": question, "columns": ["relative_path", "page_content"], "limit": k}))
+        )
+        results = json.loads(cur.fetchone()[0]).get("results", [])
+    finally:
+        cur.close()
+    results = [{key.lower(): value for key, value in result.items()} for result in results]
+    return [(result.get("relative_path"), (result.get("page_content") or "").strip()) for result in results]
+
+def chunk_key(chunk: Chunk) -> tuple[str, str]:
+    return chunk.relative_path, chunk.page_content.strip()
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+def latency_summary(seconds: list[float]) -> dict:
+    seconds = sorted(seconds)
+    return {
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "p99_ms": percentile(seconds, 0.99) * 1000,
+        "mean_ms": statistics.fmean(seconds) * 1000 if seconds else 0.0,
+    }
+
+def run(args) -> dict:
+    conn = None
+    if args.table or args.service:
+        from bench_fetch import connect
+        conn = connect()
+    if args.snapshot:
+        chunks, version = load_snapshot(args.snapshot)
+    else:
+        chunks, version = fetch_chunks(conn, args.table), None
+
+    search = LocalSearch(min_score=args.min_score, min_coverage=args.min_coverage, min_margin=args.min_margin)
+    started = time.perf_counter()
+    search.load(chunks, version)
+    build = time.perf_counter() - started
+    index = search.index
+    index_bytes = sum(a.itemsize * len(a) for a in (index.offsets, index.doc_ids, index.tfs, index.idf, index.norms))
+
+    if args.questions:
+        with open(args.questions) as f:
+            workload = [(line.strip(), None) for line in f if line.strip()]
+    else:
+        workload = generate_questions(chunks, args.generate, args.drop, args.seed)
+
+    local_seconds, cortex_seconds = [], []
+    known_hits = {1: 0, args.k: 0}
+    recall, top1, answered, judged, correct = [], 0, 0, 0, 0
+    for question, source in workload:
+        started = time.perf_counter()
+        hits = search.hits(question, args.k)
+        confident = search.confident(hits)
+        local_seconds.append(time.perf_counter() - started)
+        local = [chunk_key(hit.chunk) for hit in hits]
+        answered += confident
+
+        if source is not None:
+            # Known-item recall; adjacent chunks overlap, so the same sentence may sit in two of them
+            for k in known_hits:
+                known_hits[k] += chunk_key(source) in local[:k]
+            if confident and args.service is None:
+                judged += 1
+                correct += hits[0].chunk.relative_path == source.relative_path
+
+        if args.service:
+            started = time.perf_counter()
+            reference = cortex_search(conn, args.service, question, args.k)
+            cortex_seconds.append(time.perf_counter() - started)
+            if reference:
+                recall.append(len(set(reference) & set(local)) / len(reference))
+                same_top = bool(hits) and hits[0].chunk.relative_path == reference[0][0]
+                top1 += same_top
+                if confident:
+                    judged += 1
+                    correct += same_top
+
+    n = len(workload)
+    result = {
+        "chunks": len(chunks),
+        "terms": index.stats()["terms"],
+        "index_kb": index_bytes / 1024,
+        "build_s": build,
+        "questions": n,
+        "local": latency_summary(local_seconds),
+        "answered": answered / n if n else 0.0,
+        "precision": correct / judged if judged else None,
+    }
+    if not args.questions:
+        result["known_recall@1"] = known_hits[1] / n if n else 0.0
+        result[f"known_recall@{args.k}"] = known_hits[args.k] / n if n else 0.0
+    if args.service:
+        result["cortex"] = latency_summary(cortex_seconds)
+        result[f"recall@{args.k}"] = statistics.fmean(recall) if recall else 0.0
+        result["top1_agreement"] = top1 / n if n else 0.0
+    if conn is not None:
+        conn.close()
+    return result
+
+def main():
+    cli_parser = argparse.ArgumentParser()
+    source = cli_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshot', help='Snapshot written by the bot (LOCAL_SEARCH_SNAPSHOT).')
+    source.add_argument('--table', help='Read the chunks from this DATABASE.SCHEMA.TABLE, e.g. PARSED_PDFS.')
+    cli_parser.add_argument('--service', help='Cortex Search service to compare against, e.g. SEMANTIC_DATABASE.DASH_SCHEMA.VEHICLES_INFO.')
+    cli_parser.add_argument('--questions', help='File with one question per line; otherwise questions are generated from the chunks.')
+    cli_parser.add_argument('--generate', type=int, default=200, help='Number of questions to generate.')
+    cli_parser.add_argument('--drop', type=float, default=0.3, help='Share of a sentence\'s words dropped from a generated question.')
+    cli_parser.add_argument('--seed', type=int, default=1)
+    cli_parser.add_argument('--k', type=int, default=5, help='Results compared per question.')
+    cli_parser.add_argument('--min-score', type=float, default=5.0, help='As LOCAL_SEARCH_MIN_SCORE.')
+    cli_parser.add_argument('--min-coverage', type=float, default=0.75, help='As LOCAL_SEARCH_MIN_COVERAGE.')
+    cli_parser.add_argument('--min-margin', type=float, default=1.25, help='As LOCAL_SEARCH_MIN_MARGIN.')
+    cli_parser.add_argument('--save', help='Write the results as JSON.')
+    args = cli_parser.parse_args()
+
+    result = run(args)
+    local = result["local"]
+    print(f"{result['chunks']} chunks, {result['terms']} terms, index {result['index_kb']:.0f} KB built in {result['build_s'] * 1000:.0f} ms")
+    print(f"Local: p50 {local['p50_ms']:.3f} ms | p95 {local['p95_ms']:.3f} ms | p99 {local['p99_ms']:.3f} ms over {result['questions']} questions")
+    precision = "n/a" if result["precision"] is None else f"{result['precision']:.1%}"
+    print(f"Answered locally: {result['answered']:.1%}, citation precision {precision}")
+    if "known_recall@1" in result:
+        print(f"Known-item recall@1 {result['known_recall@1']:.1%} | recall@{args.k} {result[f'known_recall@{args.k}']:.1%}")
+    if args.service:
+        cortex = result["cortex"]
+        print(f"Cortex Search: p50 {cortex['p50_ms']:.0f} ms | p95 {cortex['p95_ms']:.0f} ms | p99 {cortex['p99_ms']:.0f} ms")
+        print(f"Recall@{args.k} vs Cortex {result[f'recall@{args.k}']:.1%} | top-1 document agreement {result['top1_agreement']:.1%}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
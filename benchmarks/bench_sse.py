@@ -0,0 +1,115 @@
+# Micro-benchmark for the Cortex SSE parser.
+# Compares the line-by-line parser CortexChat used to have (decode + json.loads per line, text += delta)
+# against sse_parser.parse_cortex_stream, the path CortexChat uses now, on recorded or synthetic
+# multi-megabyte streams. The legacy parser always uses json; sse_parser uses orjson when it is installed.
+#
+# Record a real stream with e.g.
+#   curl -sN -X POST "$AGENT_ENDPOINT" -H "Authorization: Bearer $JWT" -H "X-Snowflake-Authorization-Token-Type: KEYPAIR_JWT" \
+#        -H "Content-Type: application/json" -d @payload.json > stream.sse
+# then run:
+#   python benchmarks/bench_sse.py --file stream.sse --chunk-size 512 --chunk-size 16384
+#
+# On synthetic 4 and 8 MB streams (1 CPU, best of 7) sse_parser measured 1.1-1.5x the legacy speed
+# with json and 1.4-2.0x with orjson; runs vary by about 20% there, so re-measure before relying on it.
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sse_parser import parse_cortex_stream, _loads
+
+def synthetic_stream(size_mb: float) -> bytes:
+    """A message.delta stream of ~size_mb: many small text deltas plus a few large tool results."""
+    parts = []
+    total = 0
+    target = int(size_mb * 1024 * 1024)
+    i = 0
+    while total < target:
+        if i % 500 == 499:
+            rows = [{"text": f"Clause {j}: " + "lorem ipsum " * 20, "doc_title": "Contract", "doc_id": f"doc{j}.pdf"} for j in range(20)]
+            content = [{"type": "tool_results", "tool_results": {"content": [{"json": {"searchResults": rows}}]}}]
+        else:
+            content = [{"type": "text", "text": f"token{i} "}]
+        line = b"data: " + json.dumps({"id": "msg_1", "object": "message.delta", "delta": {"content": content}}).encode() + b"\n\n"
+        parts.append(line)
+        total += len(line)
+        i += 1
+    parts.append(b"data: [DONE]\n\n")
+    return b"".join(parts)
+
+def chunked(raw: bytes, size: int):
+    for i in range(0, len(raw), size):
+        yield raw[i:i + size]
+
+def iter_lines(chunks):
+    """requests.Response.iter_lines equivalent."""
+    pending = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        if lines and lines[-1] and chunk and lines[-1][-1] == chunk[-1]:
+            pending = lines.pop()
+        else:
+            pending = None
+        yield from lines
+    if pending is not None:
+        yield pending
+
+def legacy_parse(chunks) -> tuple[int, int]:
+    text = ''
+    tool_results = []
+    for line in iter_lines(chunks):
+        if not line:
+            continue
+        line = line.decode('utf-8')
+        if not line.startswith('data: '):
+            continue
+        json_str = line[6:].strip()
+        if json_str == '[DONE]':
+            continue
+        data = json.loads(json_str)
+        if data.get('object') == 'message.delta':
+            for entry in data.get('delta', {}).get('content', []):
+                if entry.get('type') == 'text':
+                    text += entry.get('text', '')
+                elif entry.get('type') == 'tool_results':
+                    tool_results.append(entry.get('tool_results', {}))
+    return len(text), len(tool_results)
+
+def parser_parse(chunks) -> tuple[int, int]:
+    accumulated = parse_cortex_stream(chunks)
+    return len(''.join(accumulated['text'])), len(accumulated['tool_results'])
+
+def bench(fn, raw: bytes, chunk_size: int, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(chunked(raw, chunk_size))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('--file', action='append', default=[], help='Recorded raw SSE response body. May be repeated.')
+    cli_parser.add_argument('--size-mb', type=float, default=4, help='Size of the synthetic stream used when no --file is given.')
+    cli_parser.add_argument('--chunk-size', type=int, action='append', default=[], help='Network chunk size in bytes. May be repeated.')
+    cli_parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the best time is reported.')
+    args = cli_parser.parse_args()
+
+    streams = [(path, open(path, 'rb').read()) for path in args.file] or [(f"synthetic {args.size_mb} MB", synthetic_stream(args.size_mb))]
+    chunk_sizes = args.chunk_size or [512, 16384]
+    print(f"JSON decoder: {'orjson' if _loads.__module__ == 'orjson' else 'json'}")
+    for name, raw in streams:
+        assert legacy_parse(chunked(raw, 65536)) == parser_parse(chunked(raw, 65536)), "parsers disagree"
+        mb = len(raw) / (1024 * 1024)
+        for chunk_size in chunk_sizes:
+            legacy = bench(legacy_parse, raw, chunk_size, args.repeat)
+            new = bench(parser_parse, raw, chunk_size, args.repeat)
+            print(f"{name} ({mb:.1f} MB, {chunk_size} B chunks): legacy {legacy * 1000:8.1f} ms {mb / legacy:7.1f} MB/s | "
+                  f"sse_parser {new * 1000:8.1f} ms {mb / new:7.1f} MB/s | speedup {legacy / new:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# Local stand-ins for the three services the bot talks to, for benchmarks that must run offline:
+#   FakeCortexServer - HTTP server speaking the Cortex Agents SSE protocol, replaying recorded or
+#                      synthetic streams with configurable time-to-first-byte and token pacing
+#   FakeSlack        - records say()/chat_update calls the way Bolt's say and WebClient return them
+#   FakeSnowflake    - DB-API-ish connection over an in-memory SQLite loaded with TPC-DS-shaped
+#                      tables, with fetch_arrow_batches, sfqid, RESULT_SCAN paging and
+#                      execute_async / query status polling / SYSTEM$CANCEL_QUERY
+import enum
+import itertools
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ===== Cortex Agents =====
+def split_events(raw: bytes) -> list[bytes]:
+    """Split a recorded SSE body into its events, each keeping its blank-line terminator."""
+    events = re.split(rb"(?<=\n\n)", raw.replace(b"\r\n", b"\n"))
+    return [event for event in events if event.strip()]
+
+def _delta(content: list) -> bytes:
+    return b"data: " + json.dumps({"id": "msg_1", "object": "message.delta", "delta": {"content": content}}).encode() + b"\n\n"
+
+def synthetic_events(question: str, sql: str = None, tokens: int = 40) -> list[bytes]:
+    """A Cortex-shaped stream: text deltas, a tool_use, then tool_results carrying SQL or search results."""
+    events = [_delta([{"type": "text", "text": f"word{i} "}]) for i in range(tokens)]
+    if sql is not None:
+        events.append(_delta([{"type": "tool_use", "tool_use": {"name": "supply_chain", "input": {"query": question}}}]))
+        events.append(_delta([{"type": "tool_results", "tool_results": {"content": [{"json": {"sql": sql, "text": "SQL generated"}}]}}]))
+    else:
+        events.append(_delta([{"type": "tool_use", "tool_use": {"name": "vehicles_info_search", "input": {"query": question}}}]))
+        results = [{"text": "Clause 4.2: deliveries are due within 30 days. " * 5, "doc_title": "Supplier contract", "doc_id": "contract.pdf"}]
+        events.append(_delta([{"type": "tool_results", "tool_results": {"content": [{"json": {"searchResults": results}}]}}]))
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+class FakeCortexServer:
+    """
+    Serves POSTs on any path as a chunked text/event-stream. The response for a question comes from
+    respond(question) -> list of raw SSE events, e.g. recorded streams split with split_events.
+    Each event is written as its own chunk after token_delay seconds, after an initial ttfb delay.
+    """
+    def __init__(self, respond, ttfb: float = 0.2, token_delay: float = 0.01, port: int = 0):
+        self.respond = respond
+        self.ttfb = ttfb
+        self.token_delay = token_delay
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so the client's connection pool is exercised
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                question = body.get("messages", [{}])[-1].get("content", [{}])[0].get("text", "")
+                events = server.respond(question)
+                time.sleep(server.ttfb)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for event in events:
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-cortex", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/api/v2/cortex/agent:run"
+
+    def start(self) -> "FakeCortexServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+# ===== Slack =====
+class FakeSlack:
+    """Records what the bot posts. say is thread-safe and returns the ts of the new message, like Bolt's."""
+    def __init__(self, channel: str = "CBENCH", post_delay: float = 0.0):
+        self.channel = channel
+        self.post_delay = post_delay
+        self.posts = []
+        self.updates = []
+        self._ts = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def say(self, text: str = "", blocks: list = None, **kwargs) -> dict:
+        if self.post_delay:
+            time.sleep(self.post_delay)
+        with self._lock:
+            ts = f"{time.time():.0f}.{next(self._ts):06d}"
+            self.posts.append({"ts": ts, "text": text, "blocks": blocks, "at": time.perf_counter()})
+        return {"ok": True, "channel": self.channel, "ts": ts}
+
+    def chat_postMessage(self, channel: str, text: str = "", blocks: list = None, **kwargs) -> dict:
+        return self.say(text=text, blocks=blocks)
+
+    def chat_update(self, channel: str, ts: str, text: str = "", blocks: list = None, **kwargs) -> dict:
+        if self.post_delay:
+            time.sleep(self.post_delay)
+        with self._lock:
+            self.updates.append({"ts": ts, "text": text, "blocks": blocks, "at": time.perf_counter()})
+        return {"ok": True, "channel": channel, "ts": ts}
+
+# ===== Snowflake =====
+CATEGORIES = ["Books", "Children", "Electronics", "Home", "Jewelry", "Men", "Music", "Shoes", "Sports", "Women"]
+STATES = ["CA", "TX", "NY", "WA", "GA", "IL", "OH", "TN", "MI", "NC"]
+
+def load_tpcds(db: sqlite3.Connection, scale: float = 1.0, seed: int = 7):
+    """
+    TPC-DS-shaped star schema (store_sales with item, store, customer and date_dim dimensions).
+    scale 1.0 is 200k fact rows; the data is random, only the shape and the queries are TPC-DS-like.
+    """
+    rng = random.Random(seed)
+    n_items, n_stores, n_customers, n_sales = 2000, 50, 10000, int(200000 * scale)
+    db.executescript("""
+        CREATE TABLE date_dim (d_date_sk INTEGER PRIMARY KEY, d_date TEXT, d_year INTEGER, d_moy INTEGER, d_qoy INTEGER);
+        CREATE TABLE item (i_item_sk INTEGER PRIMARY KEY, i_item_id TEXT, i_category TEXT, i_brand TEXT, i_current_price REAL);
+        CREATE TABLE store (s_store_sk INTEGER PRIMARY KEY, s_store_name TEXT, s_state TEXT);
+        CREATE TABLE customer (c_customer_sk INTEGER PRIMARY KEY, c_first_name TEXT, c_last_name TEXT, c_birth_country TEXT);
+        CREATE TABLE store_sales (ss_sold_date_sk INTEGER, ss_item_sk INTEGER, ss_customer_sk INTEGER, ss_store_sk INTEGER,
+                                  ss_quantity INTEGER, ss_sales_price REAL, ss_net_paid REAL, ss_net_profit REAL);
+    """)
+    dates = [(i, f"{1998 + i // 365}-{(i % 365) // 31 + 1:02d}-{(i % 31) + 1:02d}", 1998 + i // 365, (i % 365) // 31 + 1, ((i % 365) // 92) + 1)
+             for i in range(365 * 5)]
+    db.executemany("INSERT INTO date_dim VALUES (?, ?, ?, ?, ?)", dates)
+    db.executemany("INSERT INTO item VALUES (?, ?, ?, ?, ?)",
+                   [(i, f"AAAA{i:08d}", rng.choice(CATEGORIES), f"brand #{rng.randint(1, 100)}", round(rng.uniform(1, 300), 2)) for i in range(n_items)])
+    db.executemany("INSERT INTO store VALUES (?, ?, ?)", [(i, f"store {i}", rng.choice(STATES)) for i in range(n_stores)])
+    db.executemany("INSERT INTO customer VALUES (?, ?, ?, ?)",
+                   [(i, f"first{i}", f"last{i}", rng.choice(["UNITED STATES", "CANADA", "MEXICO", "GERMANY"])) for i in range(n_customers)])
+    sales = []
+    for _ in range(n_sales):
+        quantity = rng.randint(1, 100)
+        price = round(rng.uniform(1, 200), 2)
+        sales.append((rng.randrange(len(dates)), rng.randrange(n_items), rng.randrange(n_customers), rng.randrange(n_stores),
+                      quantity, price, round(quantity * price, 2), round(quantity * price * rng.uniform(-0.2, 0.4), 2)))
+    db.executemany("INSERT INTO store_sales VALUES (?, ?, ?, ?, ?, ?, ?, ?)", sales)
+    db.execute("CREATE INDEX ss_item ON store_sales (ss_item_sk)")
+    db.execute("CREATE INDEX ss_date ON store_sales (ss_sold_date_sk)")
+    db.commit()
+
+# Questions the fake agent answers with SQL, in SQLite's dialect (which these queries share with Snowflake)
+TPCDS_QUERIES = [
+    "SELECT i_category, SUM(ss_net_paid) AS revenue FROM store_sales JOIN item ON ss_item_sk = i_item_sk "
+    "JOIN date_dim ON ss_sold_date_sk = d_date_sk WHERE d_year = {year} GROUP BY i_category ORDER BY revenue DESC",
+    "SELECT s_state, COUNT(*) AS sales, SUM(ss_net_profit) AS profit FROM store_sales JOIN store ON ss_store_sk = s_store_sk "
+    "JOIN date_dim ON ss_sold_date_sk = d_date_sk WHERE d_year = {year} GROUP BY s_state ORDER BY profit DESC",
+    "SELECT d_moy, SUM(ss_quantity) AS units FROM store_sales JOIN date_dim ON ss_sold_date_sk = d_date_sk "
+    "WHERE d_year = {year} GROUP BY d_moy ORDER BY d_moy",
+    "SELECT c_last_name, c_first_name, SUM(ss_net_paid) AS spent FROM store_sales JOIN customer ON ss_customer_sk = c_customer_sk "
+    "JOIN date_dim ON ss_sold_date_sk = d_date_sk WHERE d_year = {year} GROUP BY c_customer_sk ORDER BY spent DESC LIMIT 100",
+    "SELECT i_item_id, i_brand, ss_quantity, ss_net_paid FROM store_sales JOIN item ON ss_item_sk = i_item_sk "
+    "JOIN date_dim ON ss_sold_date_sk = d_date_sk WHERE d_year = {year} AND d_moy = 1",
+]
+
+class FakeSnowflake:
+    """
+    Factory for connections to one shared in-memory TPC-DS database; pass connect to SnowflakeConnectionPool.
+    Results are materialized at execute() so rowcount, sfqid and RESULT_SCAN behave like Snowflake's.
+    """
+    def __init__(self, scale: float = 1.0, query_delay: float = 0.0, arrow_batch_rows: int = 10000):
+        self.uri = f"file:tpcds-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.query_delay = query_delay
+        self.arrow_batch_rows = arrow_batch_rows
+        self.results = {}  # query id -> (description, rows), for RESULT_SCAN
+        self.statuses = {}  # query id -> FakeQueryStatus of queries submitted with execute_async
+        self.errors = {}  # query id -> exception a failed or cancelled async query raises on its status check
+        self.cancels = {}  # query id -> Event set by SYSTEM$CANCEL_QUERY
+        self.queries = 0
+        self._keepalive = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        load_tpcds(self._keepalive, scale)
+
+    def connect(self) -> "FakeConnection":
+        return FakeConnection(self)
+
+class FakeConnection:
+    def __init__(self, server: FakeSnowflake):
+        self.server = server
+        self.db = sqlite3.connect(server.uri, uri=True, check_same_thread=False)
+        self._closed = False
+
+    def cursor(self) -> "FakeCursor":
+        return FakeCursor(self)
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def get_query_status_throw_if_error(self, query_id: str) -> "FakeQueryStatus":
+        status = self.server.statuses[query_id]
+        if status in (FakeQueryStatus.FAILED_WITH_ERROR, FakeQueryStatus.ABORTED):
+            raise self.server.errors[query_id]
+        return status
+
+    def is_still_running(self, status: "FakeQueryStatus") -> bool:
+        return status in (FakeQueryStatus.QUEUED, FakeQueryStatus.RUNNING)
+
+    def close(self):
+        self._closed = True
+        self.db.close()
+
+_RESULT_SCAN = re.compile(r"^\s*SELECT \* FROM TABLE\(RESULT_SCAN\(%s\)\) LIMIT %s OFFSET %s\s*$", re.IGNORECASE)
+_EXPLAIN = re.compile(r"^\s*EXPLAIN USING JSON\s", re.IGNORECASE)
+_CANCEL = re.compile(r"^\s*SELECT SYSTEM\$CANCEL_QUERY\(%s\)\s*$", re.IGNORECASE)
+
+FakeQueryStatus = enum.Enum("FakeQueryStatus", "QUEUED RUNNING SUCCESS FAILED_WITH_ERROR ABORTED")
+
+class FakeCancelled(Exception):
+    errno = 604  # what the connector reports for a cancelled statement
+
+class FakeCursor:
+    def __init__(self, conn: FakeConnection):
+        self.conn = conn
+        self.description = None
+        self.rowcount = None
+        self.sfqid = None
+        self._rows = []
+        self._pos = 0
+
+    def execute(self, sql: str, params=None, timeout: int = None) -> "FakeCursor":
+        self._load(str(uuid.uuid4()), *self._run(sql, params))
+        return self
+
+    def execute_async(self, sql: str, params=None, timeout: int = None) -> dict:
+        """Run sql on a background thread with its own SQLite connection; poll it via the connection."""
+        server = self.conn.server
+        query_id = str(uuid.uuid4())
+        server.statuses[query_id] = FakeQueryStatus.RUNNING
+        server.cancels[query_id] = cancel = threading.Event()
+
+        def run():
+            worker = FakeCursor(server.connect())
+            try:
+                server.results[query_id] = worker._run(sql, params, cancel)
+                server.statuses[query_id] = FakeQueryStatus.SUCCESS
+            except Exception as e:
+                server.errors[query_id] = e
+                server.statuses[query_id] = FakeQueryStatus.ABORTED if cancel.is_set() else FakeQueryStatus.FAILED_WITH_ERROR
+            finally:
+                worker.conn.close()
+
+        threading.Thread(target=run, name=f"fake-query-{query_id[:8]}", daemon=True).start()
+        self.sfqid = query_id
+        return {"queryId": query_id}
+
+    def get_results_from_sfqid(self, query_id: str):
+        self._load(query_id, *self.conn.server.results[query_id])
+
+    def _run(self, sql: str, params=None, cancel: threading.Event = None) -> tuple[list, list]:
+        server = self.conn.server
+        server.queries += 1
+        match = _RESULT_SCAN.match(sql)
+        if match:
+            query_id, limit, offset = params
+            description, rows = server.results[query_id]
+            return description, rows[offset:offset + limit]
+        if _EXPLAIN.match(sql):
+            # SQLite has no partition statistics; report a trivially small scan
+            plan = {"GlobalStats": {"partitionsTotal": 1, "partitionsAssigned": 1, "bytesAssigned": 0}}
+            return [("content",)], [(json.dumps(plan),)]
+        if _CANCEL.match(sql):
+            query_id, = params
+            if query_id in server.cancels:
+                server.cancels[query_id].set()
+            return [("content",)], [("Identified SQL statement is being canceled.",)]
+        if server.query_delay:
+            # Warehouse queueing / compilation; SYSTEM$CANCEL_QUERY cuts it short
+            if cancel is None:
+                time.sleep(server.query_delay)
+            elif cancel.wait(server.query_delay):
+                raise FakeCancelled("SQL execution canceled")
+        cur = self.conn.db.execute(sql.replace("%s", "?").rstrip().rstrip(";"), params or ())
+        return cur.description, cur.fetchall()
+
+    def _load(self, query_id: str, description: list, rows: list):
+        self.sfqid = query_id
+        self.conn.server.results[query_id] = (description, rows)
+        self.description = [(col[0].upper(),) + tuple(col[1:]) for col in description] if description else []
+        self.rowcount = len(rows)
+        self._rows = rows
+        self._pos = 0
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self) -> list:
+        rows, self._pos = self._rows[self._pos:], len(self._rows)
+        return rows
+
+    def fetchmany(self, size: int) -> list:
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetch_arrow_batches(self):
+        import pyarrow as pa
+        names = [col[0] for col in self.description]
+        while self._pos < len(self._rows):
+            rows = self.fetchmany(self.conn.server.arrow_batch_rows)
+            yield pa.table({name: [row[i] for row in rows] for i, name in enumerate(names)})
+
+    def close(self):
+        self._rows = []
@@ -0,0 +1,161 @@
+import hashlib
+import io
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import requests
+
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f']
+BACKGROUND = '#333333'
+
+def choose_chart_kind(df: pd.DataFrame) -> str:
+    """Pie for a handful of non-negative slices, bar otherwise."""
+    values = pd.to_numeric(df[df.columns[1]], errors='coerce')
+    if len(df) <= len(COLORS) and (values >= 0).all():
+        return 'pie'
+    return 'bar'
+
+def chart_key(df: pd.DataFrame, kind: str) -> str:
+    """Content hash of the plotted data and chart type; equal data gives an equal key regardless of object identity."""
+    digest = hashlib.sha256(kind.encode())
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+def render_chart(df: pd.DataFrame, kind: str) -> bytes:
+    """
+    Render the first two columns of df to PNG bytes. Uses the object-oriented Figure API with an Agg
+    canvas, so there is no shared pyplot state and no file on disk; safe to run in worker processes.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(10, 6), facecolor=BACKGROUND)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_facecolor(BACKGROUND)
+    labels = df[df.columns[0]].astype(str)
+    values = pd.to_numeric(df[df.columns[1]], errors='coerce').fillna(0)
+
+    if kind == 'pie':
+        # pie chart with percentages, using dynamic column names
+        ax.pie(values,
+               labels=labels,
+               autopct='%1.1f%%',
+               startangle=90,
+               colors=COLORS,
+               textprops={'color': "white", 'fontsize': 16})
+        # ensure equal aspect ratio
+        ax.axis('equal')
+    else:
+        ax.bar(labels, values, color=COLORS[0])
+        ax.set_xlabel(str(df.columns[0]), color='white')
+        ax.set_ylabel(str(df.columns[1]), color='white')
+        ax.tick_params(colors='white')
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment('right')
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', facecolor=BACKGROUND)
+    return buf.getvalue()
+
+class ChartService:
+    """
+    Renders charts in a process pool and uploads them to Slack, reusing the permalink of an earlier
+    upload when the same data and chart type come up again. Instead of sleeping after an upload it
+    polls files.info until Slack has finished processing the image.
+    """
+    def __init__(self, client, max_workers: int = 2, cache_entries: int = 256,
+                 render_timeout: float = 30, ready_timeout: float = 10, debug: bool = False):
+        self.client = client
+        self.max_workers = max_workers
+        self.cache_entries = cache_entries
+        self.render_timeout = render_timeout
+        self.ready_timeout = ready_timeout
+        self.debug = debug
+        self._pool = None
+        self._http = requests.Session()
+        self._permalinks = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn and forkserver workers re-import the main module (app.py, which connects to
+                # Slack on import), so fork. A thread holding a lock when we fork leaves it held in the
+                # child: start() must run while the process has only its main thread.
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("fork"))
+            return self._pool
+
+    def start(self):
+        """Fork the render workers now, before the caller starts any thread, rather than on the first chart."""
+        if threading.active_count() > 1:
+            print(f"Warning: forking chart workers with {threading.active_count() - 1} other threads running")
+        self._executor().submit(int).result()
+
+    def chart_url(self, df: pd.DataFrame, kind: str = None) -> str:
+        """Permalink of a chart for df, rendering and uploading it only if this exact chart isn't cached."""
+        kind = kind or choose_chart_kind(df)
+        key = chart_key(df, kind)
+        with self._lock:
+            url = self._permalinks.get(key)
+            if url is not None:
+                self._permalinks.move_to_end(key)
+                self._hits += 1
+                return url
+            self._misses += 1
+
+        image = self._executor().submit(render_chart, df, kind).result(timeout=self.render_timeout)
+        url = self._upload(image, f"chart-{key[:12]}.png")
+        if url is not None:
+            with self._lock:
+                self._permalinks[key] = url
+                while len(self._permalinks) > self.cache_entries:
+                    self._permalinks.popitem(last=False)
+        return url
+
+    def _upload(self, image: bytes, filename: str) -> str:
+        file_upload_url_response = self.client.files_getUploadURLExternal(filename=filename, length=len(image))
+        if self.debug:
+            print(file_upload_url_response)
+        file_upload_url = file_upload_url_response['upload_url']
+        file_id = file_upload_url_response['file_id']
+        response = self._http.post(file_upload_url, files={'file': (filename, image, 'image/png')}, timeout=30)
+        if response.status_code != 200:
+            print("File upload failed", response.text)
+            return None
+
+        # complete upload and get permalink to display
+        response = self.client.files_completeUploadExternal(files=[{"id": file_id, "title": "chart"}])
+        if self.debug:
+            print(response)
+        self._wait_until_ready(file_id)
+        return response['files'][0]['permalink']
+
+    def _wait_until_ready(self, file_id: str):
+        """Poll files.info with backoff until Slack has generated the image's thumbnails."""
+        deadline = time.monotonic() + self.ready_timeout
+        delay = 0.1
+        while time.monotonic() < deadline:
+            info = self.client.files_info(file=file_id)['file']
+            if info.get('original_w') or any(k.startswith('thumb_') for k in info):
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+        print(f"Chart {file_id} still processing after {self.ready_timeout}s, posting anyway")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"cached": len(self._permalinks), "hits": self._hits, "misses": self._misses}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
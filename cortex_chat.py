@@ -1,7 +1,11 @@
 import requests
 import json
-import generate_jwt
-from generate_jwt import JWTGenerator
+import threading
+import time
+import metrics
+from token_manager import get_token_manager
+from http_session import AgentHTTPSession
+from sse_parser import SSEParser, accumulate_cortex, new_accumulator
 
 DEBUG = False
 
@@ -13,7 +17,11 @@ class CortexChat:
             model: str, 
             account: str,
             user: str,
-            private_key_path: str
+            private_key_path: str,
+            pool_size: int = 10,
+            connect_timeout: float = 10,
+            read_timeout: float = 300,
+            http2: bool = False
         ):
         self.agent_url = agent_url
         self.model = model
@@ -22,17 +30,76 @@ class CortexChat:
         self.account = account
         self.user = user
         self.private_key_path = private_key_path
-        self.jwt = JWTGenerator(self.account, self.user, self.private_key_path).get_token()
-
-    def _retrieve_response(self, query: str, limit=1) -> dict[str, any]:
-        url = self.agent_url
-        headers = {
+        self._tokens = None
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+        self._http = None
+        self._http_lock = threading.Lock()
+
+    @property
+    def http(self) -> AgentHTTPSession:
+        """Keep-alive session shared by every question this instance asks; opened on first use."""
+        if self._http is None:
+            with self._http_lock:
+                if self._http is None:
+                    self._http = AgentHTTPSession(self.pool_size, self.connect_timeout, self.read_timeout, self.http2)
+        return self._http
+
+    @property
+    def tokens(self):
+        """The process-wide TokenManager for this account/user; the key is loaded on first use."""
+        if self._tokens is None:
+            self._tokens = get_token_manager(self.account, self.user, self.private_key_path)
+        return self._tokens
+
+    def pool_stats(self) -> dict[str, int]:
+        return self.http.stats()
+
+    def warm(self) -> bool:
+        """Pre-open a connection to the agent endpoint, e.g. during startup."""
+        return self.http.warm(self.agent_url)
+
+    def _build_headers(self, token: str = None) -> dict[str, str]:
+        return {
             'X-Snowflake-Authorization-Token-Type': 'KEYPAIR_JWT',
             'Content-Type': 'application/json',
             'Accept': 'application/json',
-            'Authorization': f"Bearer {self.jwt}"
+            'Authorization': f"Bearer {token or self.tokens.get_token()}"
         }
-        data = {
+
+    def _build_request(self, query: str, limit=1, route=None) -> dict[str, any]:
+        """
+        :param route: Optional tool_router.Route. Without one both tools are sent with the
+            default semantic model and the agent decides which to use.
+        """
+        tools = []
+        tool_resources = {}
+        if route is None or route.search:
+            tools.append({
+                "tool_spec": {
+                    "type": "cortex_search",
+                    "name": "vehicles_info_search"
+                }
+            })
+            tool_resources["vehicles_info_search"] = {
+                "name": self.search_service,
+                "max_results": limit,
+                "title_column": "title",
+                "id_column": "relative_path",
+            }
+        if route is None or route.analyst:
+            tools.append({
+                "tool_spec": {
+                    "type": "cortex_analyst_text_to_sql",
+                    "name": "supply_chain"
+                }
+            })
+            tool_resources["supply_chain"] = {
+                "semantic_model_file": (route.semantic_model if route is not None else None) or self.semantic_model
+            }
+        return {
             "model": self.model,
             "messages": [
             {
@@ -45,119 +112,71 @@ class CortexChat:
                 ]
             }
             ],
-            "tools": [
-                {
-                    "tool_spec": {
-                        "type": "cortex_search",
-                        "name": "vehicles_info_search"
-                    }
-                },
-                {
-                    "tool_spec": {
-                        "type": "cortex_analyst_text_to_sql",
-                        "name": "supply_chain"
-                    }
-                }
-            ],
-            "tool_resources": {
-                "vehicles_info_search": {
-                    "name": self.search_service,
-                    "max_results": limit,
-                    "title_column": "title",
-                    "id_column": "relative_path",
-                },
-                "supply_chain": {
-                    "semantic_model_file": self.semantic_model
-                }
-            },
+            "tools": tools,
+            "tool_resources": tool_resources,
         }
-        response = requests.post(url, headers=headers, json=data)
-
-        if response.status_code == 401:  # Unauthorized - likely expired JWT
-            print("JWT has expired. Generating new JWT...")
-            # Generate new token
-            self.jwt = JWTGenerator(self.account, self.user, self.private_key_path).get_token()
-            # Retry the request with the new token
-            headers["Authorization"] = f"Bearer {self.jwt}"
-            print("New JWT generated. Sending new request to Cortex Agents API. Please wait...")
-            response = requests.post(url, headers=headers, json=data)
 
+    def _retrieve_response(self, query: str, limit=1, on_event=None, route=None) -> dict[str, any]:
+        url = self.agent_url
+        with metrics.timed("jwt"):
+            token = self.tokens.get_token()
+        headers = self._build_headers(token)
+        data = self._build_request(query, limit, route)
+        started = time.perf_counter()
+        with self.http.post(url, headers, data) as response:
+            metrics.observe("cortex_ttfb", time.perf_counter() - started)
+            if response.status_code != 401:
+                return self._handle_response(response, on_event)
+
+        # Unauthorized - the token was rejected despite being refreshed ahead of expiry
+        print("JWT was rejected. Refreshing JWT...")
+        headers = self._build_headers(self.tokens.force_refresh(token))
+        print("New JWT generated. Sending new request to Cortex Agents API. Please wait...")
+        with self.http.post(url, headers, data) as response:
+            return self._handle_response(response, on_event)
+
+    def _handle_response(self, response: requests.Response, on_event=None) -> dict[str, any]:
         if DEBUG:
             print(response.text)
         if response.status_code == 200:
-            return self._parse_response(response)
+            with metrics.timed("cortex_stream"):
+                return self._parse_response(response, on_event)
         else:
+            metrics.count_error("cortex", f"HTTP {response.status_code}")
             print(f"Error: Received status code {response.status_code} with message {response.json()}")
             return None
 
-    def _parse_delta_content(self,content: list) -> dict[str, any]:
-        """Parse different types of content from the delta."""
-        result = {
-            'text': '',
-            'tool_use': [],
-            'tool_results': []
-        }
-        
-        for entry in content:
-            entry_type = entry.get('type')
-            if entry_type == 'text':
-                result['text'] += entry.get('text', '')
-            elif entry_type == 'tool_use':
-                result['tool_use'].append(entry.get('tool_use', {}))
-            elif entry_type == 'tool_results':
-                result['tool_results'].append(entry.get('tool_results', {}))
-        
-        return result
-
-    def _process_sse_line(self,line: str) -> dict[str, any]:
-        """Process a single SSE line and return parsed content."""
-        if not line.startswith('data: '):
-            return {}
-        try:
-            json_str = line[6:].strip()  # Remove 'data: ' prefix
-            if json_str == '[DONE]':
-                return {'type': 'done'}
-                
-            data = json.loads(json_str)
-            if data.get('object') == 'message.delta':
-                delta = data.get('delta', {})
-                if 'content' in delta:
-                    return {
-                        'type': 'message',
-                        'content': self._parse_delta_content(delta['content'])
-                    }
-            return {'type': 'other', 'data': data}
-        except json.JSONDecodeError:
-            return {'type': 'error', 'message': f'Failed to parse: {line}'}
-    
-    def _parse_response(self,response: requests.Response) -> dict[str, any]:
-        """Parse and print the SSE chat response with improved organization."""
-        accumulated = {
-            'text': '',
-            'tool_use': [],
-            'tool_results': [],
-            'other': []
-        }
-
-        for line in response.iter_lines():
-            if line:
-                result = self._process_sse_line(line.decode('utf-8'))
-                
-                if result.get('type') == 'message':
-                    content = result['content']
-                    accumulated['text'] += content['text']
-                    accumulated['tool_use'].extend(content['tool_use'])
-                    accumulated['tool_results'].extend(content['tool_results'])
-                elif result.get('type') == 'other':
-                    accumulated['other'].append(result['data'])
-
-        text = ''
+    def _parse_response(self,response: requests.Response, on_event=None) -> dict[str, any]:
+        """
+        Parse and print the SSE chat response with improved organization.
+        :param on_event: Optional callback invoked as on_event(kind, value) while the stream is read,
+            with kind "text" for each text delta and "tool_use" for each tool the agent invokes.
+        """
+        accumulated = self._new_accumulator()
+        parser = SSEParser()
+        parse_seconds = 0.0
+
+        for chunk in response.iter_content(chunk_size=None):
+            started = time.perf_counter()
+            self._feed(parser.feed_raw(chunk), accumulated, on_event)
+            parse_seconds += time.perf_counter() - started
+        self._feed(parser.close_raw(), accumulated, on_event)
+        metrics.observe("sse_parse", parse_seconds)
+
+        return self._summarize(accumulated)
+
+    def _feed(self, events, accumulated: dict[str, any], on_event=None):
+        accumulate_cortex(events, accumulated, on_event)
+
+    def _new_accumulator(self) -> dict[str, any]:
+        return new_accumulator()
+
+    def _summarize(self, accumulated: dict[str, any]) -> dict[str, any]:
+        """Reduce the accumulated stream into the text/sql/citations answer."""
+        text = ''.join(accumulated['text'])
         sql = ''
         citations = ''
 
-        if accumulated['text']:
-            text = accumulated['text']
-
         if DEBUG:
             print("\n=== Complete Response ===")
 
@@ -192,6 +211,6 @@ class CortexChat:
 
         return {"text": text, "sql": sql, "citations": citations}
        
-    def chat(self, query: str) -> any:
-        response = self._retrieve_response(query)
+    def chat(self, query: str, on_event=None, route=None) -> any:
+        response = self._retrieve_response(query, on_event=on_event, route=route)
         return response
@@ -1,5 +1,8 @@
 USE SCHEMA DASH_SCHEMA;
 
+-- Builds everything from scratch. To add, change or remove PDFs afterwards, run `python ingest.py`,
+-- which uploads, parses and re-chunks only the files that changed.
+
 create or replace table PARSE_PDFS as 
     select 
         relative_path, 
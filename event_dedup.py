@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Message subtypes that carry a new question from a person; everything else (edits, deletes,
+# joins, bot posts, ...) is ignored before any work starts.
+ANSWERABLE_SUBTYPES = frozenset({None, "file_share", "thread_broadcast"})
+
+class InMemoryDedupStore:
+    """Bounded set of recently seen keys that forgets them after ttl seconds."""
+    def __init__(self, max_entries: int = 10000, ttl: float = 10 * 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add_if_absent(self, key: str) -> bool:
+        """Record key; True if it was not already present (i.e. the caller is the first to see it)."""
+        now = time.monotonic()
+        with self._lock:
+            # Entries are in insertion order, so expired ones are at the front
+            while self._seen:
+                oldest, expires = next(iter(self._seen.items()))
+                if expires > now:
+                    break
+                del self._seen[oldest]
+            if key in self._seen:
+                return False
+            self._seen[key] = now + self.ttl
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._seen)
+
+class SharedDedupStore:
+    """
+    add_if_absent on a shared StateBackend, which makes it a work claim between replicas: of all the
+    replicas an event (or a retry of it) reaches, only the first to add its key answers it.
+    The claim records which replica took it, for debugging.
+    """
+    def __init__(self, backend, ttl: float = 10 * 60, owner: str = ""):
+        self.backend = backend
+        self.ttl = ttl
+        self.owner = owner.encode()
+
+    def add_if_absent(self, key: str) -> bool:
+        return self.backend.add(f"dedup:{key}", self.owner, self.ttl)
+
+class EventDeduplicator:
+    """
+    Decides whether a Slack event should start the answer pipeline. Drops bot posts and
+    non-question subtypes, and events already seen under the same ID, which is what Slack
+    sends again when it retries a delivery it thinks was not acknowledged in time.
+    The store only needs add_if_absent(key) -> bool, so a shared store can replace the in-memory one.
+    """
+    def __init__(self, store=None):
+        self.store = store if store is not None else InMemoryDedupStore()
+        self._lock = threading.Lock()
+        self._accepted = 0
+        self._duplicates = 0
+        self._ignored = 0
+
+    def should_process(self, body: dict) -> bool:
+        event = body.get('event', {})
+        if event.get('bot_id') or event.get('subtype') not in ANSWERABLE_SUBTYPES or not event.get('text'):
+            self._count('_ignored')
+            return False
+        key = self.event_key(body)
+        if key is not None and not self.store.add_if_absent(key):
+            self._count('_duplicates')
+            return False
+        self._count('_accepted')
+        return True
+
+    @staticmethod
+    def event_key(body: dict) -> str:
+        """The delivery-independent identity of an event: its event_id, else channel and message ts."""
+        if body.get('event_id'):
+            return f"event:{body['event_id']}"
+        event = body.get('event', {})
+        if event.get('client_msg_id'):
+            return f"msg:{event['client_msg_id']}"
+        if event.get('channel') and event.get('ts'):
+            return f"ts:{event['channel']}:{event['ts']}"
+        return None
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"accepted": self._accepted, "duplicates": self._duplicates, "ignored": self._ignored}
@@ -0,0 +1,55 @@
+from typing import Iterator, Optional
+
+import pandas as pd
+from snowflake.connector.errors import NotSupportedError
+
+def iter_batches(cur, max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Lazily yield DataFrames built from the connector's Arrow result batches of an executed cursor.
+    Stops (without downloading further result chunks) once max_rows rows or roughly max_bytes of
+    Arrow data have been produced, so a renderer that shows 20 rows never converts the other millions.
+    Falls back to row fetching for results Snowflake doesn't return in Arrow format.
+    """
+    rows = 0
+    nbytes = 0
+    try:
+        batches = cur.fetch_arrow_batches()
+    except NotSupportedError:
+        yield from _iter_row_batches(cur, max_rows)
+        return
+    for table in batches:
+        capped = False
+        if max_rows is not None and rows + table.num_rows >= max_rows:
+            table = table.slice(0, max_rows - rows)
+            capped = True
+        if max_bytes is not None and nbytes + table.nbytes > max_bytes and table.num_rows:
+            # Keep the share of this batch that fits, but always at least one row overall.
+            row_bytes = table.nbytes / table.num_rows
+            table = table.slice(0, max(int((max_bytes - nbytes) / row_bytes), 1 if rows == 0 else 0))
+            capped = True
+        if table.num_rows:
+            rows += table.num_rows
+            nbytes += table.nbytes
+            yield table.to_pandas()
+        if capped:
+            return
+
+def _iter_row_batches(cur, max_rows: Optional[int], batch_size: int = 10000) -> Iterator[pd.DataFrame]:
+    columns = [col[0] for col in cur.description]
+    rows = 0
+    while max_rows is None or rows < max_rows:
+        size = batch_size if max_rows is None else min(batch_size, max_rows - rows)
+        batch = cur.fetchmany(size)
+        if not batch:
+            return
+        rows += len(batch)
+        yield pd.DataFrame(batch, columns=columns)
+
+def fetch_frame(cur, max_rows: Optional[int] = None, max_bytes: Optional[int] = None) -> pd.DataFrame:
+    """Concatenate iter_batches into one DataFrame, keeping the result's columns even when it has no rows."""
+    frames = list(iter_batches(cur, max_rows, max_bytes))
+    if not frames:
+        return pd.DataFrame(columns=[col[0] for col in cur.description])
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
@@ -44,8 +44,8 @@ class JWTGenerator(object):
     Creates and signs a JWT with the specified private key file, username, and account identifier. The JWTGenerator keeps the
     generated token and only regenerates the token if a specified period of time has passed.
     """
-    LIFETIME = timedelta(minutes=180)  # The tokens will have # minutes lifetime
-    RENEWAL_DELTA = timedelta(minutes=180)  # Tokens will be renewed after # minutes
+    LIFETIME = timedelta(minutes=59)  # The tokens will have # minutes lifetime (Snowflake accepts at most 60)
+    RENEWAL_DELTA = timedelta(minutes=54)  # Tokens will be renewed after # minutes, ahead of expiry
     ALGORITHM = "RS256"  # Tokens will be generated using RSA with SHA256
 
     def __init__(self, account: Text, user: Text, private_key_file_path: Text,
@@ -94,6 +94,9 @@ class JWTGenerator(object):
                 # Key format not supported or malformed
                 raise ValueError(f"Invalid private key format: {e}")
 
+        # The fingerprint only depends on the key, so compute it once rather than on every renewal.
+        self.public_key_fp = self.calculate_public_key_fingerprint(self.private_key)
+
     def prepare_account_name_for_jwt(self, raw_account: Text) -> Text:
         """
         Prepare the account identifier for use in the JWT.
@@ -127,36 +130,43 @@ class JWTGenerator(object):
         if self.token is None or self.renew_time <= now:
             logger.info("Generating a new token because the present time (%s) is later than the renewal time (%s)",
                         now, self.renew_time)
-            # Calculate the next time we need to renew the token.
-            self.renew_time = now + self.renewal_delay
-
-            # Prepare the fields for the payload.
-            # Generate the public key fingerprint for the issuer in the payload.
-            public_key_fp = self.calculate_public_key_fingerprint(self.private_key)
-
-            # Create our payload
-            payload = {
-                # Set the issuer to the fully qualified username concatenated with the public key fingerprint.
-                ISSUER: self.qualified_username + '.' + public_key_fp,
-
-                # Set the subject to the fully qualified username.
-                SUBJECT: self.qualified_username,
-
-                # Set the issue time to now.
-                ISSUE_TIME: now,
-
-                # Set the expiration time, based on the lifetime specified for this object.
-                EXPIRE_TIME: now + self.lifetime
-            }
-
-            # Regenerate the actual token
-            token = jwt.encode(payload, key=self.private_key, algorithm=JWTGenerator.ALGORITHM)
-            # If you are using a version of PyJWT prior to 2.0, jwt.encode returns a byte string, rather than a string.
-            # If the token is a byte string, convert it to a string.
-            if isinstance(token, bytes):
-              token = token.decode('utf-8')
-            self.token = token
-            logger.info("Generated a JWT with the following payload: %s", jwt.decode(self.token, key=self.private_key.public_key(), algorithms=[JWTGenerator.ALGORITHM]))
+            self.generate_token(now)
+
+        return self.token
+
+    def generate_token(self, now: datetime = None) -> Text:
+        """
+        Unconditionally signs a new JWT and resets the renewal time.
+        :param now: The issue time; defaults to the current time.
+        :return: the new token
+        """
+        now = now or datetime.now(timezone.utc)
+        # Calculate the next time we need to renew the token.
+        self.renew_time = now + self.renewal_delay
+
+        # Create our payload
+        payload = {
+            # Set the issuer to the fully qualified username concatenated with the public key fingerprint.
+            ISSUER: self.qualified_username + '.' + self.public_key_fp,
+
+            # Set the subject to the fully qualified username.
+            SUBJECT: self.qualified_username,
+
+            # Set the issue time to now.
+            ISSUE_TIME: now,
+
+            # Set the expiration time, based on the lifetime specified for this object.
+            EXPIRE_TIME: now + self.lifetime
+        }
+
+        # Regenerate the actual token
+        token = jwt.encode(payload, key=self.private_key, algorithm=JWTGenerator.ALGORITHM)
+        # If you are using a version of PyJWT prior to 2.0, jwt.encode returns a byte string, rather than a string.
+        # If the token is a byte string, convert it to a string.
+        if isinstance(token, bytes):
+          token = token.decode('utf-8')
+        self.token = token
+        logger.info("Generated a JWT with the following payload: %s", payload)
 
         return self.token
 
@@ -0,0 +1,118 @@
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+class AgentHTTPSession:
+    """
+    Persistent, thread-safe HTTP session for the Cortex Agents endpoint.
+    Keeps up to pool_size keep-alive connections per host so repeated questions (and 401 retries)
+    skip the DNS lookup and TCP/TLS handshake. Uses requests/urllib3 by default, or httpx with
+    HTTP/2 multiplexing when http2=True (requires `pip install httpx[http2]`).
+    """
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 10, read_timeout: float = 300, http2: bool = False):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._connections_opened = 0
+
+        if http2:
+            import httpx
+            self._client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+        else:
+            self._client = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            self._client.mount("https://", adapter)
+            self._client.mount("http://", adapter)
+            self._adapters = [adapter]
+
+    @contextmanager
+    def post(self, url: str, headers: dict[str, str], json: dict[str, any]):
+        """
+        POST and stream the response body. The connection goes back to the pool once the
+        with-block exits, whether or not the body was fully read.
+        """
+        with self._lock:
+            self._requests += 1
+        if self.http2:
+            with self._client.stream("POST", url, headers=headers, json=json, extensions={"trace": self._trace}) as response:
+                yield _HTTPXResponse(response)
+        else:
+            response = self._client.post(url, headers=headers, json=json, stream=True,
+                                         timeout=(self.connect_timeout, self.read_timeout))
+            try:
+                yield response
+            finally:
+                response.close()
+
+    def warm(self, url: str) -> bool:
+        """
+        Open a pooled connection to url's host now (DNS, TCP and TLS handshake) so the first question
+        doesn't pay for it. Sends a HEAD; whatever status comes back, the connection stays in the pool.
+        """
+        try:
+            if self.http2:
+                self._client.head(url, timeout=self.connect_timeout, extensions={"trace": self._trace})
+            else:
+                self._client.head(url, timeout=(self.connect_timeout, self.connect_timeout)).close()
+            return True
+        except Exception as e:
+            print(f"Could not pre-open a connection to {url}: {type(e).__name__}: {e}")
+            return False
+
+    def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections_opened += 1
+
+    def stats(self) -> dict[str, int]:
+        """Connections opened vs. requests served on an already-open connection."""
+        with self._lock:
+            requests_sent = self._requests
+            opened = self._connections_opened
+        if not self.http2:
+            opened = 0
+            for adapter in self._adapters:
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+        return {
+            "requests": requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(requests_sent - opened, 0),
+        }
+
+    def close(self):
+        self._client.close()
+
+class _HTTPXResponse:
+    """Presents an httpx streaming response with the requests.Response methods CortexChat uses."""
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+
+    def iter_lines(self):
+        for line in self._response.iter_lines():
+            yield line.encode('utf-8')
+
+    def iter_content(self, chunk_size=None):
+        return self._response.iter_bytes(chunk_size)
+
+    @property
+    def text(self) -> str:
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        self._response.read()
+        return self._response.json()
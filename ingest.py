@@ -0,0 +1,246 @@
+# Incremental ingestion of the search corpus: the PDFs in data/ -> the DASH_PDFS stage -> PARSE_PDFS
+# (PARSE_DOCUMENT output) -> PARSED_PDFS (chunks, which the VEHICLES_INFO search service indexes).
+# cortex_search_service.sql rebuilds all of it; this only touches files whose content changed since the
+# last run, according to a local manifest of content hashes:
+#   - new and changed files are uploaded with one PUT and parsed/chunked with one statement each
+#   - their chunks are merged into PARSED_PDFS, so chunks whose text didn't change keep their rows and
+#     the search service doesn't re-embed them
+#   - files no longer in data/ are removed from the stage and both tables
+#
+#   python ingest.py                 # ingest what changed
+#   python ingest.py --dry-run       # show what would change
+#   python ingest.py --full          # ignore the manifest and re-ingest everything
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from typing import NamedTuple
+
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+_NAME = re.compile(r"^[A-Za-z_][\w$]*\.[A-Za-z_][\w$]*\.[A-Za-z_][\w$]*$")
+
+class FileState(NamedTuple):
+    sha256: str
+    size: int
+    mtime: float
+
+class ChangeSet(NamedTuple):
+    upload: list  # relative paths that are new or changed
+    remove: list  # relative paths that were ingested before but are gone from the data directory
+    unchanged: int
+
+# ===== Manifest =====
+def load_manifest(path: str) -> dict[str, FileState]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {name: FileState(**state) for name, state in json.load(f).items()}
+
+def save_manifest(path: str, manifest: dict[str, FileState]):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({name: state._asdict() for name, state in sorted(manifest.items())}, f, indent=2)
+    os.replace(tmp, path)
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def scan(directory: str, manifest: dict[str, FileState]) -> dict[str, FileState]:
+    """State of every PDF in directory. Files whose size and mtime match the manifest aren't re-hashed."""
+    states = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith(".pdf") or not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        known = manifest.get(name)
+        if known is not None and known.size == stat.st_size and known.mtime == stat.st_mtime:
+            states[name] = known
+        else:
+            states[name] = FileState(file_sha256(path), stat.st_size, stat.st_mtime)
+    return states
+
+def diff(current: dict[str, FileState], manifest: dict[str, FileState]) -> ChangeSet:
+    upload = [name for name, state in current.items() if name not in manifest or manifest[name].sha256 != state.sha256]
+    remove = [name for name in manifest if name not in current]
+    return ChangeSet(upload, remove, len(current) - len(upload))
+
+# ===== Snowflake =====
+def connect():
+    import snowflake.connector
+    load_dotenv(os.path.join(ROOT, ".env"))
+    return snowflake.connector.connect(
+        host=os.getenv("HOST"),
+        account=os.getenv("ACCOUNT"),
+        warehouse=os.getenv("WAREHOUSE"),
+        role=os.getenv("USER_ROLE"),
+        user=os.getenv("USER"),
+        authenticator="SNOWFLAKE_JWT",
+        private_key_file=os.getenv("RSA_PRIVATE_KEY_PATH"),
+        private_key_file_pwd=os.getenv("RSA_PRIVATE_KEY_PASSPHRASE"),
+    )
+
+def check_name(name: str) -> str:
+    if not _NAME.match(name or ''):
+        raise ValueError(f"Expected a DATABASE.SCHEMA.OBJECT name, got {name!r}")
+    return name
+
+def in_list(names: list[str]) -> str:
+    """Placeholders for an IN (...) over names, e.g. '%s, %s'."""
+    return ", ".join(["%s"] * len(names))
+
+def upload(cur, directory: str, names: list[str], stage: str, parallel: int):
+    """PUT names in one command: they are linked into a scratch directory and uploaded with a wildcard."""
+    scratch = tempfile.mkdtemp(prefix="ingest-")
+    try:
+        for name in names:
+            target = os.path.join(scratch, name)
+            try:
+                os.link(os.path.join(directory, name), target)
+            except OSError:
+                shutil.copy2(os.path.join(directory, name), target)
+        # PARSE_DOCUMENT reads the raw PDF, so no compression. The scratch directory holds only names,
+        # so match everything: a case-sensitive *.pdf would skip report.PDF
+        pattern = os.path.join(scratch, "*").replace("\\", "/")
+        cur.execute(f"PUT 'file://{pattern}' @{stage} AUTO_COMPRESS = FALSE OVERWRITE = TRUE PARALLEL = {int(parallel)}")
+        rows = cur.fetchall()
+        failed = [row[0] for row in rows if str(row[6]).upper() not in ("UPLOADED", "SKIPPED")]
+        put = {row[0] for row in rows}
+        failed += [name for name in names if name not in put]
+        if failed:
+            raise RuntimeError(f"PUT failed for {failed}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def remove_from_stage(cur, names: list[str], stage: str):
+    # REMOVE takes no bind variables; the pattern must match the whole path, e.g. dash_pdfs/name.pdf
+    pattern = "(.*/)?(" + "|".join(re.escape(name) for name in names) + ")"
+    literal = pattern.replace("\\", "\\\\").replace("'", "\\'")
+    cur.execute(f"REMOVE @{stage} PATTERN = '{literal}'")
+
+def apply(conn, directory: str, changes: ChangeSet, stage: str, parse_table: str, chunk_table: str,
+          chunk_size: int, chunk_overlap: int, parallel: int) -> dict[str, int]:
+    """Upload, parse and chunk changes.upload and drop changes.remove; returns row counts of what changed."""
+    counts = {"uploaded": 0, "parsed": 0, "chunks_inserted": 0, "chunks_deleted": 0}
+    # Qualified like the other objects: connect() sets no current database or schema
+    new_chunks = chunk_table.rsplit(".", 1)[0] + ".INGEST_CHUNKS"
+    cur = conn.cursor()
+    try:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {parse_table} (RELATIVE_PATH VARCHAR, DATA VARIANT)")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {chunk_table} (PAGE_CONTENT VARCHAR, TITLE VARCHAR, INPUT_STAGE VARCHAR, RELATIVE_PATH VARCHAR)")
+        if changes.upload:
+            upload(cur, directory, changes.upload, stage, parallel)
+            counts["uploaded"] = len(changes.upload)
+        if changes.remove:
+            remove_from_stage(cur, changes.remove, stage)
+        # DIRECTORY() only sees files added since the directory table was last refreshed
+        cur.execute(f"ALTER STAGE {stage} REFRESH")
+
+        if changes.upload:
+            # The only PARSE_DOCUMENT calls: one per new or changed file
+            cur.execute(
+                f"""MERGE INTO {parse_table} t USING (
+                    SELECT relative_path, SNOWFLAKE.CORTEX.PARSE_DOCUMENT(@{stage}, relative_path, {{'mode': 'LAYOUT'}}) AS data
+                    FROM DIRECTORY(@{stage}) WHERE relative_path IN ({in_list(changes.upload)})
+                ) s ON t.RELATIVE_PATH = s.relative_path
+                WHEN MATCHED THEN UPDATE SET t.DATA = s.data
+                WHEN NOT MATCHED THEN INSERT (RELATIVE_PATH, DATA) VALUES (s.relative_path, s.data)""",
+                changes.upload
+            )
+            counts["parsed"] = cur.rowcount or 0
+            cur.execute(
+                f"""CREATE OR REPLACE TEMPORARY TABLE {new_chunks} AS
+                SELECT TO_VARCHAR(c.value) AS PAGE_CONTENT,
+                       REGEXP_REPLACE(p.RELATIVE_PATH, '\\\\.pdf$', '', 1, 1, 'i') AS TITLE,
+                       %s AS INPUT_STAGE,
+                       p.RELATIVE_PATH AS RELATIVE_PATH
+                FROM {parse_table} p,
+                     LATERAL FLATTEN(INPUT => SNOWFLAKE.CORTEX.SPLIT_TEXT_RECURSIVE_CHARACTER(
+                         TO_VARIANT(p.DATA):content, 'MARKDOWN', %s, %s)) c
+                WHERE p.RELATIVE_PATH IN ({in_list(changes.upload)}) AND TO_VARIANT(p.DATA):content IS NOT NULL""",
+                [stage, chunk_size, chunk_overlap] + changes.upload
+            )
+
+        cur.execute("BEGIN")
+        try:
+            if changes.upload:
+                cur.execute(
+                    f"""MERGE INTO {chunk_table} t USING {new_chunks} s
+                    ON t.RELATIVE_PATH = s.RELATIVE_PATH AND t.PAGE_CONTENT = s.PAGE_CONTENT
+                    WHEN NOT MATCHED THEN INSERT (PAGE_CONTENT, TITLE, INPUT_STAGE, RELATIVE_PATH)
+                        VALUES (s.PAGE_CONTENT, s.TITLE, s.INPUT_STAGE, s.RELATIVE_PATH)"""
+                )
+                counts["chunks_inserted"] = cur.rowcount or 0
+                # Chunks of a changed file that its new version no longer has
+                cur.execute(
+                    f"""DELETE FROM {chunk_table} t WHERE t.RELATIVE_PATH IN ({in_list(changes.upload)})
+                    AND NOT EXISTS (SELECT 1 FROM {new_chunks} s WHERE s.RELATIVE_PATH = t.RELATIVE_PATH AND s.PAGE_CONTENT = t.PAGE_CONTENT)""",
+                    changes.upload
+                )
+                counts["chunks_deleted"] += cur.rowcount or 0
+            if changes.remove:
+                cur.execute(f"DELETE FROM {chunk_table} WHERE RELATIVE_PATH IN ({in_list(changes.remove)})", changes.remove)
+                counts["chunks_deleted"] += cur.rowcount or 0
+                cur.execute(f"DELETE FROM {parse_table} WHERE RELATIVE_PATH IN ({in_list(changes.remove)})", changes.remove)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+    finally:
+        cur.close()
+    return counts
+
+def main():
+    load_dotenv(os.path.join(ROOT, ".env"))
+    cli_parser = argparse.ArgumentParser()
+    cli_parser.add_argument('--data', default=os.path.join(ROOT, "data"), help='Directory of PDFs to ingest.')
+    cli_parser.add_argument('--manifest', default=os.path.join(ROOT, ".ingest_manifest.json"), help='Hashes of the files ingested so far.')
+    cli_parser.add_argument('--stage', default="SEMANTIC_DATABASE.DASH_SCHEMA.DASH_PDFS")
+    cli_parser.add_argument('--parse-table', default="SEMANTIC_DATABASE.DASH_SCHEMA.PARSE_PDFS")
+    cli_parser.add_argument('--chunk-table', default="SEMANTIC_DATABASE.DASH_SCHEMA.PARSED_PDFS")
+    cli_parser.add_argument('--chunk-size', type=int, default=1800, help='As in cortex_search_service.sql.')
+    cli_parser.add_argument('--chunk-overlap', type=int, default=300)
+    cli_parser.add_argument('--parallel', type=int, default=8, help='PUT upload threads.')
+    cli_parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-ingest every file.')
+    cli_parser.add_argument('--dry-run', action='store_true', help='Print the change set without touching Snowflake.')
+    args = cli_parser.parse_args()
+    for name in (args.stage, args.parse_table, args.chunk_table):
+        check_name(name)
+
+    manifest = load_manifest(args.manifest)
+    current = scan(args.data, manifest)
+    changes = diff(current, {} if args.full else manifest)
+    if args.full:
+        # Files deleted locally since the last run still have to leave Snowflake
+        changes = changes._replace(remove=[name for name in manifest if name not in current])
+    print(f"{len(changes.upload)} new or changed, {len(changes.remove)} removed, {changes.unchanged} unchanged")
+    for name in changes.upload:
+        print(f"  + {name}")
+    for name in changes.remove:
+        print(f"  - {name}")
+    if args.dry_run or (not changes.upload and not changes.remove):
+        return
+
+    started = time.perf_counter()
+    conn = connect()
+    try:
+        counts = apply(conn, args.data, changes, args.stage, args.parse_table, args.chunk_table,
+                       args.chunk_size, args.chunk_overlap, args.parallel)
+    finally:
+        conn.close()
+    # Only after Snowflake has everything, so a failed run is retried in full next time
+    save_manifest(args.manifest, current)
+    print(" | ".join(f"{name} {count}" for name, count in counts.items()) + f" | {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
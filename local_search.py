@@ -0,0 +1,258 @@
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import NamedTuple
+
+from answer_cache import text_words
+
+_TABLE = re.compile(r"^[A-Za-z_][\w$]*\.[A-Za-z_][\w$]*\.[A-Za-z_][\w$]*$")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+# Crude suffix folding on top of text_words, so "delivered", "deliveries" and "delivery" meet
+_SUFFIXES = ("ie", "ing", "ed", "e", "y")
+
+def terms(text: str) -> list[str]:
+    stemmed = []
+    for word in text_words(text):
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.isdigit():
+                word = word[:-len(suffix)]
+                break
+        stemmed.append(word)
+    return stemmed
+
+class Chunk(NamedTuple):
+    """One row of PARSED_PDFS (see cortex_search_service.sql), the table the Cortex Search service indexes."""
+    page_content: str
+    title: str
+    relative_path: str
+
+class SearchHit(NamedTuple):
+    chunk: Chunk
+    score: float
+    coverage: float  # share of the question's idf weight that the chunk contains
+
+class ChunkIndex:
+    """
+    BM25 over a fixed list of chunks, titles included. Postings are kept CSR-style in flat arrays
+    instead of a list per term: the chunks containing term t are doc_ids[offsets[t]:offsets[t + 1]],
+    with their term frequencies at the same positions in tfs.
+    """
+    def __init__(self, chunks: list[Chunk], k1: float = 1.2, b: float = 0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.terms = {}  # term -> term id
+        postings = []  # term id -> [(chunk, tf)], in chunk order
+        lengths = []
+        for doc, chunk in enumerate(self.chunks):
+            counts = Counter(terms(f"{chunk.title.replace('_', ' ')} {chunk.page_content}"))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_id = self.terms.get(term)
+                if term_id is None:
+                    term_id = self.terms[term] = len(postings)
+                    postings.append([])
+                postings[term_id].append((doc, tf))
+
+        self.offsets = array('I', [0])
+        self.doc_ids = array('I')
+        self.tfs = array('H')
+        for entries in postings:
+            for doc, tf in entries:
+                self.doc_ids.append(doc)
+                self.tfs.append(min(tf, 0xFFFF))
+            self.offsets.append(len(self.doc_ids))
+        n = len(self.chunks)
+        self.idf = array('d', (self._idf(len(entries)) for entries in postings))
+        average = sum(lengths) / n if n else 1.0
+        # The chunk-length part of BM25's denominator, computed once per chunk
+        self.norms = array('d', (k1 * (1 - b + b * length / (average or 1.0)) for length in lengths))
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (len(self.chunks) - df + 0.5) / (df + 0.5))
+
+    def weight(self, term: str) -> float:
+        """idf of term; a term no chunk contains gets the highest weight, since not finding it matters most."""
+        term_id = self.terms.get(term)
+        return self.idf[term_id] if term_id is not None else self._idf(0)
+
+    def search(self, question: str, k: int = 5) -> list[SearchHit]:
+        words = set(terms(question))
+        total = sum(self.weight(word) for word in words)
+        scores = {}
+        matched = {}
+        for word in words:
+            term_id = self.terms.get(word)
+            if term_id is None:
+                continue
+            idf = self.idf[term_id]
+            for i in range(self.offsets[term_id], self.offsets[term_id + 1]):
+                doc = self.doc_ids[i]
+                tf = self.tfs[i]
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.norms[doc])
+                matched[doc] = matched.get(doc, 0.0) + idf
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [SearchHit(self.chunks[doc], score, matched[doc] / total) for doc, score in best]
+
+    def best_sentences(self, chunk: Chunk, question: str, limit: int = 3) -> str:
+        """The limit sentences of chunk that carry most of the question's weight, in their original order."""
+        words = set(terms(question))
+        sentences = [s.strip() for s in _SENTENCE.split(chunk.page_content) if s.strip()]
+        scored = [(sum(self.weight(w) for w in words & set(terms(s))), i) for i, s in enumerate(sentences)]
+        chosen = sorted(i for score, i in heapq.nlargest(limit, scored) if score > 0)
+        return ' '.join(sentences[i] for i in chosen)
+
+    def stats(self) -> dict[str, int]:
+        return {"chunks": len(self.chunks), "terms": len(self.terms), "postings": len(self.doc_ids)}
+
+class LocalSearch:
+    """
+    In-process retrieval tier in front of the Cortex Search tool, over a snapshot of the chunks the
+    service indexes. A question is answered locally only when the best chunk is a confident match:
+    it contains at least min_coverage of the question's idf weight, scores at least min_score, and
+    outscores the best chunk of any other document by min_margin (a ratio). The answer quotes the
+    chunk's most relevant sentences and cites it the way Cortex's search results are cited;
+    anything less certain returns None so the caller asks Cortex.
+    """
+    def __init__(self, min_score: float = 5.0, min_coverage: float = 0.75, min_margin: float = 1.25, max_sentences: int = 3):
+        self.min_score = min_score
+        self.min_coverage = min_coverage
+        self.min_margin = min_margin
+        self.max_sentences = max_sentences
+        self.version = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {"answered": 0, "fallbacks": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def load(self, chunks: list[Chunk], version: str = None):
+        """Swap in a new snapshot; questions keep using the old index while this one is built."""
+        index = ChunkIndex(chunks)
+        with self._lock:
+            self._index = index
+            self.version = version
+            self._stats["refreshes"] += 1
+
+    @property
+    def index(self) -> ChunkIndex:
+        return self._index
+
+    def hits(self, question: str, k: int = 5) -> list[SearchHit]:
+        index = self._index
+        return index.search(question, k) if index is not None else []
+
+    def confident(self, hits: list[SearchHit]) -> bool:
+        if not hits:
+            return False
+        top = hits[0]
+        # Neighbouring chunks of one document overlap, so only a different document is a rival
+        rival = next((hit.score for hit in hits[1:] if hit.chunk.relative_path != top.chunk.relative_path), 0.0)
+        return top.coverage >= self.min_coverage and top.score >= self.min_score and top.score >= rival * self.min_margin
+
+    def answer(self, question: str) -> dict[str, str]:
+        """A text/sql/citations answer like CortexChat's, or None if Cortex should answer instead."""
+        index = self._index
+        hits = index.search(question) if index is not None else []
+        if not self.confident(hits):
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return None
+        chunk = hits[0].chunk
+        text = index.best_sentences(chunk, question, self.max_sentences) or chunk.page_content
+        with self._lock:
+            self._stats["answered"] += 1
+        return {
+            "text": text + "*",
+            "sql": "",
+            "citations": f"{chunk.title} \n {chunk.page_content} \n\n[Source: {chunk.relative_path}]",
+        }
+
+    # ===== Refresh =====
+    def refresh(self, conn, table: str, snapshot_path: str = None) -> bool:
+        """Reload from table if it changed since the loaded snapshot; returns whether it did."""
+        version = table_version(conn, table)
+        if self._index is not None and version == self.version:
+            return False
+        chunks = fetch_chunks(conn, table)
+        self.load(chunks, version)
+        if snapshot_path:
+            save_snapshot(snapshot_path, chunks, version)
+        return True
+
+    def start_refresh(self, pool, table: str, interval: float, snapshot_path: str = None) -> threading.Thread:
+        """Refresh from table now and then every interval seconds on a background thread, using pool's connections."""
+        def run():
+            while True:
+                try:
+                    started = time.perf_counter()
+                    with pool.connection() as conn:
+                        if self.refresh(conn, table, snapshot_path):
+                            print(f"Local search loaded {self._index.stats()} from {table} in {time.perf_counter() - started:.1f}s")
+                except Exception as e:
+                    # Keep serving the snapshot we have; Cortex answers whatever it can't
+                    with self._lock:
+                        self._stats["refresh_errors"] += 1
+                    print(f"Local search refresh failed: {type(e).__name__}: {e}")
+                if self._stop.wait(interval):
+                    return
+
+        thread = threading.Thread(target=run, name="local-search-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict[str, int]:
+        index = self._index
+        with self._lock:
+            return {**self._stats, **(index.stats() if index is not None else {"chunks": 0})}
+
+# ===== Snapshots =====
+def _check_table(table: str) -> list[str]:
+    if not _TABLE.match(table or ''):
+        raise ValueError(f"Expected a DATABASE.SCHEMA.TABLE name, got {table!r}")
+    return table.upper().split('.')
+
+def fetch_chunks(conn, table: str) -> list[Chunk]:
+    _check_table(table)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"SELECT PAGE_CONTENT, TITLE, RELATIVE_PATH FROM {table}")
+        return [Chunk(*row) for row in cur.fetchall() if row[0]]
+    finally:
+        cur.close()
+
+def table_version(conn, table: str) -> str:
+    """Changes whenever the table is rebuilt or modified; cheaper to check than re-reading the chunks."""
+    database, schema, name = _check_table(table)
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT LAST_ALTERED, ROW_COUNT FROM {database}.INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (schema, name)
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    if row is None:
+        raise ValueError(f"Table {table} not found")
+    return f"{row[0]}/{row[1]}"
+
+def save_snapshot(path: str, chunks: list[Chunk], version: str = None):
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump({"version": version, "chunks": [list(chunk) for chunk in chunks]}, f)
+    # Replace atomically so a reader never sees half a snapshot
+    os.replace(tmp, path)
+
+def load_snapshot(path: str) -> tuple[list[Chunk], str]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    return [Chunk(*chunk) for chunk in snapshot["chunks"]], snapshot.get("version")
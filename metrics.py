@@ -0,0 +1,134 @@
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from profiling import record_stage
+
+try:
+    from prometheus_client import Counter, Histogram, start_http_server
+    from prometheus_client.core import GaugeMetricFamily, REGISTRY
+except ImportError:  # metrics become no-ops; the bot itself doesn't need prometheus_client
+    Counter = Histogram = None
+
+# ===== Metric definitions =====
+# Pipeline stages timed by observe()/timed():
+#   slack_ack      Slack event timestamp -> our ack
+#   jwt            getting a token from the TokenManager
+#   cortex_ttfb    request sent -> Cortex response headers
+#   cortex_stream  response headers -> last SSE event
+#   sse_parse      CPU time spent parsing the stream (excludes waiting on the network)
+#   sql_execute    warehouse query incl. first-page fetch (exemplar: Snowflake query ID)
+#   sql_page       another page of an earlier result via RESULT_SCAN
+#   render         DataFrame -> answer text
+#   chart          chart render and upload
+#   slack_post     Slack Web API calls that post answers
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160)
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram("cortex_bot_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=STAGE_BUCKETS)
+    ERRORS = Counter("cortex_bot_errors", "Errors by pipeline stage and exception type", ["stage", "type"])
+else:
+    STAGE_SECONDS = ERRORS = None
+
+_stages = {}
+
+def _stage(stage: str):
+    # labels() takes a lock and builds a tuple on every call; keep the children instead
+    child = _stages.get(stage)
+    if child is None:
+        child = _stages[stage] = STAGE_SECONDS.labels(stage)
+    return child
+
+def observe(stage: str, seconds: float, exemplar: dict[str, str] = None):
+    """Record one duration for stage. exemplar attaches e.g. a query ID without creating a label per value."""
+    record_stage(stage, seconds)
+    if STAGE_SECONDS is None:
+        return
+    if exemplar:
+        _stage(stage).observe(seconds, exemplar)
+    else:
+        _stage(stage).observe(seconds)
+
+def count_error(stage: str, error):
+    """Count an error under stage, by exception type (or a given name such as "HTTP 500")."""
+    if ERRORS is not None:
+        ERRORS.labels(stage, error if isinstance(error, str) else type(error).__name__).inc()
+
+@contextmanager
+def timed(stage: str):
+    """Time the block as stage; an exception escaping it is also counted under stage and its type."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        count_error(stage, e)
+        raise
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+def timed_calls(stage: str, fn: Callable) -> Callable:
+    """Wrap fn (e.g. Bolt's say) so that every call is timed as stage."""
+    def wrapper(*args, **kwargs):
+        with timed(stage):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def timed_async_calls(stage: str, fn: Callable) -> Callable:
+    """timed_calls for a coroutine function such as AsyncApp's say."""
+    async def wrapper(*args, **kwargs):
+        with timed(stage):
+            return await fn(*args, **kwargs)
+    return wrapper
+
+# ===== Component stats =====
+class StatsCollector:
+    """
+    Exposes the stats() dicts the bot's components already keep (queue depths, cache and pool
+    counters) as gauges. They are read only when /metrics is scraped, so the hot path pays nothing.
+    """
+    def __init__(self):
+        self._sources = {}
+
+    def register(self, name: str, stats: Callable[[], dict]):
+        self._sources[name] = stats
+
+    def collect(self):
+        for name, stats in list(self._sources.items()):
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Metrics: stats for {name} failed: {type(e).__name__}: {e}")
+                continue
+            for key, value in _flatten(values):
+                gauge = GaugeMetricFamily(f"cortex_bot_{name}_{key}", f"{name} {key.replace('_', ' ')}")
+                gauge.add_metric([], value)
+                yield gauge
+
+def _flatten(values: dict, prefix: str = ""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+COLLECTOR = StatsCollector()
+_registered = False
+
+def register_stats(name: str, stats: Callable[[], dict]):
+    """Publish stats() of a component under cortex_bot_<name>_<key>."""
+    global _registered
+    if Histogram is None:
+        return
+    COLLECTOR.register(name, stats)
+    if not _registered:
+        REGISTRY.register(COLLECTOR)
+        _registered = True
+
+def start(port: int, addr: str = "127.0.0.1") -> bool:
+    """Serve /metrics on a background thread; works alongside both Socket Mode and the HTTP server."""
+    if Histogram is None:
+        print("prometheus_client is not installed, /metrics is disabled")
+        return False
+    start_http_server(port, addr=addr)
+    print(f">>>>>>>>>> Metrics on http://{addr}:{port}/metrics")
+    return True
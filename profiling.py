@@ -0,0 +1,196 @@
+import cProfile
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+_local = threading.local()
+# Since Python 3.12 a cProfile.Profile hooks the whole process and a second enable() raises ValueError
+_CPROFILE_LOCK = threading.Lock()
+
+def record_stage(stage: str, seconds: float):
+    """Add a finished stage to the timeline of the request profiled on this thread, if any."""
+    timeline = getattr(_local, "timeline", None)
+    if timeline is not None:
+        timeline.append((stage, time.perf_counter() - seconds, seconds))
+
+class _Request:
+    __slots__ = ("thread_id", "started", "stacks")
+
+    def __init__(self, thread_id: int, started: float):
+        self.thread_id = thread_id
+        self.started = started
+        self.stacks = Counter()
+
+class RequestProfiler:
+    """
+    Opt-in profiling of individual requests.
+    - A sample_rate fraction of requests runs under cProfile, one request at a time per process.
+    - Every request is watched by one shared stack sampler thread that reads the request's stack
+      every sample_interval seconds; if the request ends up slower than slow_threshold the samples
+      are written out, otherwise they are dropped.
+    Each captured request also gets a per-stage timeline (from metrics.observe) and is written to
+    directory, which keeps only the newest max_files files. A request that is neither sampled nor
+    watched costs a random() call.
+    """
+    def __init__(self, directory: str, sample_rate: float = 0.0, slow_threshold: float = 0.0,
+                 sample_interval: float = 0.05, max_files: int = 200):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.sample_interval = sample_interval
+        self.max_files = max_files
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._captured = 0
+        self._skipped = 0  # sampled requests run without cProfile because another one held it
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_threshold > 0
+
+    @contextmanager
+    def profile(self, name: str, **labels):
+        """Profile the block if this request is sampled or turns out to be slow."""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        watched = self.slow_threshold > 0
+        if not sampled and not watched:
+            yield
+            return
+
+        started = time.perf_counter()
+        request = None
+        profiler = None
+        _local.timeline = []
+        error = None
+        try:
+            if watched:
+                request = _Request(threading.get_ident(), started)
+                self._watch(request)
+            if sampled:
+                profiler = self._start_cprofile()
+                sampled = profiler is not None
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                _CPROFILE_LOCK.release()
+            timeline, _local.timeline = _local.timeline, None
+            elapsed = time.perf_counter() - started
+            if request is not None:
+                with self._lock:
+                    self._active.pop(request.thread_id, None)
+            slow = watched and elapsed >= self.slow_threshold
+            if sampled or slow:
+                try:
+                    self._dump(name, labels, started, elapsed, timeline, profiler, request if slow else None,
+                               "slow" if slow else "sampled", error)
+                except OSError as e:
+                    print(f"Could not write profile to {self.directory}: {e}")
+
+    def _start_cprofile(self):
+        """An enabled cProfile.Profile, or None while another request is being profiled (one at a time per process)."""
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            with self._lock:
+                self._skipped += 1
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiling tool, e.g. a debugger, holds the hook
+            _CPROFILE_LOCK.release()
+            print(f"cProfile unavailable, request not sampled: {e}")
+            with self._lock:
+                self._skipped += 1
+            return None
+        return profiler
+
+    # ===== Stack sampler =====
+    def _watch(self, request: _Request):
+        with self._lock:
+            self._active[request.thread_id] = request
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name="request-sampler", daemon=True)
+                self._sampler.start()
+        self._wake.set()
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    idle = True
+                else:
+                    idle = False
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.sample_interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, request in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own:
+                        request.stacks[_collapse(frame)] += 1
+
+    # ===== Output =====
+    def _dump(self, name, labels, started, elapsed, timeline, profiler, request, reason, error):
+        stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(elapsed * 1000)}ms-{reason}-{name}"
+        base = os.path.join(self.directory, stamp)
+        report = {
+            "name": name,
+            "reason": reason,
+            "labels": labels,
+            "elapsed": round(elapsed, 4),
+            "error": None if error is None else f"{type(error).__name__}: {error}",
+            "stages": [
+                {"stage": stage, "start": round(start - started, 4), "seconds": round(seconds, 4)}
+                for stage, start, seconds in sorted(timeline, key=lambda entry: entry[1])
+            ],
+        }
+        with open(base + ".timeline.json", "w") as f:
+            json.dump(report, f, indent=2)
+        if profiler is not None:
+            profiler.dump_stats(base + ".prof")  # python -m pstats / snakeviz
+        if request is not None and request.stacks:
+            # Collapsed stacks, one "frame;frame;frame count" per line: feed to flamegraph.pl or speedscope
+            with open(base + ".stacks.txt", "w") as f:
+                for stack, count in request.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        self._captured += 1
+        self._rotate()
+        print(f"Profiled {reason} request {name} ({elapsed:.1f}s): {base}.*")
+
+    def _rotate(self):
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory)]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"active": len(self._active), "captured": self._captured, "skipped": self._skipped}
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
@@ -0,0 +1,123 @@
+import json
+import re
+from typing import NamedTuple
+
+import pandas as pd
+import pyarrow as pa
+from fetch_engine import fetch_frame
+from running_queries import QueryCancelled, RunningQuery
+
+_QUERY_ID = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+
+class QueryResult(NamedTuple):
+    """One page of a query result plus what is needed to fetch the others from Snowflake's persisted result."""
+    df: pd.DataFrame
+    query_id: str
+    offset: int
+    page_size: int
+    total_rows: int
+
+    @property
+    def first_row(self) -> int:
+        return self.offset + 1
+
+    @property
+    def last_row(self) -> int:
+        return self.offset + len(self.df)
+
+    @property
+    def has_prev(self) -> bool:
+        return self.offset > 0
+
+    @property
+    def has_next(self) -> bool:
+        return self.last_row < self.total_rows
+
+def run_first_page(conn, sql: str, page_size: int, max_bytes: int = None, timeout: int = None) -> QueryResult:
+    """
+    Execute sql and keep only its first page; later pages come from RESULT_SCAN on the returned query ID.
+    :param timeout: Seconds after which the connector cancels the statement; None for no limit.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, timeout=timeout)
+        df = fetch_frame(cur, page_size, max_bytes)
+        return QueryResult(df, cur.sfqid, 0, page_size, cur.rowcount if cur.rowcount is not None else len(df))
+    finally:
+        cur.close()
+
+def run_first_page_async(conn, sql: str, page_size: int, running: RunningQuery, max_bytes: int = None,
+                         timeout: int = None, poll_interval: float = 1.0, on_progress=None) -> QueryResult:
+    """
+    Like run_first_page, but submit sql with execute_async and poll its status by query ID, so the
+    statement can be cancelled (running.cancel(), or the timeout) while it runs. A cancelled query
+    is stopped in Snowflake with SYSTEM$CANCEL_QUERY and QueryCancelled is raised right away.
+    :param poll_interval: Longest wait between status checks; polling starts faster and backs off to it.
+    :param on_progress: Called with running after every status check while the query is still running.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute_async(sql)
+        running.query_id = cur.sfqid
+        wait = min(0.05, poll_interval)
+        while True:
+            status = conn.get_query_status_throw_if_error(running.query_id)
+            running.status = status.name
+            if not conn.is_still_running(status):
+                break
+            timed_out = bool(timeout) and running.elapsed >= timeout
+            if running.cancelled or timed_out:
+                cancel_query(conn, running.query_id)
+                if running.cancelled:
+                    who = f" by <@{running.cancelled_by}>" if running.cancelled_by else ""
+                    raise QueryCancelled(f"Query cancelled{who} after {running.elapsed:.0f}s", cancelled_by=running.cancelled_by)
+                raise QueryCancelled(f"Query timeout: cancelled after {timeout}s", timed_out=True)
+            if on_progress is not None:
+                on_progress(running)
+            running.wait(wait)
+            wait = min(wait * 2, poll_interval)
+        cur.get_results_from_sfqid(running.query_id)
+        df = fetch_frame(cur, page_size, max_bytes)
+        return QueryResult(df, running.query_id, 0, page_size, cur.rowcount if cur.rowcount is not None else len(df))
+    finally:
+        cur.close()
+
+def cancel_query(conn, query_id: str):
+    """Stop a running statement server-side, freeing its warehouse slot."""
+    if not _QUERY_ID.match(query_id or ''):
+        raise ValueError(f"Invalid Snowflake query ID: {query_id!r}")
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT SYSTEM$CANCEL_QUERY(%s)", (query_id,))
+    finally:
+        cur.close()
+
+def run_result_page(conn, query_id: str, offset: int, page_size: int, total_rows: int, max_bytes: int = None) -> QueryResult:
+    """Fetch one page of a previous query's persisted result (kept by Snowflake for 24 hours) without re-running it."""
+    if not _QUERY_ID.match(query_id or ''):
+        raise ValueError(f"Invalid Snowflake query ID: {query_id!r}")
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT * FROM TABLE(RESULT_SCAN(%s)) LIMIT %s OFFSET %s",
+            (query_id, page_size, offset)
+        )
+        df = fetch_frame(cur, page_size, max_bytes)
+        return QueryResult(df, query_id, offset, page_size, total_rows)
+    finally:
+        cur.close()
+
+def encode_result(result: QueryResult) -> bytes:
+    """A QueryResult as one Arrow IPC stream, its paging fields in the schema metadata, e.g. to share it between replicas."""
+    table = pa.Table.from_pandas(result.df, preserve_index=False)
+    paging = {"query_id": result.query_id, "offset": result.offset, "page_size": result.page_size, "total_rows": result.total_rows}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"query_result": json.dumps(paging).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def decode_result(data: bytes) -> QueryResult:
+    table = pa.ipc.open_stream(data).read_all()
+    paging = json.loads(table.schema.metadata[b"query_result"])
+    return QueryResult(table.to_pandas(), paging["query_id"], paging["offset"], paging["page_size"], paging["total_rows"])
@@ -0,0 +1,132 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Quoted literals/identifiers, comments, whitespace runs
+_SQL_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)|(\s+)", re.S)
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+((?:\"[^\"]+\"|[\w$]+)(?:\s*\.\s*(?:\"[^\"]+\"|[\w$]+))*)", re.I)
+
+def normalize_sql(sql: str) -> str:
+    """Canonical form of a statement: comments dropped, whitespace collapsed, trailing ';' removed. Literals are untouched."""
+    parts = []
+    last = 0
+    for match in _SQL_TOKENS.finditer(sql):
+        if match.start() > last:
+            parts.append(sql[last:match.start()])
+        last = match.end()
+        quoted = match.group(1)
+        if quoted:
+            parts.append(quoted)
+        elif parts and not parts[-1].endswith(' '):
+            parts.append(' ')
+    parts.append(sql[last:])
+    return ''.join(parts).strip().rstrip(';').strip()
+
+def referenced_tables(sql: str) -> set[str]:
+    """Upper-cased, unqualified names of the tables/views a statement reads FROM or JOINs."""
+    tables = set()
+    for ref in _TABLE_REF.findall(normalize_sql(sql)):
+        name = ref.split('.')[-1].strip()
+        tables.add(name.strip('"').upper())
+    return tables
+
+def dataframe_bytes(df) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "expires_at", "tables")
+
+    def __init__(self, value, nbytes, expires_at, tables):
+        self.value = value
+        self.nbytes = nbytes
+        self.expires_at = expires_at
+        self.tables = tables
+
+class ResultCache:
+    """
+    TTL + LRU cache of query results keyed on normalized SQL plus role, warehouse and an optional
+    version, e.g. the generations of the tables read, so a new generation retires older results.
+    The budget is the total in-memory size of the cached DataFrames rather than an entry count,
+    so one wide result can't be outweighed by a hundred tiny ones. Cached frames are shared
+    between callers and must be treated as read-only.
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: float = 900, sizeof=dataframe_bytes):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def key(sql: str, role: str, warehouse: str, version: str = '') -> tuple:
+        return (normalize_sql(sql), (role or '').upper(), (warehouse or '').upper(), version)
+
+    def get(self, sql: str, role: str = None, warehouse: str = None, version: str = ''):
+        key = self.key(sql, role, warehouse, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(self, sql: str, role: str, warehouse: str, value, version: str = ''):
+        nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes:
+            return
+        key = self.key(sql, role, warehouse, version)
+        entry = _Entry(value, nbytes, time.monotonic() + self.ttl, referenced_tables(sql))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate_table(self, table: str) -> int:
+        """Drop every cached result that reads the given table or view. Returns the number dropped."""
+        name = table.split('.')[-1].strip('"').upper()
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if name in entry.tables]
+            for key in stale:
+                self._remove(key)
+            self._invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
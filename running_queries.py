@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+
+class QueryCancelled(Exception):
+    """The statement was cancelled in Snowflake before it finished, by a user or by the statement timeout."""
+    def __init__(self, message: str, cancelled_by: str = None, timed_out: bool = False):
+        super().__init__(message)
+        self.cancelled_by = cancelled_by
+        self.timed_out = timed_out
+
+class RunningQuery:
+    """One statement executing asynchronously in Snowflake, which another thread can ask to cancel."""
+    def __init__(self, sql: str, message: tuple = None):
+        """:param message: (channel, ts) of the Slack message showing the query's progress, if any."""
+        self.id = uuid.uuid4().hex[:16]
+        self.sql = sql
+        self.message = message
+        self.query_id = None
+        self.status = "SUBMITTING"
+        self.started = time.monotonic()
+        self.cancelled_by = None
+        self._cancel = threading.Event()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self, user: str = None):
+        if not self._cancel.is_set():
+            self.cancelled_by = user
+            self._cancel.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep between status polls; returns early (True) as soon as the query is cancelled."""
+        return self._cancel.wait(timeout)
+
+class QueryRegistry:
+    """
+    The queries currently running, so a Slack button (by RunningQuery.id) or a reaction on the
+    progress message (by channel and ts) can reach the worker thread that is polling the query.
+    Slack delivers the click or reaction to any one replica, so with a shared StateBackend a cancel
+    for a query running elsewhere is left in the backend, and each registry checks it for its own
+    running queries every watch_interval seconds.
+    """
+    def __init__(self, backend=None, watch_interval: float = 1.0, cancel_ttl: float = 60 * 60):
+        self.backend = backend
+        self.watch_interval = watch_interval
+        self.cancel_ttl = cancel_ttl
+        self._running = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stats = {"started": 0, "completed": 0, "cancelled": 0, "timed_out": 0, "failed": 0, "remote_cancels": 0}
+
+    def start(self, sql: str, message: tuple = None) -> RunningQuery:
+        running = RunningQuery(sql, message)
+        with self._lock:
+            self._running[running.id] = running
+            self._stats["started"] += 1
+            if self.backend is not None and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="query-cancels", daemon=True)
+                self._watcher.start()
+        return running
+
+    def finish(self, running: RunningQuery, error: Exception = None):
+        with self._lock:
+            self._running.pop(running.id, None)
+            if error is None:
+                outcome = "completed"
+            elif isinstance(error, QueryCancelled):
+                outcome = "timed_out" if error.timed_out else "cancelled"
+            else:
+                outcome = "failed"
+            self._stats[outcome] += 1
+
+    def get(self, query: str) -> RunningQuery:
+        with self._lock:
+            return self._running.get(query)
+
+    def find(self, channel: str, ts: str) -> RunningQuery:
+        """The running query whose progress is shown on the given message, or None."""
+        with self._lock:
+            for running in self._running.values():
+                if running.message == (channel, ts):
+                    return running
+        return None
+
+    def cancel(self, query: str, user: str = None) -> RunningQuery:
+        """
+        Ask the query to stop; the polling thread cancels it in Snowflake. None if it isn't running
+        here: it already finished, or it runs on another replica, which will pick the cancel up.
+        """
+        running = self.get(query)
+        if running is not None:
+            running.cancel(user)
+        else:
+            self._leave_cancel(f"cancel:{query}", user)
+        return running
+
+    def cancel_message(self, channel: str, ts: str, user: str = None) -> RunningQuery:
+        """cancel() for the query whose progress is shown on the given message."""
+        running = self.find(channel, ts)
+        if running is not None:
+            running.cancel(user)
+        else:
+            self._leave_cancel(f"cancel:{channel}:{ts}", user)
+        return running
+
+    # ===== Across replicas =====
+    def _leave_cancel(self, key: str, user: str):
+        if self.backend is not None:
+            self.backend.set(key, (user or "").encode(), self.cancel_ttl)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            with self._lock:
+                if not self._running:
+                    self._watcher = None
+                    return
+                running = list(self._running.values())
+            for query in running:
+                if query.cancelled:
+                    continue
+                keys = [f"cancel:{query.id}"]
+                if query.message is not None:
+                    keys.append(f"cancel:{query.message[0]}:{query.message[1]}")
+                for key in keys:
+                    user = self.backend.get(key)
+                    if user is not None:
+                        query.cancel(user.decode() or None)
+                        with self._lock:
+                            self._stats["remote_cancels"] += 1
+                        break
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"running": len(self._running), **self._stats}
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Hashable
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function, callers that
+    arrive while it is still running wait for it and get the same result (or the same exception).
+    Nothing is remembered once the call finishes; caching is the caller's business.
+    """
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+                "waiting": sum(call.waiters for call in self._calls.values()),
+            }
+
+class SharedFlight:
+    """
+    SingleFlight across replicas, through a shared StateBackend. The replica that claims the key's
+    lock runs the function and publishes the encoded result for result_ttl seconds, which makes it a
+    shared cache as well; other replicas poll for that result instead of repeating the work. If the
+    lock is released without a result (the call failed) or expires, the next poller claims it and
+    runs the function itself. None results are not published.
+    Put a SingleFlight in front of it so only one caller per replica polls for a given key.
+    """
+    def __init__(self, backend, name: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 result_ttl: float, lock_ttl: float, poll_interval: float = 0.25):
+        """:param lock_ttl: Longest the function can run; past it another replica may run it too."""
+        self.backend = backend
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+        self.result_ttl = result_ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stats = {"executed": 0, "shared": 0, "waited": 0, "decode_errors": 0}
+
+    def get(self, key: str) -> Any:
+        """The result another replica (or this one) published for key, or None."""
+        data = self.backend.get(f"{self.name}:result:{key}")
+        if data is None:
+            return None
+        try:
+            return self.decode(data)
+        except Exception as e:
+            print(f"Discarding unreadable shared {self.name} result: {type(e).__name__}: {e}")
+            self._count("decode_errors")
+            return None
+
+    def put(self, key: str, value: Any):
+        if value is not None:
+            self.backend.set(f"{self.name}:result:{key}", self.encode(value), self.result_ttl)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        result = self.get(key)
+        if result is not None:
+            self._count("shared")
+            return result
+        lock = f"{self.name}:lock:{key}"
+        token = uuid.uuid4().hex.encode()
+        waited = False
+        while not self.backend.add(lock, token, self.lock_ttl):
+            # Another replica is running it; its result shows up under the result key
+            if not waited:
+                waited = True
+                self._count("waited")
+            time.sleep(self.poll_interval)
+            result = self.get(key)
+            if result is not None:
+                self._count("shared")
+                return result
+        try:
+            # The last holder may have published and released between our first look and the claim
+            result = self.get(key)
+            if result is not None:
+                self._count("shared")
+                return result
+            self._count("executed")
+            result = fn()
+            self.put(key, result)
+            return result
+        finally:
+            self.backend.delete(lock, token)
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._stats[counter] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop; duplicates await the leader's task."""
+    def __init__(self, name: str = "single-flight"):
+        self.name = name
+        self._calls = {}
+        self._executed = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            self._coalesced += 1
+            # shield: one waiter being cancelled must not cancel the call the others share
+            return await asyncio.shield(task)
+        task = self._calls[key] = asyncio.ensure_future(fn())
+        self._executed += 1
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        return {"executed": self._executed, "coalesced": self._coalesced, "in_flight": len(self._calls)}
@@ -0,0 +1,177 @@
+import threading
+import time
+
+# Slack rejects section text longer than this
+SECTION_TEXT_LIMIT = 3000
+
+TOOL_STATUS = {
+    "cortex_analyst_text_to_sql": ":mag: Generating SQL...",
+    "cortex_search": ":page_facing_up: Searching documents...",
+}
+
+# Snowflake QueryStatus names while a statement has not finished
+QUERY_STATUS = {
+    "QUEUED": ":hourglass: Queued for the warehouse",
+    "RESUMING_WAREHOUSE": ":hourglass: Waiting for the warehouse to resume",
+    "QUEUED_REPAIRING_WAREHOUSE": ":hourglass: Waiting for the warehouse to be repaired",
+    "BLOCKED": ":lock: Waiting for a lock",
+}
+
+class SlackMessageStreamer:
+    """
+    Progressively edits one Slack message in place as an answer streams in.
+    Text deltas and status changes are coalesced and pushed with chat.update at most once
+    per min_interval seconds from a background thread, so a fast token stream costs a
+    bounded number of Slack API calls instead of one per delta.
+    """
+    def __init__(self, client, channel: str, ts: str, min_interval: float = 1.0):
+        self.client = client
+        self.channel = channel
+        self.ts = ts
+        self.min_interval = min_interval
+        self._fragments = []
+        self._status = ":snowflake: Thinking..."
+        self._actions = None
+        self._dirty = False
+        self._closed = False
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._flusher = threading.Thread(target=self._run, name="slack-stream", daemon=True)
+        self._flusher.start()
+
+    def on_event(self, kind: str, value):
+        """Callback for CortexChat.chat(on_event=...)."""
+        if kind == 'text':
+            self.append(value)
+        elif kind == 'tool_use':
+            self.set_status(TOOL_STATUS.get(value.get('type'), f":gear: Running {value.get('name', 'tool')}..."))
+
+    def append(self, text: str):
+        with self._lock:
+            self._fragments.append(text)
+            self._dirty = True
+            self._wake.notify()
+
+    def set_status(self, status: str, actions: list = None):
+        """:param actions: Block Kit elements (e.g. a Cancel button) shown under the status until it changes."""
+        with self._lock:
+            if status != self._status or actions != self._actions:
+                self._status = status
+                self._actions = actions
+                self._dirty = True
+                self._wake.notify()
+
+    def text(self) -> str:
+        with self._lock:
+            return ''.join(self._fragments)
+
+    def finish(self, text: str = None, blocks: list = None):
+        """
+        Stop streaming and push the final state. If blocks are given they replace the streamed
+        preview, otherwise the accumulated text is left in place without a status line.
+        """
+        with self._lock:
+            self._closed = True
+            self._status = None
+            had_actions, self._actions = self._actions is not None, None
+            self._wake.notify()
+        self._flusher.join()
+        if blocks is not None:
+            self.client.chat_update(channel=self.channel, ts=self.ts, text=text or "Answer:", blocks=blocks)
+        elif self._fragments or had_actions:
+            # Also push when only buttons were showing, so none is left behind
+            self._push(''.join(self._fragments), None)
+
+    def _run(self):
+        last_push = 0.0
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                # Let more deltas pile up until the interval has passed; they go out together.
+                wait = last_push + self.min_interval - time.monotonic()
+                while wait > 0 and not self._closed:
+                    self._wake.wait(wait)
+                    wait = last_push + self.min_interval - time.monotonic()
+                if self._closed:
+                    return
+                text = ''.join(self._fragments)
+                status = self._status
+                actions = self._actions
+                self._dirty = False
+            try:
+                self._push(text, status, actions)
+            except Exception as e:
+                print(f"Streaming update failed: {type(e).__name__}: {e}")
+            last_push = time.monotonic()
+
+    def _push(self, text: str, status: str, actions: list = None):
+        self.client.chat_update(channel=self.channel, ts=self.ts, text=text or "Answer:", blocks=self._blocks(text, status, actions))
+
+    def _blocks(self, text: str, status: str, actions: list = None) -> list:
+        blocks = []
+        if text:
+            if len(text) > SECTION_TEXT_LIMIT:
+                text = "..." + text[-(SECTION_TEXT_LIMIT - 3):]
+            blocks.append({
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": text
+                }
+            })
+        if status:
+            blocks.append({
+                "type": "context",
+                "elements": [
+                    {
+                        "type": "mrkdwn",
+                        "text": status
+                    }
+                ]
+            })
+            if actions:
+                blocks.append({
+                    "type": "actions",
+                    "elements": actions
+                })
+        return blocks
+
+class QueryProgress:
+    """
+    on_progress callback for query_results.run_first_page_async. Once a query has run for delay
+    seconds, it shows the query's state, its elapsed time and a Cancel button as the streamer's
+    status. The streamer's flusher limits how often chat.update is called, so a query that finishes
+    quickly never touches the message.
+    """
+    def __init__(self, streamer: SlackMessageStreamer, delay: float = 2.0):
+        self.streamer = streamer
+        self.delay = delay
+        self.shown = False
+
+    @property
+    def message(self) -> tuple:
+        return self.streamer.channel, self.streamer.ts
+
+    def __call__(self, running):
+        if running.elapsed < self.delay:
+            return
+        self.shown = True
+        status = QUERY_STATUS.get(running.status, ":hourglass_flowing_sand: Running SQL")
+        self.streamer.set_status(f"{status}... {running.elapsed:.0f}s", actions=cancel_query_actions(running.id))
+
+def cancel_query_actions(query: str) -> list:
+    return [
+        {
+            "type": "button",
+            "action_id": "cancel_query",
+            "text": {
+                "type": "plain_text",
+                "text": "Cancel"
+            },
+            "style": "danger",
+            "value": query
+        }
+    ]
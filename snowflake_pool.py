@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the checkout timeout."""
+
+def is_disconnect(e: Exception) -> bool:
+    """True for errors that mean the connection itself is unusable (e.g. expired session token)."""
+    return getattr(e, 'sqlstate', None) == '08001' or "08001" in str(e)
+
+class _PooledConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+class SnowflakeConnectionPool:
+    """
+    Thread-safe pool of Snowflake connections built by a single connect() factory.
+    Connections are health checked on checkout, recycled in the background before their session
+    would expire (max_age), and replaced when a query reports a disconnect, so no request has to
+    stall on an inline reconnect. Checkouts wait at most checkout_timeout seconds for a free slot.
+    """
+    def __init__(self, connect, min_size: int = 1, max_size: int = 4, checkout_timeout: float = 30,
+                 max_age: float = 3 * 60 * 60, health_check_idle: float = 300, maintenance_interval: float = 60):
+        """
+        :param connect: Zero-argument callable returning a new DB-API connection.
+        :param max_age: Seconds after which a connection is re-authenticated (replaced) proactively.
+        :param health_check_idle: Connections idle longer than this are pinged before being handed out.
+        :param maintenance_interval: Seconds between background recycle/top-up passes.
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.max_age = max_age
+        self.health_check_idle = health_check_idle
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._stats = {"checkouts": 0, "created": 0, "recycled": 0, "discarded": 0, "timeouts": 0}
+
+        for _ in range(min_size):
+            self._idle.append(self._create())
+            self._size += 1
+
+        self._maintenance_interval = maintenance_interval
+        self._stop = threading.Event()
+        self._maintainer = threading.Thread(target=self._maintain, name="snowflake-pool", daemon=True)
+        self._maintainer.start()
+
+    @contextmanager
+    def connection(self):
+        """Check out a healthy connection for the duration of the with-block."""
+        pooled = self._checkout()
+        try:
+            yield pooled.conn
+        except Exception as e:
+            if is_disconnect(e):
+                self._discard(pooled)
+            else:
+                self._checkin(pooled)
+            raise
+        else:
+            self._checkin(pooled)
+
+    def _create(self) -> _PooledConnection:
+        pooled = _PooledConnection(self._connect())
+        with self._lock:
+            self._stats["created"] += 1
+        return pooled
+
+    def _checkout(self) -> _PooledConnection:
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"No Snowflake connection available within {self.checkout_timeout}s")
+                    self._available.wait(remaining)
+                self._stats["checkouts"] += 1
+                if self._idle:
+                    pooled = self._idle.pop()  # most recently used first, so spare connections age out
+                else:
+                    self._size += 1
+                    pooled = None
+            if pooled is None:
+                try:
+                    return self._create()
+                except Exception:
+                    self._release_slot()
+                    raise
+            if self._healthy(pooled):
+                return pooled
+            self._discard(pooled)
+
+    def _healthy(self, pooled: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if pooled.conn.is_closed() or now - pooled.created_at >= self.max_age:
+            return False
+        if now - pooled.last_used >= self.health_check_idle:
+            try:
+                pooled.conn.cursor().execute("SELECT 1").fetchall()
+            except Exception as e:
+                print(f"Snowflake pooled connection failed health check: {e}")
+                return False
+        return True
+
+    def _checkin(self, pooled: _PooledConnection):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            if not self._closed and not pooled.conn.is_closed():
+                self._idle.append(pooled)
+                self._available.notify()
+                return
+        self._discard(pooled)
+
+    def _discard(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats["discarded"] += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._size -= 1
+            self._available.notify()
+
+    def _maintain(self):
+        while not self._stop.wait(self._maintenance_interval):
+            try:
+                self._recycle_aged()
+                self._top_up()
+            except Exception as e:
+                print(f"Snowflake pool maintenance failed: {type(e).__name__}: {e}")
+
+    def _recycle_aged(self):
+        """Replace idle connections nearing max_age, re-authenticating off the request path."""
+        threshold = self.max_age - 2 * self._maintenance_interval
+        with self._lock:
+            aged = [p for p in self._idle if time.monotonic() - p.created_at >= threshold]
+        for old in aged:
+            with self._lock:
+                try:
+                    self._idle.remove(old)
+                except ValueError:
+                    continue  # checked out meanwhile; it is recycled at its next checkout
+            try:
+                old.conn.close()
+            except Exception:
+                pass
+            # The slot stays reserved while the replacement logs in.
+            try:
+                fresh = self._create()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._lock:
+                self._idle.appendleft(fresh)
+                self._stats["recycled"] += 1
+                self._available.notify()
+
+    def _top_up(self):
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                pooled = self._create()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._lock:
+                self._idle.append(pooled)
+                self._available.notify()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle)}
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._available.notify_all()
+        for pooled in idle:
+            try:
+                pooled.conn.close()
+            except Exception:
+                pass
@@ -0,0 +1,184 @@
+import json
+import re
+import threading
+from typing import NamedTuple
+
+from result_cache import normalize_sql
+
+class SQLRejected(Exception):
+    """The generated SQL was not run; the message explains why, for the user."""
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class Token(NamedTuple):
+    kind: str  # 'word', 'number', 'string', 'ident' (quoted identifier) or 'punct'
+    text: str
+    depth: int  # parenthesis nesting level
+    start: int
+    end: int
+
+_TOKEN = re.compile(r"""
+    (?P<string>'(?:[^'\\]|\\.|'')*'|\$\$.*?\$\$)
+  | (?P<ident>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<punct>\S)
+""", re.S | re.X)
+
+# Statements that change data, objects, grants or session state
+FORBIDDEN = frozenset("""
+INSERT UPDATE DELETE MERGE UPSERT TRUNCATE CREATE DROP ALTER UNDROP RENAME REPLACE GRANT REVOKE CALL
+EXECUTE COPY PUT GET REMOVE USE SET UNSET BEGIN COMMIT ROLLBACK
+""".split())
+
+def tokenize(sql: str) -> list[Token]:
+    tokens = []
+    depth = 0
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        text = match.group()
+        if text == ')':
+            depth -= 1
+        tokens.append(Token(kind, text, depth, match.start(), match.end()))
+        if text == '(':
+            depth += 1
+    return tokens
+
+def check_read_only(sql: str) -> list[Token]:
+    """Tokens of sql if it is a single SELECT (optionally WITH ... SELECT); raises SQLRejected otherwise."""
+    tokens = tokenize(sql)
+    if not tokens:
+        raise SQLRejected("empty", "The generated query is empty.")
+    if any(t.text == ';' for t in tokens):
+        raise SQLRejected("multiple_statements", "The generated SQL contains more than one statement, so it was not run.")
+    first = tokens[0].text.upper()
+    if first not in ("SELECT", "WITH"):
+        raise SQLRejected("not_select", f"Only SELECT queries are run from Slack; the generated statement starts with {first}.")
+    for i, token in enumerate(tokens):
+        # REPLACE(...), INSERT(...), GET(...) are also scalar functions
+        is_call = i + 1 < len(tokens) and tokens[i + 1].text == '('
+        if token.kind == 'word' and token.text.upper() in FORBIDDEN and not is_call:
+            raise SQLRejected("not_select", f"The generated query contains {token.text.upper()}, so it was not run; only read-only queries are allowed.")
+    return tokens
+
+def apply_limit(sql: str, tokens: list[Token], max_rows: int) -> str:
+    """Add LIMIT max_rows to the outermost query, or lower an existing LIMIT / FETCH / TOP that is larger."""
+    top_level = [t for t in tokens if t.depth == 0]
+    words = [t.text.upper() for t in top_level]
+    for i, word in enumerate(words):
+        # LIMIT n [OFFSET m]  |  FETCH {FIRST|NEXT} n {ROW|ROWS} ONLY  |  SELECT [DISTINCT] TOP n
+        count = None
+        if word == "LIMIT" and i + 1 < len(top_level):
+            count = top_level[i + 1]
+        elif word == "FETCH" and i + 2 < len(top_level) and words[i + 1] in ("FIRST", "NEXT"):
+            count = top_level[i + 2]
+        elif word == "TOP" and i > 0 and words[i - 1] in ("SELECT", "DISTINCT") and i + 1 < len(top_level):
+            count = top_level[i + 1]
+        if count is None:
+            continue
+        if count.kind != 'number' or '.' in count.text:
+            # LIMIT NULL / a bind variable / an expression: keep it but cap the result around it
+            return f"SELECT * FROM ({sql}) LIMIT {max_rows}"
+        if int(count.text) <= max_rows:
+            return sql
+        return sql[:count.start] + str(max_rows) + sql[count.end:]
+    return f"{sql} LIMIT {max_rows}"
+
+class PlanEstimate(NamedTuple):
+    partitions_total: int
+    partitions_assigned: int
+    bytes_assigned: int
+
+def explain(conn, sql: str) -> PlanEstimate:
+    """Compile sql without running it and read the scan estimate from the plan's GlobalStats."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"EXPLAIN USING JSON {sql}")
+        plan = json.loads(cur.fetchone()[0])
+    finally:
+        cur.close()
+    stats = plan.get("GlobalStats", {})
+    return PlanEstimate(int(stats.get("partitionsTotal", 0)), int(stats.get("partitionsAssigned", 0)), int(stats.get("bytesAssigned", 0)))
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+class SQLGuard:
+    """
+    Checks generated SQL before it reaches the warehouse.
+    prepare() is local and cheap: comments stripped, anything but a single SELECT rejected, and
+    the row count capped at max_rows. check_cost() runs EXPLAIN and rejects statements whose
+    estimated scan is over max_scan_bytes or max_partitions (0 disables either check). timeout is
+    the per-statement limit in seconds: callers enforce it while they wait on a statement, and
+    session_parameters() has Snowflake enforce it too, for statements nobody is waiting on any more.
+    """
+    def __init__(self, max_rows: int = 1000, max_scan_bytes: int = 0, max_partitions: int = 0, timeout: int = 0):
+        self.max_rows = max_rows
+        self.max_scan_bytes = max_scan_bytes
+        self.max_partitions = max_partitions
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._limited = 0
+        self._rejected = {}
+
+    def prepare(self, sql: str) -> str:
+        sql = normalize_sql(sql)
+        try:
+            tokens = check_read_only(sql)
+        except SQLRejected as e:
+            self._count_rejected(e.reason)
+            raise
+        guarded = apply_limit(sql, tokens, self.max_rows) if self.max_rows else sql
+        with self._lock:
+            self._checked += 1
+            if guarded != sql:
+                self._limited += 1
+        return guarded
+
+    def check_cost(self, conn, sql: str):
+        if not self.max_scan_bytes and not self.max_partitions:
+            return
+        try:
+            estimate = explain(conn, sql)
+        except Exception as e:
+            # The estimate is advisory; let the statement run (and fail on its own if it is invalid)
+            print(f"EXPLAIN failed, running query unchecked: {type(e).__name__}: {e}")
+            return
+        if self.max_scan_bytes and estimate.bytes_assigned > self.max_scan_bytes:
+            self._count_rejected("scan_bytes")
+            raise SQLRejected("scan_bytes",
+                f"This query would scan about {format_bytes(estimate.bytes_assigned)} "
+                f"({estimate.partitions_assigned:,} of {estimate.partitions_total:,} partitions), over the "
+                f"{format_bytes(self.max_scan_bytes)} limit for questions from Slack. Try narrowing it, e.g. to a date range or a few stores.")
+        if self.max_partitions and estimate.partitions_assigned > self.max_partitions:
+            self._count_rejected("partitions")
+            raise SQLRejected("partitions",
+                f"This query would read {estimate.partitions_assigned:,} of {estimate.partitions_total:,} partitions, over the "
+                f"limit of {self.max_partitions:,} for questions from Slack. Try narrowing it, e.g. to a date range or a few stores.")
+
+    def session_parameters(self) -> dict[str, int]:
+        """Parameters for the connections that run guarded statements, so the warehouse stops them at timeout on its own."""
+        if not self.timeout:
+            return {}
+        return {"STATEMENT_TIMEOUT_IN_SECONDS": self.timeout}
+
+    def timed_out(self, e: Exception) -> SQLRejected:
+        """SQLRejected to raise in place of the connector's statement-timeout error, or None if e is something else."""
+        # 604: cancelled by the client at its timeout; 630: reached STATEMENT_TIMEOUT_IN_SECONDS
+        if getattr(e, 'timed_out', False) or getattr(e, 'errno', None) in (604, 630) or ("timeout" in str(e).lower() and "cancel" in str(e).lower()):
+            self._count_rejected("timeout")
+            return SQLRejected("timeout", f"The query was still running after {self.timeout}s and was cancelled. Try a narrower question.")
+        return None
+
+    def _count_rejected(self, reason: str):
+        with self._lock:
+            self._rejected[reason] = self._rejected.get(reason, 0) + 1
+
+    def stats(self) -> dict[str, any]:
+        with self._lock:
+            return {"checked": self._checked, "limited": self._limited, "rejected": dict(self._rejected)}
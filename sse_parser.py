@@ -0,0 +1,160 @@
+import json
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _decoder = json.JSONDecoder()
+
+    def _loads(data: bytes):
+        # json.loads(bytes) sniffs the encoding and strips whitespace with regexes on every call;
+        # an SSE data field is UTF-8 with nothing around the value
+        return _decoder.raw_decode(data.decode('utf-8'))[0]
+
+# ===== Server-Sent Events =====
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str]
+
+class SSEParser:
+    """
+    Incremental parser for a text/event-stream body, per the WHATWG SSE spec.
+    Feed it raw byte chunks of any size as they arrive; it buffers partial lines across chunk
+    boundaries, joins multi-line data fields, honours event/id fields and ignores comments.
+    feed()/close() return SSEEvents; feed_raw()/close_raw() return plain (event, data bytes, id)
+    tuples, which is what the Cortex hot path uses to avoid building and decoding an object per event.
+    """
+    def __init__(self):
+        self._pending = []
+        self._event = ''
+        self._data = []
+        self._last_id = None
+
+    def feed(self, chunk: bytes) -> list[SSEEvent]:
+        """Consume a chunk and return the events completed by it."""
+        return [SSEEvent(event or 'message', data.decode('utf-8'), last_id) for event, data, last_id in self.feed_raw(chunk)]
+
+    def close(self) -> list[SSEEvent]:
+        """Flush at end of stream. A final event without its blank-line terminator is discarded, as the spec requires."""
+        return [SSEEvent(event or 'message', data.decode('utf-8'), last_id) for event, data, last_id in self.close_raw()]
+
+    def feed_raw(self, chunk: bytes) -> list[tuple[str, bytes, Optional[str]]]:
+        """feed() without the SSEEvents: (event type or '', undecoded data, last id) per completed event."""
+        if b'\n' not in chunk and b'\r' not in chunk:
+            # Middle of a long line; hold the pieces and join once, not once per chunk.
+            if chunk:
+                self._pending.append(chunk)
+            return []
+        if self._pending:
+            self._pending.append(chunk)
+            buf = b''.join(self._pending)
+        else:
+            buf = chunk
+        lines = buf.splitlines()
+        last = buf[-1:]
+        if last == b'\n':
+            self._pending = []
+        elif last == b'\r':
+            # Its LF may be in the next chunk; joined back, CRLF is still one line ending
+            self._pending = [lines.pop() + b'\r']
+        else:
+            self._pending = [lines.pop()]
+        events = []
+        data = self._data
+        for line in lines:
+            if line.startswith(b'data:'):
+                # Fast path for the overwhelmingly common field
+                data.append(line[6:] if line[5:6] == b' ' else line[5:])
+            elif not line:
+                if data:
+                    events.append((self._event, data[0] if len(data) == 1 else b'\n'.join(data), self._last_id))
+                    data = self._data = []
+                self._event = ''
+            elif line[0] != 0x3A:  # ':' comment / keep-alive
+                self._field(line)
+        return events
+
+    def close_raw(self) -> list[tuple[str, bytes, Optional[str]]]:
+        """close() without the SSEEvents."""
+        # Ending the pending line dispatches only if it was the blank line (a lone CR) ending an event
+        events = self.feed_raw(b'\n') if self._pending else []
+        self._event, self._data = '', []
+        return events
+
+    def _field(self, line: bytes):
+        field, sep, value = line.partition(b':')
+        if sep and value[:1] == b' ':
+            value = value[1:]
+        if field == b'data':
+            self._data.append(value)
+        elif field == b'event':
+            self._event = value.decode('utf-8')
+        elif field == b'id':
+            if b'\0' not in value:
+                self._last_id = value.decode('utf-8')
+        # 'retry' and unknown fields don't affect parsing
+
+def iter_sse(chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+    parser = SSEParser()
+    for chunk in chunks:
+        if chunk:
+            yield from parser.feed(chunk)
+    yield from parser.close()
+
+# ===== Cortex Agents events =====
+def new_accumulator() -> dict[str, list]:
+    return {
+        'text': [],  # fragments, joined once at the end
+        'tool_use': [],
+        'tool_results': [],
+        'other': []
+    }
+
+def accumulate_cortex(events: list[tuple[str, bytes, Optional[str]]], accumulated: dict[str, list], on_event=None):
+    """
+    Fold raw SSE events (SSEParser.feed_raw) from the Cortex Agents API into an accumulator from new_accumulator().
+    :param on_event: Optional callback invoked as on_event(kind, value), with kind "text" for each
+        text delta and "tool_use" for each tool the agent invokes.
+    """
+    text, tool_use, tool_results, other = accumulated['text'], accumulated['tool_use'], accumulated['tool_results'], accumulated['other']
+    for _, data, _ in events:
+        if data == b'[DONE]':
+            continue
+        try:
+            payload = _loads(data)
+        except ValueError:  # JSON and UTF-8 errors alike
+            print(f"Failed to parse: {data[:200].decode('utf-8', 'replace')}")
+            continue
+        if type(payload) is not dict:
+            other.append({'data': payload})
+            continue
+        if payload.get('object') != 'message.delta':
+            other.append(payload)
+            continue
+        for entry in payload.get('delta', {}).get('content', ()):
+            entry_type = entry.get('type')
+            if entry_type == 'text':
+                value = entry.get('text', '')
+                if value:
+                    text.append(value)
+                    if on_event is not None:
+                        on_event('text', value)
+            elif entry_type == 'tool_use':
+                value = entry.get('tool_use', {})
+                tool_use.append(value)
+                if on_event is not None:
+                    on_event('tool_use', value)
+            elif entry_type == 'tool_results':
+                tool_results.append(entry.get('tool_results', {}))
+
+def parse_cortex_stream(chunks: Iterable[bytes], on_event=None) -> dict[str, list]:
+    """The accumulated Cortex response from raw response body chunks, e.g. requests' iter_content(chunk_size=None)."""
+    accumulated = new_accumulator()
+    parser = SSEParser()
+    for chunk in chunks:
+        if chunk:
+            accumulate_cortex(parser.feed_raw(chunk), accumulated, on_event)
+    accumulate_cortex(parser.close_raw(), accumulated, on_event)
+    return accumulated
@@ -0,0 +1,163 @@
+import hashlib
+import math
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+
+def replica_id() -> str:
+    """Identifies this process among the bot's replicas, e.g. as the owner of a claimed event or a held lock."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def key_digest(*parts) -> str:
+    """A fixed-length key for parts of any size (SQL text, normalized prompts)."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:32]
+
+class StateBackend(ABC):
+    """
+    State the bot's replicas share: caches, claimed Slack events, rate-limit buckets and in-flight
+    locks. Values are bytes and every key expires after its ttl (seconds), so nothing needs cleaning up.
+    A single replica has no backend: its in-process structures already do the same job, faster.
+    """
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """The value of key, or None if it is absent or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        """Set key to value, replacing any value it had."""
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set key only if it is absent; True if this caller set it. The claim and lock primitive."""
+
+    @abstractmethod
+    def delete(self, key: str, value: bytes = None) -> bool:
+        """Delete key; with value, only while it still holds that value (releasing a lock this caller owns)."""
+
+    @abstractmethod
+    def take(self, key: str, rate: float, burst: float) -> float:
+        """Take one token from the bucket at key. Returns 0 on success, else the seconds until one is available."""
+
+    @abstractmethod
+    def give_back(self, key: str, rate: float, burst: float):
+        """Return a token taken with take(), e.g. when a later check rejected the request anyway."""
+
+    @abstractmethod
+    def stats(self) -> dict[str, any]:
+        """Counters exported with the bot's other stats, see metrics.register_stats."""
+
+# Token bucket kept in a hash, refilled from the server's clock so replicas' clocks don't matter.
+# KEYS[1] bucket; ARGV rate, burst, cost (-1 gives a token back), ttl. Returns the wait as a string
+# (Lua numbers come back as truncated integers).
+_TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = math.min(burst, tokens - cost)
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(wait)
+"""
+
+# Delete KEYS[1] only while it holds ARGV[1], so a lock that expired and was taken by another replica isn't released
+_DELETE_IF_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class RedisBackend(StateBackend):
+    """
+    StateBackend on a Redis-protocol server (Redis, Valkey, KeyDB, ...) that every replica connects to,
+    e.g. redis://localhost:6379/0. Keys are namespaced with prefix so deployments can share a server.
+    If the server can't be reached the bot keeps answering: reads miss, writes are dropped, claims and
+    tokens are granted. Duplicate work while it is down is better than no answers; errors are counted.
+    """
+    def __init__(self, url: str, prefix: str = "cortex-slack-bot:", socket_timeout: float = 1.0, max_connections: int = 50):
+        import redis  # only needed when state is shared between replicas
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(
+            url,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            max_connections=max_connections,
+            health_check_interval=30,
+        )
+        self._error_types = (redis.RedisError, OSError)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._delete_if = self._redis.register_script(_DELETE_IF_SCRIPT)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._last_error_logged = 0.0
+
+    def _call(self, op: str, fallback, fn, *args, **kwargs):
+        with self._lock:
+            self._calls += 1
+        try:
+            return fn(*args, **kwargs)
+        except self._error_types as e:
+            now = time.monotonic()
+            with self._lock:
+                self._errors += 1
+                log = now - self._last_error_logged >= 10
+                if log:
+                    self._last_error_logged = now
+            if log:
+                print(f"Shared state {op} failed, continuing without it: {type(e).__name__}: {e}")
+            return fallback
+
+    @staticmethod
+    def _ms(ttl: float) -> int:
+        return max(1, int(ttl * 1000))
+
+    def get(self, key: str) -> bytes:
+        return self._call("get", None, self._redis.get, self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self._call("set", None, self._redis.set, self.prefix + key, value, px=self._ms(ttl))
+
+    def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(self._call("add", True, self._redis.set, self.prefix + key, value, nx=True, px=self._ms(ttl)))
+
+    def delete(self, key: str, value: bytes = None) -> bool:
+        if value is None:
+            return bool(self._call("delete", 0, self._redis.delete, self.prefix + key))
+        return bool(self._call("delete", 0, self._delete_if, keys=[self.prefix + key], args=[value]))
+
+    def _bucket(self, key: str, rate: float, burst: float, cost: int) -> float:
+        # A bucket that has had time to refill completely is the same as no bucket
+        ttl = math.ceil(burst / rate) + 1
+        wait = self._call("take", b"0", self._take, keys=[self.prefix + key], args=[rate, burst, cost, ttl])
+        return float(wait)
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        return self._bucket(key, rate, burst, 1)
+
+    def give_back(self, key: str, rate: float, burst: float):
+        self._bucket(key, rate, burst, -1)
+
+    def stats(self) -> dict[str, any]:
+        with self._lock:
+            return {"backend": "redis", "calls": self._calls, "errors": self._errors}
+
+def open_backend(url: str = None, prefix: str = "cortex-slack-bot:") -> StateBackend:
+    """The backend for url: redis://, rediss:// or unix:// for a shared server; None when url is empty (a single replica)."""
+    if not url:
+        return None
+    if url.split("://", 1)[0] in ("redis", "rediss", "unix"):
+        return RedisBackend(url, prefix=prefix)
+    raise ValueError(f"Unsupported state backend URL: {url!r}")
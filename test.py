@@ -2,8 +2,7 @@ import os
 import json
 import requests
 from dotenv import load_dotenv
-import generate_jwt
-from generate_jwt import JWTGenerator
+from token_manager import get_token_manager
 import jwt as pyjwt
 
 # Load environment variables from .env
@@ -12,8 +11,8 @@ load_dotenv()
 if not os.path.isfile(os.getenv("RSA_PRIVATE_KEY_PATH")):
     raise FileNotFoundError("Private key file not found")
 
-# Instantiate JWT generator and get token
-jwt = JWTGenerator(
+# Get a token from the shared JWT manager
+jwt = get_token_manager(
     os.getenv("ACCOUNT"),
     os.getenv("USER"),
     os.getenv("RSA_PRIVATE_KEY_PATH")
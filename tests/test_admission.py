@@ -0,0 +1,46 @@
+import math
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from admission import AdmissionController, AdmissionRejected, TokenBucket
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated
+    assert bucket.try_take(now) == 0 and bucket.try_take(now) == 0
+    assert bucket.try_take(now) == pytest.approx(0.5)
+    assert bucket.try_take(now + 0.5) == 0
+    assert not bucket.is_full(now + 0.5) and bucket.is_full(now + 10)
+    assert bucket.tokens == 2
+    assert TokenBucket(rate=0, capacity=0).try_take(now) == math.inf
+
+def test_user_burst_then_rejected_with_retry_hint():
+    admission = AdmissionController(user_rate=1 / 60, user_burst=2, channel_rate=0, channel_burst=0)
+    admission.check("U1", "C1")
+    admission.check("U1", "C1")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check("U1", "C1")
+    assert rejected.value.reason.startswith("You are asking") and 0 < rejected.value.retry_after <= 60
+    admission.check("U2", "C1")
+    assert admission.stats() == {"admitted": 3, "rejected": {"user": 1, "channel": 0}, "buckets": 2}
+
+def test_channel_rejection_gives_the_user_token_back():
+    admission = AdmissionController(user_rate=1 / 60, user_burst=1, channel_rate=1 / 60, channel_burst=1)
+    admission.check("U1", "C1")
+    with pytest.raises(AdmissionRejected):
+        admission.check("U2", "C1")
+    # U2's question never ran, so U2 can still ask elsewhere
+    admission.check("U2", "C2")
+    assert admission.stats()["rejected"] == {"user": 0, "channel": 1}
+
+def test_full_buckets_are_dropped_past_max_buckets():
+    admission = AdmissionController(user_rate=1000, user_burst=1, channel_rate=0, channel_burst=0, max_buckets=10)
+    for i in range(11):
+        admission.check(f"U{i}", "C1")
+    time.sleep(0.01)  # they refill to full in 1ms
+    admission.check("U11", "C1")
+    assert admission.stats()["buckets"] == 1
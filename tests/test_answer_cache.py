@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from answer_cache import AnswerCache, content_words, prompt_key
+from tool_router import compile_semantic_model
+
+BASE = "Show me the top selling brands by total sales quantity in the state TX in the Books category in the year 2003"
+
+def model_vocabulary() -> frozenset:
+    """What app.load_answer_vocabulary gives the cache for the bundled semantic models."""
+    vocabulary = set()
+    for name in ("tpcds_semantic_view_sm.yaml", "support_tickets_semantic_model.yaml"):
+        for tokens in compile_semantic_model(os.path.join(ROOT, name), None).terms:
+            vocabulary |= tokens
+    return frozenset(vocabulary)
+
+def test_backlog_example_pair_hits():
+    for vocabulary in (frozenset(), model_vocabulary()):
+        cache = AnswerCache(threshold=0.8, vocabulary=vocabulary)
+        cache.put('top brands in TX books 2003', {"text": "answer"})
+        assert cache.get('show me top selling brands, TX, Books, 2003') == {"text": "answer"}
+        assert cache.stats()["near_hits"] == 1
+
+def test_content_words_ignore_case():
+    vocabulary = model_vocabulary()
+    assert content_words('top brands in TX books 2003', vocabulary) == content_words('Top Brands in tx BOOKS 2003', vocabulary)
+    assert content_words('top selling brands, TX, Books, 2003', vocabulary) == ('top', 'brand', 'book', '2003')
+
+def test_changed_content_misses():
+    cache = AnswerCache(threshold=0.8, vocabulary=model_vocabulary())
+    cache.put(BASE, {"text": "TX"})
+    for old, new in (("TX", "CA"), ("Books", "Music"), ("top", "bottom"), ("quantity", "amount"), ("2003", "2004")):
+        assert cache.get(BASE.replace(old, new)) is None, new
+    assert cache.get("Please " + BASE) == {"text": "TX"}
+
+def test_reordered_words_miss():
+    cache = AnswerCache(threshold=0.8)
+    cache.put("orders shipped from Texas to California", {"text": "TX to CA"})
+    assert cache.get("orders shipped from California to Texas") is None
+    assert prompt_key("orders shipped from California to Texas") != prompt_key("orders shipped from Texas to California")
+
+def test_exact_only_at_threshold_one():
+    cache = AnswerCache(threshold=1.0)
+    cache.put('top brands in TX books 2003', {"text": "answer"})
+    assert cache.get('Top brands in TX books 2003?') == {"text": "answer"}
+    assert cache.get('show me top selling brands, TX, Books, 2003') is None
+
+def test_ttl_and_eviction():
+    cache = AnswerCache(ttl=0.05, max_entries=2)
+    cache.put("first question about sales", {"n": 1})
+    cache.put("second question about stores", {"n": 2})
+    cache.put("third question about items", {"n": 3})
+    assert cache.get("first question about sales") is None
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.06)
+    assert cache.get("third question about items") is None
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from event_dedup import EventDeduplicator, InMemoryDedupStore
+
+def message(event_id="Ev1", **event):
+    return {"event_id": event_id, "event": dict({"type": "message", "text": "top brands?", "channel": "C1", "ts": "1.1"}, **event)}
+
+def test_redelivery_is_dropped():
+    dedup = EventDeduplicator()
+    assert dedup.should_process(message())
+    assert not dedup.should_process(message())
+    assert dedup.should_process(message("Ev2", ts="2.2"))
+    assert dedup.stats() == {"accepted": 2, "duplicates": 1, "ignored": 0}
+
+def test_non_questions_are_ignored():
+    dedup = EventDeduplicator()
+    assert not dedup.should_process(message(bot_id="B1"))
+    assert not dedup.should_process(message(subtype="message_changed"))
+    assert not dedup.should_process(message(text=""))
+    assert dedup.should_process(message(subtype="file_share"))
+    assert dedup.stats()["ignored"] == 3
+
+def test_event_key_falls_back_to_the_message():
+    assert EventDeduplicator.event_key(message()) == "event:Ev1"
+    assert EventDeduplicator.event_key(message(None, client_msg_id="m1")) == "msg:m1"
+    assert EventDeduplicator.event_key(message(None)) == "ts:C1:1.1"
+    assert EventDeduplicator.event_key({"event": {}}) is None
+
+def test_store_forgets_after_ttl_and_past_max_entries():
+    store = InMemoryDedupStore(max_entries=2, ttl=0.05)
+    assert store.add_if_absent("a") and not store.add_if_absent("a")
+    store.add_if_absent("b")
+    store.add_if_absent("c")
+    assert len(store) == 2 and store.add_if_absent("a")
+    time.sleep(0.06)
+    assert store.add_if_absent("c") and len(store) == 1
@@ -0,0 +1,78 @@
+import glob
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ingest
+
+class RecordingCursor:
+    """Runs nothing; records statements and answers PUT like Snowflake, one row per file the pattern matches."""
+    def __init__(self):
+        self.statements = []
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self._rows = []
+        if sql.startswith("PUT"):
+            pattern = re.search(r"'file://([^']+)'", sql).group(1)
+            self._rows = [(os.path.basename(path), os.path.basename(path), 1, 1, "NONE", "NONE", "UPLOADED", "")
+                          for path in glob.glob(pattern)]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+class RecordingConnection:
+    def __init__(self):
+        self.cur = RecordingCursor()
+
+    def cursor(self):
+        return self.cur
+
+def write_pdfs(directory, names):
+    for name in names:
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(b"%PDF-1.4 " + name.encode())
+
+def test_scan_and_diff(tmp_path):
+    write_pdfs(tmp_path, ["a.pdf", "B.PDF"])
+    (tmp_path / "notes.txt").write_text("skip")
+    current = ingest.scan(str(tmp_path), {})
+    assert sorted(current) == ["B.PDF", "a.pdf"]
+    assert ingest.diff(current, current) == ingest.ChangeSet([], [], 2)
+    manifest = dict(current, **{"gone.pdf": current["a.pdf"]})
+    (tmp_path / "a.pdf").write_bytes(b"%PDF-1.4 changed")
+    changes = ingest.diff(ingest.scan(str(tmp_path), manifest), manifest)
+    assert changes.upload == ["a.pdf"] and changes.remove == ["gone.pdf"] and changes.unchanged == 1
+
+def test_upload_includes_upper_case_extension(tmp_path):
+    write_pdfs(tmp_path, ["a.pdf", "B.PDF"])
+    cur = RecordingCursor()
+    ingest.upload(cur, str(tmp_path), ["a.pdf", "B.PDF"], "DB.SCHEMA.STAGE", 4)
+    assert sorted(row[0] for row in cur.fetchall()) == ["B.PDF", "a.pdf"]
+
+def test_upload_fails_when_a_file_is_missing_from_the_put_result(tmp_path, monkeypatch):
+    write_pdfs(tmp_path, ["a.pdf", "B.PDF"])
+    cur = RecordingCursor()
+    monkeypatch.setattr(cur, "fetchall", lambda: cur._rows[:1])
+    try:
+        ingest.upload(cur, str(tmp_path), ["a.pdf", "B.PDF"], "DB.SCHEMA.STAGE", 4)
+    except RuntimeError as e:
+        assert "PUT failed" in str(e)
+    else:
+        raise AssertionError("a file missing from the PUT result must fail the run")
+
+def test_apply_qualifies_every_table(tmp_path):
+    write_pdfs(tmp_path, ["a.pdf"])
+    conn = RecordingConnection()
+    changes = ingest.ChangeSet(["a.pdf"], ["old.pdf"], 0)
+    ingest.apply(conn, str(tmp_path), changes, "DB.SCHEMA.STAGE", "DB.SCHEMA.PARSE", "DB.SCHEMA.CHUNKS", 1800, 300, 4)
+    sql = "\n".join(conn.cur.statements)
+    assert "TEMPORARY TABLE DB.SCHEMA.INGEST_CHUNKS AS" in sql
+    assert not re.search(r"(?<!\.)\bINGEST_CHUNKS\b", sql), "the scratch table must be qualified"
+    assert conn.cur.statements[-1] == "COMMIT"
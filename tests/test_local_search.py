@@ -0,0 +1,88 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from local_search import Chunk, ChunkIndex, LocalSearch, load_snapshot, save_snapshot, table_version, terms
+
+CHUNKS = [
+    Chunk("The Mountain Bike warranty covers the frame for five years. Brakes and tyres are covered for one year. "
+          "Claims need the original receipt.", "Mountain_Bike_Warranty", "warranty/mountain_bike.pdf"),
+    Chunk("Deliveries leave the warehouse every Tuesday. Delivery to islands takes two extra days.", "Shipping_Policy", "policy/shipping.pdf"),
+    Chunk("Road bikes ship with clipless pedals. Saddle height is set at the store.", "Road_Bike_Guide", "guide/road_bike.pdf"),
+    Chunk("Store opening hours are nine to six. The store is closed on public holidays.", "Store_Hours", "policy/hours.pdf"),
+]
+
+class VersionCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append((sql, params))
+        self._rows = [("2026-10-01 10:00:00", len(self.conn.chunks))] if "INFORMATION_SCHEMA" in sql else [tuple(c) for c in self.conn.chunks]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        pass
+
+class ChunkTable:
+    """A connection to a chunk table whose LAST_ALTERED changes only when its rows do."""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.statements = []
+
+    def cursor(self):
+        return VersionCursor(self)
+
+def test_terms_fold_suffixes():
+    assert terms("deliveries delivered delivery") == ["deliver", "deliver", "deliver"]
+
+def test_bm25_ranks_the_chunk_with_the_rare_words_first():
+    index = ChunkIndex(CHUNKS)
+    hits = index.search("how long is the bike frame warranty")
+    assert hits[0].chunk is CHUNKS[0] and hits[0].score > hits[1].score
+    assert 0 < hits[0].coverage <= 1
+    assert index.weight(terms("warranty")[0]) > index.weight(terms("store")[0])
+    assert index.search("quantum entanglement") == []
+
+def test_confident_answer_quotes_the_best_sentences():
+    search = LocalSearch(min_score=1.0, min_coverage=0.5, max_sentences=1)
+    search.load(CHUNKS, "v1")
+    answer = search.answer("How many years does the warranty cover the frame?")
+    assert answer["text"] == "The Mountain Bike warranty covers the frame for five years.*"
+    assert answer["sql"] == "" and answer["citations"].endswith("[Source: warranty/mountain_bike.pdf]")
+
+def test_unclear_questions_fall_back_to_cortex():
+    search = LocalSearch(min_score=0.5, min_coverage=0.5)
+    assert search.answer("warranty") is None  # nothing loaded yet
+    search.load(CHUNKS)
+    assert search.answer("tell me about bikes") is None  # two documents match about equally
+    assert search.answer("what is the return policy for kayaks") is None  # most of it isn't in any chunk
+    assert search.stats()["fallbacks"] == 3 and search.stats()["answered"] == 0
+
+def test_refresh_reloads_only_when_the_table_changed(tmp_path):
+    search, table = LocalSearch(), ChunkTable(CHUNKS[:2])
+    snapshot = str(tmp_path / "chunks.json.gz")
+    assert search.refresh(table, "DB.SCH.CHUNKS", snapshot)
+    assert not search.refresh(table, "DB.SCH.CHUNKS", snapshot)
+    table.chunks = CHUNKS
+    assert search.refresh(table, "DB.SCH.CHUNKS", snapshot)
+    assert search.stats()["chunks"] == 4
+    assert load_snapshot(snapshot) == (CHUNKS, search.version)
+
+def test_table_names_are_checked_before_they_reach_sql():
+    for table in ("CHUNKS", "DB.SCH.CHUNKS; DROP TABLE X", 'DB.SCH."CHUNKS"'):
+        with pytest.raises(ValueError):
+            table_version(ChunkTable([]), table)
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json.gz")
+    save_snapshot(path, CHUNKS, "v7")
+    assert load_snapshot(path) == (CHUNKS, "v7")
+    assert not os.path.exists(path + ".tmp")
@@ -0,0 +1,28 @@
+import datetime
+import decimal
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from query_results import QueryResult, decode_result, encode_result
+
+def test_result_round_trips_through_arrow():
+    df = pd.DataFrame({
+        "STATE": ["TX", None, "CA"],
+        "SALES": [decimal.Decimal("1.50"), decimal.Decimal("2.25"), None],
+        "N": [1, 2, 3],
+        "D": [datetime.date(2002, 1, 1)] * 3,
+        "TS": pd.to_datetime(["2002-01-01 10:00"] * 3),
+    })
+    result = QueryResult(df, "01b2-query", 20, 20, 1234)
+    decoded = decode_result(encode_result(result))
+    assert decoded[1:] == result[1:]
+    assert decoded.df.equals(df)
+    assert (decoded.first_row, decoded.last_row, decoded.has_prev, decoded.has_next) == (21, 23, True, True)
+
+def test_empty_result_keeps_its_columns():
+    result = QueryResult(pd.DataFrame({"A": pd.Series([], dtype="int64"), "B": pd.Series([], dtype="object")}), "q", 0, 20, 0)
+    decoded = decode_result(encode_result(result))
+    assert list(decoded.df.columns) == ["A", "B"] and decoded.total_rows == 0 and not decoded.has_next
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from result_cache import ResultCache, normalize_sql, referenced_tables
+
+def cache(**kwargs) -> ResultCache:
+    """Values are strings standing in for results; each costs its length."""
+    return ResultCache(sizeof=len, **kwargs)
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("select  *\n-- note\nfrom T /* x */ where a = 'x  y' ;") == "select * from T where a = 'x  y'"
+
+def test_referenced_tables():
+    sql = 'SELECT * FROM db.sch.STORE_SALES s JOIN "Item" i ON s.k = i.k JOIN date_dim d ON 1 = 1'
+    assert referenced_tables(sql) == {"STORE_SALES", "ITEM", "DATE_DIM"}
+
+def test_hit_on_equivalent_sql_for_the_same_role_and_warehouse():
+    results = cache()
+    results.put("select 1 from t", "analyst", "wh", "one")
+    assert results.get("select 1\n  from t;", "ANALYST", "WH") == "one"
+    assert results.get("select 1 from t", "other_role", "wh") is None
+    assert results.get("select 1 from t", "analyst", "wh", version="g2") is None
+
+def test_ttl():
+    results = cache(ttl=0.05)
+    results.put("select 1 from t", None, None, "one")
+    time.sleep(0.06)
+    assert results.get("select 1 from t") is None
+    assert results.stats()["expirations"] == 1 and results.stats()["entries"] == 0
+
+def test_byte_budget_evicts_least_recently_used():
+    results = cache(max_bytes=10)
+    results.put("select a from t", None, None, "aaaa")
+    results.put("select b from t", None, None, "bbbb")
+    assert results.get("select a from t") == "aaaa"
+    results.put("select c from t", None, None, "cccc")
+    assert results.get("select b from t") is None
+    assert results.get("select a from t") == "aaaa" and results.get("select c from t") == "cccc"
+    results.put("select d from t", None, None, "d" * 11)  # bigger than the whole budget: not cached
+    stats = results.stats()
+    assert (stats["evictions"], stats["bytes"], stats["entries"]) == (1, 8, 2)
+
+def test_invalidate_table():
+    results = cache()
+    results.put("select * from sales join item on 1 = 1", None, None, "x")
+    results.put("select * from db.sch.item", None, None, "y")
+    results.put("select * from store", None, None, "z")
+    assert results.invalidate_table('DB.SCH."ITEM"') == 2
+    assert results.get("select * from store") == "z"
+    assert results.stats()["invalidations"] == 2
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from single_flight import AsyncSingleFlight, SingleFlight
+
+def run_together(flight, key, fn, callers):
+    """Call flight.do(key, fn) from callers threads; returns their results (or exceptions)."""
+    results = []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_concurrent_callers_share_one_call():
+    flight, started, release, calls = SingleFlight(), threading.Event(), threading.Event(), []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return "answer"
+
+    threads, results = run_together(flight, "k", work, 1)
+    started.wait()
+    more, more_results = run_together(flight, "k", work, 4)
+    while flight.stats()["waiting"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads + more:
+        thread.join()
+    assert calls == [1] and results + more_results == ["answer"] * 5
+    assert flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0, "waiting": 0}
+
+def test_waiters_get_the_leaders_exception_and_nothing_is_remembered():
+    flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("boom")
+
+    threads, results = run_together(flight, "k", fail, 1)
+    started.wait()
+    more, more_results = run_together(flight, "k", fail, 2)
+    while flight.stats()["waiting"] < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads + more:
+        thread.join()
+    assert all(isinstance(result, ValueError) for result in results + more_results)
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+def test_async_single_flight():
+    async def main():
+        flight, calls = AsyncSingleFlight(), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        assert calls == [1] and results == ["answer"] * 5
+        # A waiter being cancelled leaves the call running for the others
+        leader = asyncio.ensure_future(flight.do("k2", work))
+        waiter = asyncio.ensure_future(flight.do("k2", work))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        assert await leader == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert flight.stats() == {"executed": 2, "coalesced": 5, "in_flight": 0}
+
+    asyncio.run(main())
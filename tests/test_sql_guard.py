@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sql_guard import SQLGuard, SQLRejected
+
+class ExplainCursor:
+    """Answers EXPLAIN USING JSON with a plan whose GlobalStats are the given estimate."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        self.conn.statements.append(sql)
+        if self.conn.error is not None:
+            raise self.conn.error
+
+    def fetchone(self):
+        return (json.dumps({"GlobalStats": self.conn.stats}),)
+
+    def close(self):
+        pass
+
+class ExplainConnection:
+    def __init__(self, partitions_assigned, bytes_assigned, error=None):
+        self.stats = {"partitionsTotal": 1000, "partitionsAssigned": partitions_assigned, "bytesAssigned": bytes_assigned}
+        self.error = error
+        self.statements = []
+
+    def cursor(self):
+        return ExplainCursor(self)
+
+class SnowflakeError(Exception):
+    def __init__(self, errno, msg):
+        super().__init__(msg)
+        self.errno = errno
+
+def test_timeout_is_a_session_parameter():
+    assert SQLGuard(timeout=0).session_parameters() == {}
+    assert SQLGuard(timeout=120).session_parameters() == {"STATEMENT_TIMEOUT_IN_SECONDS": 120}
+
+def test_server_side_timeout_is_reported_as_timeout():
+    guard = SQLGuard(timeout=120)
+    e = SnowflakeError(630, "Statement reached its statement or warehouse timeout of 120 second(s) and was canceled.")
+    rejected = guard.timed_out(e)
+    assert isinstance(rejected, SQLRejected) and rejected.reason == "timeout"
+    assert guard.timed_out(SnowflakeError(2003, "Object 'X' does not exist")) is None
+    assert guard.stats()["rejected"] == {"timeout": 1}
+
+@pytest.mark.parametrize("sql, reason", [
+    ("", "empty"),
+    ("-- nothing but a comment", "empty"),
+    ("select 1; drop table t", "multiple_statements"),
+    ("delete from t", "not_select"),
+    ("with x as (delete from t returning *) select * from x", "not_select"),
+    ("select * from t; use role accountadmin", "multiple_statements"),
+])
+def test_rejects_anything_but_one_select(sql, reason):
+    guard = SQLGuard()
+    with pytest.raises(SQLRejected) as rejected:
+        guard.prepare(sql)
+    assert rejected.value.reason == reason
+    assert guard.stats()["rejected"] == {reason: 1}
+
+@pytest.mark.parametrize("sql", [
+    "select replace(a, 'x', 'y') from t",
+    "select 'drop table x; delete' as note from t",
+    'select "UPDATE" from t',
+    "with x as (select 1 as a) select * from x",
+])
+def test_allows_keywords_that_are_not_statements(sql):
+    assert SQLGuard(max_rows=0).prepare(sql) == sql
+
+@pytest.mark.parametrize("sql, guarded", [
+    ("select * from t", "select * from t LIMIT 100"),
+    ("select * from t;", "select * from t LIMIT 100"),
+    ("select * from t limit 5000", "select * from t limit 100"),
+    ("select * from t limit 10 offset 5", "select * from t limit 10 offset 5"),
+    ("select top 5000 a from t", "select top 100 a from t"),
+    ("select * from t fetch first 500 rows only", "select * from t fetch first 100 rows only"),
+    ("select * from (select * from t limit 5000) x", "select * from (select * from t limit 5000) x LIMIT 100"),
+    ("select * from t limit ?", "SELECT * FROM (select * from t limit ?) LIMIT 100"),
+])
+def test_caps_the_outermost_row_count(sql, guarded):
+    assert SQLGuard(max_rows=100).prepare(sql) == guarded
+
+def test_cost_check():
+    guard = SQLGuard(max_scan_bytes=10 * 1024 ** 3, max_partitions=500)
+    guard.check_cost(ExplainConnection(100, 1024 ** 3), "select 1")
+    with pytest.raises(SQLRejected) as rejected:
+        guard.check_cost(ExplainConnection(100, 20 * 1024 ** 3), "select 1")
+    assert rejected.value.reason == "scan_bytes" and "20.0 GB" in str(rejected.value)
+    with pytest.raises(SQLRejected) as rejected:
+        guard.check_cost(ExplainConnection(900, 1024), "select 1")
+    assert rejected.value.reason == "partitions"
+
+def test_cost_check_lets_the_query_run_when_explain_fails():
+    conn = ExplainConnection(900, 1024, error=SnowflakeError(2003, "does not exist"))
+    SQLGuard(max_partitions=500).check_cost(conn, "select 1 from t")
+    assert conn.statements == ["EXPLAIN USING JSON select 1 from t"]
+    # Without limits there is nothing to check, and no round trip
+    conn = ExplainConnection(900, 1024)
+    SQLGuard().check_cost(conn, "select 1")
+    assert conn.statements == []
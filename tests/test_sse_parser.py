@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sse_parser import SSEEvent, SSEParser, iter_sse, parse_cortex_stream
+
+def test_data_after_keep_alive_comment_in_same_chunk():
+    parser = SSEParser()
+    assert parser.feed(b': ping\n\ndata: {"a":1}\n\n') == [SSEEvent('message', '{"a":1}', None)]
+
+def test_data_after_extra_blank_line_in_same_chunk():
+    parser = SSEParser()
+    assert parser.feed(b'\ndata: two\n\n') == [SSEEvent('message', 'two', None)]
+
+def test_events_split_across_chunks():
+    raw = b'event: delta\ndata: one\ndata: two\n\n: keep-alive\n\n\ndata: three\r\n\r\n'
+    expected = [SSEEvent('delta', 'one\ntwo', None), SSEEvent('message', 'three', None)]
+    for size in (1, 2, 3, 7, len(raw)):
+        assert list(iter_sse(raw[i:i + size] for i in range(0, len(raw), size))) == expected
+
+def test_line_endings_split_across_chunks():
+    raw = b'data: a\r\rdata: b\r\n\r\ndata: c\n\n'
+    expected = [SSEEvent('message', 'a', None), SSEEvent('message', 'b', None), SSEEvent('message', 'c', None)]
+    for size in (1, 2, 3, len(raw)):
+        assert list(iter_sse(raw[i:i + size] for i in range(0, len(raw), size))) == expected
+
+def test_event_and_id_fields_and_comments():
+    parser = SSEParser()
+    events = parser.feed(b'id: 7\nevent: delta\n: note\ndata\ndata:x\n\ndata: y\n\n')
+    assert events == [SSEEvent('delta', '\nx', '7'), SSEEvent('message', 'y', '7')]
+
+def test_close_discards_unterminated_event_but_keeps_one_ended_by_cr():
+    parser = SSEParser()
+    assert parser.feed(b'data: a\n') == [] and parser.close() == []
+    parser = SSEParser()
+    assert parser.feed(b'data: a\n\r') == [] and parser.close() == [SSEEvent('message', 'a', None)]
+
+def test_cortex_stream_accumulates_text_tools_and_other_messages():
+    tool_use = {"type": "cortex_analyst_text_to_sql", "name": "analyst1"}
+    results = {"content": [{"json": {"sql": "select 1"}}]}
+    deltas = [
+        {"object": "message.delta", "delta": {"content": [{"type": "text", "text": "Hello "}]}},
+        {"object": "message.delta", "delta": {"content": [{"type": "tool_use", "tool_use": tool_use}]}},
+        {"object": "message.delta", "delta": {"content": [{"type": "tool_results", "tool_results": results}]}},
+        {"object": "message.delta", "delta": {"content": [{"type": "text", "text": "world"}]}},
+        {"object": "response.status", "status": "done"},
+    ]
+    raw = b''.join(b'event: message.delta\ndata: ' + json.dumps(d).encode() + b'\n\n' for d in deltas)
+    raw += b'data: not json\n\ndata: [DONE]\n\n'
+    seen = []
+    for size in (5, len(raw)):
+        seen.clear()
+        accumulated = parse_cortex_stream((raw[i:i + size] for i in range(0, len(raw), size)), lambda kind, value: seen.append(kind))
+        assert ''.join(accumulated['text']) == 'Hello world'
+        assert accumulated['tool_use'] == [tool_use] and accumulated['tool_results'] == [results]
+        assert accumulated['other'] == [{"object": "response.status", "status": "done"}]
+        assert seen == ['text', 'tool_use', 'text']
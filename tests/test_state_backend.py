@@ -0,0 +1,121 @@
+# Runs against the Redis-protocol server at TEST_REDIS_URL when it is set (e.g. a local redis-server
+# or valkey), else against fakeredis, which needs fakeredis[lua] for the token bucket script.
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+import pytest
+import redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from admission import AdmissionController, AdmissionRejected
+from event_dedup import EventDeduplicator, SharedDedupStore
+from running_queries import QueryRegistry
+from single_flight import SharedFlight
+from state_backend import RedisBackend, open_backend
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+@pytest.fixture
+def connect(monkeypatch):
+    """connect() opens another replica's backend onto the same server and key prefix."""
+    if TEST_REDIS_URL:
+        url = TEST_REDIS_URL
+    else:
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(redis.Redis, "from_url", classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=server)))
+        url = "redis://fake"
+    prefix = f"test-{uuid.uuid4().hex[:8]}:"
+    return lambda: open_backend(url, prefix=prefix)
+
+def test_open_backend():
+    assert open_backend("") is None
+    with pytest.raises(ValueError):
+        open_backend("http://localhost:6379")
+
+def test_values_claims_and_expiry(connect):
+    backend = connect()
+    assert isinstance(backend, RedisBackend)
+    assert backend.get("a") is None
+    assert backend.add("a", b"1", 5) and not connect().add("a", b"2", 5)
+    assert backend.get("a") == b"1"
+    assert not backend.delete("a", b"2") and backend.get("a") == b"1"
+    assert backend.delete("a", b"1") and backend.get("a") is None
+    backend.set("t", b"v", 0.1)
+    assert backend.get("t") == b"v"
+    time.sleep(0.2)
+    assert backend.get("t") is None
+    assert backend.stats() == {"backend": "redis", "calls": backend.stats()["calls"], "errors": 0}
+
+def test_token_bucket(connect):
+    backend = connect()
+    assert backend.take("bucket", 1, 2) == 0 and connect().take("bucket", 1, 2) == 0
+    wait = backend.take("bucket", 1, 2)
+    assert 0 < wait <= 1
+    backend.give_back("bucket", 1, 2)
+    assert backend.take("bucket", 1, 2) == 0
+
+def test_each_event_claimed_by_one_replica(connect):
+    replicas = [EventDeduplicator(SharedDedupStore(connect(), ttl=60, owner=f"r{i}")) for i in range(4)]
+    claimed, lock = [], threading.Lock()
+
+    def deliver(replica, i):
+        if replica.should_process({"event_id": f"Ev{i}", "event": {"type": "message", "text": "hi", "channel": "C1", "ts": f"{i}.1"}}):
+            with lock:
+                claimed.append(i)
+
+    threads = [threading.Thread(target=deliver, args=(replica, i)) for i in range(50) for replica in replicas]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(50))
+
+def test_rate_limit_shared_between_replicas(connect):
+    controllers = [AdmissionController(1 / 60, 2, 0, 0, backend=connect()) for _ in range(3)]
+    controllers[0].check("U1", "C1")
+    controllers[1].check("U1", "C1")
+    with pytest.raises(AdmissionRejected):
+        controllers[2].check("U1", "C1")
+    controllers[2].check("U2", "C1")
+
+def test_shared_flight_runs_once_across_replicas(connect):
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"text": "answer"}
+
+    flights = [SharedFlight(connect(), "answer", lambda v: json.dumps(v).encode(), json.loads, 60, 5, poll_interval=0.02) for _ in range(3)]
+    results = []
+    threads = [threading.Thread(target=lambda flight=flight: results.append(flight.do("k", work))) for flight in flights]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and results == [{"text": "answer"}] * 3
+    assert flights[0].get("k") == {"text": "answer"}
+
+def test_cancel_reaches_the_replica_running_the_query(connect):
+    running_here = QueryRegistry(backend=connect(), watch_interval=0.05)
+    elsewhere = QueryRegistry(backend=connect(), watch_interval=0.05)
+    query = running_here.start("select 1", ("C1", "1.1"))
+    assert elsewhere.cancel_message("C1", "1.1", "U7") is None
+    deadline = time.monotonic() + 2
+    while not query.cancelled and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert query.cancelled and query.cancelled_by == "U7"
+
+def test_fails_open_when_the_server_is_down():
+    backend = RedisBackend("redis://127.0.0.1:1/0", socket_timeout=0.2)
+    assert backend.get("k") is None
+    assert backend.add("k", b"1", 1) is True
+    assert backend.take("bucket", 1, 1) == 0
+    assert backend.delete("k") is False
+    assert backend.stats()["errors"] == 4
@@ -0,0 +1,67 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from token_manager import TokenManager, get_token_manager
+
+@pytest.fixture
+def key_path(tmp_path):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = tmp_path / "rsa_key.p8"
+    path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return str(path)
+
+@pytest.fixture
+def manager(key_path):
+    manager = TokenManager("myorg-acct", "bot_user", key_path)
+    yield manager
+    manager.stop()
+
+def test_token_is_signed_once_and_reused(manager):
+    token = manager.get_token()
+    assert all(manager.get_token() == token for _ in range(100))
+    assert manager.stats()["refreshes"] == 1
+    claims = jwt.decode(token, options={"verify_signature": False})
+    assert claims["sub"] == "MYORG-ACCT.BOT_USER" and claims["iss"].startswith("MYORG-ACCT.BOT_USER.SHA256:")
+    assert 58 * 60 <= claims["exp"] - claims["iat"] <= 60 * 60
+
+def test_late_refresher_is_covered_inline(manager):
+    manager._generator.renew_time = datetime.now(timezone.utc) - timedelta(seconds=1)
+    manager.get_token()
+    assert manager.stats()["refreshes"] == 2
+    assert manager._generator.renew_time > datetime.now(timezone.utc) + timedelta(minutes=50)
+
+def test_callers_rejected_with_the_same_token_refresh_once(manager):
+    # A token from an hour ago, as a 401 would hand back
+    stale = manager._token = manager._generator.generate_token(datetime.now(timezone.utc) - timedelta(hours=1))
+    tokens, lock = [], threading.Lock()
+
+    def refresh():
+        token = manager.force_refresh(stale)
+        with lock:
+            tokens.append(token)
+
+    threads = [threading.Thread(target=refresh) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert manager.stats()["refreshes"] == 2
+    assert len(set(tokens)) == 1 and tokens[0] != stale and tokens[0] == manager.get_token()
+
+def test_one_manager_per_account_user_and_key(key_path):
+    shared = get_token_manager("acct", "user", key_path)
+    try:
+        assert get_token_manager("acct", "user", key_path) is shared
+        other = get_token_manager("acct", "other", key_path)
+        assert other is not shared
+        other.stop()
+    finally:
+        shared.stop()
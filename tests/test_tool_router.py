@@ -0,0 +1,43 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from tool_router import QuestionRouter
+
+MODELS = {
+    os.path.join(ROOT, "tpcds_semantic_view_sm.yaml"): "@STAGE/tpcds.yaml",
+    os.path.join(ROOT, "support_tickets_semantic_model.yaml"): "@STAGE/support.yaml",
+}
+
+def router(models=MODELS) -> QuestionRouter:
+    return QuestionRouter.from_files(models, default_model="@STAGE/default.yaml")
+
+def test_sample_questions_go_to_their_model():
+    route = router()
+    for question, reference in (
+        ("Show me the top selling brands by total sales quantity in the state TX in the Books category in the year 2003", "@STAGE/tpcds.yaml"),
+        ("What is the total sales by month?", "@STAGE/tpcds.yaml"),
+        ("How many customers by country?", "@STAGE/tpcds.yaml"),
+        ("Can you show me a breakdown of customer support tickets by service type - cellular vs business internet?", "@STAGE/support.yaml"),
+        ("How many unique customers have raised a support ticket with a 'Cellular' service type and have 'Email' as their contact preference?", "@STAGE/support.yaml"),
+    ):
+        assert route.route(question)[:3] == (False, True, reference), question
+
+def test_shared_words_do_not_tie_models():
+    # "month" is only in the TPC-DS model, but any model's question can be per month
+    result = router().route("How many tickets were raised per month?")
+    assert result.semantic_model == "@STAGE/support.yaml"
+    assert result.scores["support_tickets_analyst"] > 2 * result.scores["TPCDS_SEMANTIC_VIEW_SM"]
+
+def test_ambiguous_questions_get_both_tools():
+    # Both models have customers
+    assert router().route("How many customers are there?")[:3] == (True, True, "@STAGE/default.yaml")
+
+def test_document_questions_go_to_search():
+    assert router().route("What does the warranty policy say about batteries?")[:3] == (True, False, None)
+
+def test_single_model():
+    single = router({path: reference for path, reference in MODELS.items() if "tpcds" in path})
+    assert single.route("How many customers by country?")[:3] == (False, True, "@STAGE/tpcds.yaml")
+    assert single.route("Tell me a joke")[:3] == (True, True, "@STAGE/default.yaml")
@@ -0,0 +1,63 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from worker_pool import KeyedWorkerPool
+
+def test_jobs_with_a_key_run_in_order_and_one_at_a_time():
+    pool = KeyedWorkerPool(max_workers=4, max_pending=100)
+    events, running, lock = [], {}, threading.Lock()
+
+    def job(key, i):
+        with lock:
+            assert not running.get(key), f"two jobs for {key} at once"
+            running[key] = True
+        time.sleep(0.002)
+        with lock:
+            running[key] = False
+            events.append((key, i))
+
+    for i in range(10):
+        for key in ("C1", "C2", "C3"):
+            assert pool.submit(key, job, key, i)
+    pool.shutdown()
+    for key in ("C1", "C2", "C3"):
+        assert [i for k, i in events if k == key] == list(range(10))
+    assert pool.stats()["completed"] == 30
+
+def test_lower_priority_value_starts_first():
+    pool = KeyedWorkerPool(max_workers=1, max_pending=10)
+    release, order = threading.Event(), []
+    pool.submit("busy", release.wait)
+    pool.submit("channel", order.append, "channel", priority=1)
+    pool.submit("dm", order.append, "dm", priority=0)
+    pool.submit("channel2", order.append, "channel2", priority=1)
+    release.set()
+    pool.shutdown()
+    assert order == ["dm", "channel", "channel2"]
+
+def test_rejects_beyond_max_pending():
+    pool = KeyedWorkerPool(max_workers=1, max_pending=2)
+    release = threading.Event()
+    assert pool.submit("a", release.wait)
+    assert pool.submit("b", lambda: None)
+    assert not pool.submit("c", lambda: None)
+    assert pool.stats()["rejected"] == 1
+    release.set()
+    pool.shutdown()
+
+def test_a_failed_job_does_not_block_its_key():
+    pool = KeyedWorkerPool(max_workers=2, max_pending=10)
+    done = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    pool.submit("k", fail)
+    pool.submit("k", done.append, 1)
+    pool.shutdown()
+    assert done == [1]
+    stats = pool.stats()
+    assert (stats["failed"], stats["completed"], stats["queued"], stats["running"]) == (1, 1, 0, 0)
@@ -0,0 +1,69 @@
+import threading
+from datetime import datetime, timezone
+
+from generate_jwt import JWTGenerator
+
+class TokenManager:
+    """
+    Process-wide owner of the key-pair JWT for one Snowflake user.
+    The PEM file is read and parsed once. A background thread re-signs the token when the
+    generator's renewal time arrives, well ahead of expiry, so callers always get a valid
+    token without paying for signing. Refreshes are single-flight: concurrent callers that need
+    a new token wait for one refresh instead of each signing their own.
+    """
+    def __init__(self, account: str, user: str, private_key_path: str):
+        self._generator = JWTGenerator(account, user, private_key_path)
+        self._lock = threading.Lock()
+        self._token = self._generator.generate_token()
+        self._refreshes = 1
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(target=self._run, name="jwt-refresh", daemon=True)
+        self._refresher.start()
+
+    def get_token(self) -> str:
+        token = self._token
+        if self._generator.renew_time > datetime.now(timezone.utc):
+            return token
+        # The refresher is late (e.g. the process was suspended); refresh inline, once.
+        return self.force_refresh(token)
+
+    def force_refresh(self, stale_token: str = None) -> str:
+        """
+        Sign a new token unless another thread already replaced stale_token while we waited.
+        Call with the token a request was rejected with (e.g. on a 401).
+        """
+        with self._lock:
+            if stale_token is not None and self._token != stale_token:
+                return self._token
+            self._token = self._generator.generate_token()
+            self._refreshes += 1
+            return self._token
+
+    def _run(self):
+        while True:
+            wait = (self._generator.renew_time - datetime.now(timezone.utc)).total_seconds()
+            if self._stop.wait(max(wait, 1)):
+                return
+            if self._generator.renew_time <= datetime.now(timezone.utc):
+                try:
+                    self.force_refresh(self._token)
+                except Exception as e:
+                    print(f"Background JWT refresh failed: {type(e).__name__}: {e}")
+
+    def stats(self) -> dict[str, any]:
+        return {"refreshes": self._refreshes, "renew_time": self._generator.renew_time.isoformat()}
+
+    def stop(self):
+        self._stop.set()
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_token_manager(account: str, user: str, private_key_path: str) -> TokenManager:
+    """The shared TokenManager for this account/user/key, created on first use."""
+    key = (account, user, private_key_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = TokenManager(account, user, private_key_path)
+        return manager
@@ -0,0 +1,141 @@
+import math
+from typing import NamedTuple, Optional
+
+import yaml
+
+from answer_cache import prompt_tokens
+
+# Words that mark a question as a metric/aggregation question (Cortex Analyst) ...
+ANALYST_HINTS = prompt_tokens("""
+total sum average avg mean count many number top bottom trend revenue sales profit quantity amount
+percent percentage share most least highest lowest compare breakdown monthly yearly weekly daily
+quarter quarterly year month week rank ranking growth distribution median minimum maximum
+""")
+# ... or as a question about documents (Cortex Search)
+SEARCH_HINTS = prompt_tokens("""
+document documents manual policy contract warranty guide explain describe description specification
+specs feature features procedure instructions instruction why recommend recommended maintenance safety
+""")
+
+class Route(NamedTuple):
+    """Which tools to send Cortex Agents for one question, and with which semantic model."""
+    search: bool
+    analyst: bool
+    semantic_model: Optional[str]
+    model_name: Optional[str]
+    scores: dict
+
+class SemanticModel(NamedTuple):
+    name: str
+    reference: str  # what the request's semantic_model_file is set to, e.g. a stage path
+    terms: dict  # frozenset of tokens -> weight
+
+def compile_semantic_model(path: str, reference: str) -> SemanticModel:
+    """
+    Collect the vocabulary of a semantic model YAML: table names and synonyms (weight 2), the
+    names and synonyms of dimensions, time dimensions, facts, measures and metrics (weight 1), and
+    short textual sample values (weight 0.5). Each term is the token set prompt_tokens gives it,
+    so it matches the question however the words are ordered or pluralised.
+    """
+    with open(path) as f:
+        model = yaml.safe_load(f)
+    terms = {}
+
+    def add(text, weight):
+        if not isinstance(text, str):
+            return
+        tokens = frozenset(t for t in prompt_tokens(text.replace('_', ' ')) if len(t) > 2)
+        if tokens and terms.get(tokens, 0) < weight:
+            terms[tokens] = weight
+
+    for table in model.get('tables', ()):
+        add(table.get('name'), 2)
+        for synonym in table.get('synonyms', ()) or ():
+            add(synonym, 2)
+        for section in ('dimensions', 'time_dimensions', 'facts', 'measures', 'metrics'):
+            for column in table.get(section, ()) or ():
+                add(column.get('name'), 1)
+                for synonym in column.get('synonyms', ()) or ():
+                    add(synonym, 1)
+                for value in column.get('sample_values', ()) or ():
+                    if isinstance(value, str) and len(value.split()) <= 3:
+                        add(value, 0.5)
+    return SemanticModel(model.get('name', path), reference, terms)
+
+class QuestionRouter:
+    """
+    Picks, per question, the Cortex Agents tools and the semantic model to send, so the agent
+    doesn't spend a planning step choosing between tools it won't need, and one process can serve
+    several semantic models. Questions that clearly match one model's vocabulary, use aggregation
+    words and no document words go to Cortex Analyst alone; document questions with no model match
+    go to Cortex Search alone. Anything ambiguous, including a question two models match about
+    equally well, gets both tools with default_model, as before.
+    """
+    def __init__(self, models: list[SemanticModel], default_model: str = None,
+                 analyst_threshold: float = 2.0, search_threshold: float = 1.0, min_margin: float = 1.5):
+        """:param min_margin: How many times the runner-up model's score the chosen model must reach."""
+        self.models = models
+        self.default_model = default_model
+        self.analyst_threshold = analyst_threshold
+        self.search_threshold = search_threshold
+        self.min_margin = min_margin
+        self._idf = self._token_idf(models)
+        self._index = {}  # token -> [(model index, term tokens, weight)]
+        for i, model in enumerate(models):
+            for tokens, weight in model.terms.items():
+                entry = (i, tokens, weight * sum(self._idf[token] for token in tokens))
+                for token in tokens:
+                    self._index.setdefault(token, []).append(entry)
+
+    @staticmethod
+    def _token_idf(models: list[SemanticModel]) -> dict[str, float]:
+        """
+        Per word, log((N + 1) / df) / log(N + 1) over the N models: 1 for a word only one model uses,
+        down to log((N + 1) / N) / log(N + 1) for one they all use. A word shared by every model
+        says little about which one is meant, so it can't tie two models or carry one past the other.
+        ANALYST_HINTS words count as used by every model, since any model's question can be per month or a total.
+        """
+        document_frequency = {}
+        for model in models:
+            for token in set().union(*model.terms):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        n = len(models)
+        for token in ANALYST_HINTS:
+            if token in document_frequency:
+                document_frequency[token] = n
+        return {token: math.log((n + 1) / df) / math.log(n + 1) for token, df in document_frequency.items()}
+
+    @classmethod
+    def from_files(cls, models: dict[str, str], **kwargs) -> "QuestionRouter":
+        """:param models: YAML path -> semantic model reference to send when that model is chosen."""
+        return cls([compile_semantic_model(path, reference) for path, reference in models.items() if reference], **kwargs)
+
+    def route(self, question: str) -> Route:
+        tokens = prompt_tokens(question)
+        scores = [0.0] * len(self.models)
+        matched = set()
+        for token in tokens:
+            for i, term, weight in self._index.get(token, ()):
+                if (i, term) not in matched and term <= tokens:
+                    matched.add((i, term))
+                    scores[i] += weight
+
+        ranked = sorted(range(len(self.models)), key=scores.__getitem__, reverse=True)
+        best = ranked[0] if ranked else None
+        model_score = scores[best] if best is not None else 0.0
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        hints = len(tokens & ANALYST_HINTS)
+        analyst_score = model_score + hints
+        search_score = len(tokens & SEARCH_HINTS)
+        named_scores = {model.name: round(score, 2) for model, score in zip(self.models, scores)}
+        named_scores.update(analyst=round(analyst_score, 2), search=search_score)
+
+        # A tie or a narrow lead doesn't say which model is meant
+        clear = model_score > 0 and model_score >= runner_up * self.min_margin
+        model = self.models[best] if clear else None
+        if hints and analyst_score >= self.analyst_threshold and model is not None and search_score < self.search_threshold:
+            return Route(False, True, model.reference, model.name, named_scores)
+        if search_score >= self.search_threshold and model_score == 0:
+            return Route(True, False, None, None, named_scores)
+        # Not sure: the request the bot sent before routing existed
+        return Route(True, True, self.default_model, None, named_scores)
@@ -0,0 +1,121 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+class KeyedWorkerPool:
+    """
+    Runs jobs on a bounded set of worker threads while keeping jobs that share a key in order.
+    Jobs with the same key (e.g. a Slack channel/thread) run one at a time in submission order,
+    jobs with different keys run in parallel up to max_workers. A job whose key is free waits in a
+    ready queue ordered by priority (lower first, FIFO within a priority), so a DM submitted behind
+    a backlog of channel questions is the next to start. At most max_pending jobs may be queued or
+    running at once; submit() returns False beyond that so the caller can push back.
+    """
+    def __init__(self, max_workers: int = 4, max_pending: int = 32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._ready = []  # heap of (priority, seq, submitted, key, job) whose key has nothing running
+        self._has_ready = threading.Condition(self._lock)
+        self._seq = itertools.count()
+        self._queues = {}  # key -> deque of (priority, submitted, job) waiting behind the one ready or running
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._waited = 0.0  # seconds from submit() to start, summed over started jobs
+        self._started = 0
+        self._shutdown = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"slack-worker_{i}", daemon=True) for i in range(max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, fn, *args, priority: int = 1, **kwargs) -> bool:
+        """
+        Queue fn(*args, **kwargs) behind any earlier job with the same key.
+        :param priority: Lower starts first among jobs whose key is free.
+        :return: True if the job was accepted, False if the pool is saturated.
+        """
+        job = (fn, args, kwargs)
+        with self._lock:
+            if self._pending >= self.max_pending or self._shutdown:
+                self._rejected += 1
+                return False
+            self._pending += 1
+            queue = self._queues.get(key)
+            if queue is not None:
+                # A job for this key is already ready or running; it will hand over to us when done.
+                queue.append((priority, time.monotonic(), job))
+                return True
+            self._queues[key] = deque()
+            self._push(priority, time.monotonic(), key, job)
+        return True
+
+    def _push(self, priority: int, submitted: float, key, job):
+        heapq.heappush(self._ready, (priority, next(self._seq), submitted, key, job))
+        self._has_ready.notify()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._ready and not (self._shutdown and not self._pending):
+                    self._has_ready.wait()
+                if not self._ready:
+                    return
+                _, _, submitted, key, job = heapq.heappop(self._ready)
+                self._running += 1
+                self._started += 1
+                self._waited += time.monotonic() - submitted
+            self._run(key, job)
+
+    def _run(self, key, job):
+        fn, args, kwargs = job
+        try:
+            fn(*args, **kwargs)
+            failed = False
+        except Exception as e:
+            failed = True
+            print(f"Worker job for {key} failed: {type(e).__name__}: {e}")
+        with self._lock:
+            self._running -= 1
+            self._pending -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            queue = self._queues[key]
+            if queue:
+                # Back into the ready queue rather than run here, so a busy channel can't monopolise a worker
+                priority, submitted, next_job = queue.popleft()
+                self._push(priority, submitted, key, next_job)
+            else:
+                del self._queues[key]
+                if self._shutdown and not self._pending:
+                    self._has_ready.notify_all()
+
+    def stats(self) -> dict[str, any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "ready": len(self._ready),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait": self._waited / self._started if self._started else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop taking jobs; workers exit once every accepted job has run."""
+        with self._lock:
+            self._shutdown = True
+            self._has_ready.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()